@@ -1,15 +1,25 @@
 import streamlit as st
+import html
 import os
 import sys
+import queue
+import uuid
 from dotenv import load_dotenv
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from src.ingestion import DocumentLoader, TextCleaner, TextSplitter
+from src.ingestion import DocumentChunker, DocumentLoader, MetadataTagger
+from src.dedup import NearDuplicateFilter
 from src.vectorizer import EmbeddingModel, VectorStoreManager
-from src.retrieval import Retriever
+from src.embedding_cache import QueryEmbeddingCache
+from src.retrieval import Retriever, RetrievalCache
 from src.rag import RAGChain
+from src.watcher import FileChange, start_ingestion_daemon, write_upload
+from src.warmup import QueryLog, WarmupRunner, default_warmup_queries
+from src.relevance import RelevanceGate
+from src.singleflight import SingleFlight
+from src.compression import ContextCompressor
 
 # Page config
 st.set_page_config(
@@ -85,49 +95,163 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+def load_chunks(data_dir: str = DATA_DIR):
+    """
+    Load, clean, split, tag and de-duplicate every supported file
+    (markdown, text, PDF, HTML, DOCX) in data_dir.
+    """
+    loader = DocumentLoader()
+    chunker = DocumentChunker()
+    tagger = MetadataTagger()
+    
+    # Automatically load ALL markdown files from data directory
+    all_chunks = []
+    loaded_files = []
+    errors = []
+    
+    for filename in os.listdir(data_dir):
+        if loader.supports(filename):
+            file_path = os.path.join(data_dir, filename)
+            try:
+                file_chunks = []
+                # PDF pages and HTML/DOCX sections are chunked as they stream in
+                for doc in loader.iter_file(file_path):
+                    file_chunks.extend(chunker.split_documents([doc]))
+                tagger.tag(file_chunks)
+                all_chunks.extend(file_chunks)
+                loaded_files.append(filename)
+            except Exception as e:
+                errors.append(f"Could not load {filename}: {str(e)}")
+    
+    if not all_chunks:
+        raise Exception("No documents found in data/ folder!")
+    
+    # Overlapping articles produce near-identical chunks; index each once
+    all_chunks, dedup_report = NearDuplicateFilter().filter(all_chunks)
+    return all_chunks, loaded_files, dedup_report, errors
+
 @st.cache_resource
 def initialize_rag_system():
     """Initialize the RAG system (cached to avoid reloading)"""
     load_dotenv()
     
     with st.spinner("🔄 Loading documents and building index..."):
-        loader = DocumentLoader()
-        cleaner = TextCleaner()
-        splitter = TextSplitter(chunk_size=500, chunk_overlap=50)
-        
-        data_dir = os.path.join(os.path.dirname(__file__), 'data')
-        
-        # Automatically load ALL markdown files from data directory
-        all_chunks = []
-        loaded_files = []
+        all_chunks, loaded_files, dedup_report, errors = load_chunks()
+        for error in errors:
+            st.warning(f"⚠️ {error}")
         
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.md') or filename.endswith(',md'):
-                file_path = os.path.join(data_dir, filename)
-                try:
-                    raw_docs = loader.load_file(file_path)
-                    for doc in raw_docs:
-                        doc.page_content = cleaner.clean(doc.page_content)
-                    file_chunks = splitter.split_documents(raw_docs)
-                    all_chunks.extend(file_chunks)
-                    loaded_files.append(filename)
-                except Exception as e:
-                    st.warning(f"⚠️ Could not load {filename}: {str(e)}")
-        
-        if not all_chunks:
-            raise Exception("No documents found in data/ folder!")
-        
-        embedding_model = EmbeddingModel()
+        embedding_model = EmbeddingModel(query_cache=QueryEmbeddingCache())
         manager = VectorStoreManager(embedding_model)
         manager.create_index(all_chunks)
         
-        retriever = Retriever(vector_store_manager=manager)
+        # Streamlit serves each session from its own thread: identical
+        # questions asked at the same time share one embedding and search
+        retriever = Retriever(
+            vector_store_manager=manager, cache=RetrievalCache(), single_flight=SingleFlight(),
+        )
         
         # Store loaded files in session state for display
         st.session_state.loaded_files = loaded_files
         st.session_state.total_chunks = len(all_chunks)
+        st.session_state.duplicates_removed = dedup_report["removed"]
         
-        return RAGChain(retriever=retriever)
+        # Optional gate fitted by src/calibrate_relevance.py
+        gate_path = os.getenv("RELEVANCE_GATE_PATH")
+        relevance_gate = None
+        if gate_path and os.path.exists(gate_path):
+            relevance_gate = RelevanceGate.load(gate_path)
+        
+        # Optional query-focused compression of the retrieved context
+        context_tokens = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+        compressor = None
+        if context_tokens:
+            compressor = ContextCompressor(embedding_model, max_tokens=context_tokens)
+        
+        return RAGChain(retriever=retriever, relevance_gate=relevance_gate, compressor=compressor)
+
+@st.cache_resource
+def start_warmup(_retriever: Retriever) -> WarmupRunner:
+    """Replay frequent queries (QUERY_LOG_PATH, then data/eval_set.json) in the background."""
+    queries = default_warmup_queries(DATA_DIR, os.getenv("QUERY_LOG_PATH"))
+    return WarmupRunner(_retriever, queries).start()
+
+@st.cache_resource
+def start_auto_ingest(_manager: VectorStoreManager):
+    """Watch data/ and push changed files into the live index (one daemon per process)."""
+    return start_ingestion_daemon(_manager, DATA_DIR)
+
+UPLOAD_TYPES = sorted(DocumentLoader.PARSERS)
+
+def submit_uploads(uploaded_files, watcher, worker):
+    """Save new uploads into data/ and queue them on the background ingestion worker."""
+    submitted = st.session_state.setdefault("submitted_uploads", {})
+    for uploaded in uploaded_files or []:
+        key = (uploaded.name, uploaded.size, getattr(uploaded, "file_id", None))
+        if key in submitted:
+            continue
+        try:
+            path = write_upload(DATA_DIR, uploaded.name, uploaded.getvalue())
+            # The worker indexes it now; the watcher must not report it again
+            watcher.mark_ingested(path)
+            worker.submit([FileChange(path, "added")], timeout=0.5)
+            submitted[key] = path
+        except queue.Full:
+            st.warning(f"⚠️ Ingestion queue is full; try {uploaded.name} again shortly")
+        except ValueError as e:
+            st.warning(f"⚠️ {str(e)}")
+            submitted[key] = None
+
+@st.fragment(run_every=2)
+def show_ingestion_progress(worker):
+    """Upload progress and indexing throughput; refreshes on its own without rerunning the chat."""
+    paths = [p for p in st.session_state.get("submitted_uploads", {}).values() if p]
+    if not paths:
+        return
+    states = worker.file_states()
+    done = [p for p in paths if states.get(p, {}).get("state") in ("indexed", "failed")]
+    st.progress(len(done) / len(paths), text=f"Indexed {len(done)}/{len(paths)} uploaded file(s)")
+    for path in paths:
+        state = states.get(path, {})
+        label = state.get("state", "queued")
+        if label == "indexed":
+            st.caption(f"✓ {os.path.basename(path)}: {state['chunks']} chunks")
+        elif label == "failed":
+            st.caption(f"❌ {os.path.basename(path)}: {state['error']}")
+        else:
+            st.caption(f"… {os.path.basename(path)}: {label}")
+    stats = worker.stats()
+    if stats["busy_s"]:
+        queued = f" ({stats['queued']} queued)" if stats["queued"] else ""
+        st.caption(f"Throughput: {stats['files_per_s']:.2f} files/s, "
+                   f"{stats['chunks_per_s']:.1f} chunks/s{queued}")
+
+def source_box_html(number: int, source: str, content: str) -> str:
+    """Source card markup; document text and names come from uploads, so they are escaped."""
+    return f"""
+    <div class="source-box">
+        <strong>Source {number}:</strong> {html.escape(str(source))}<br>
+        <em>{html.escape(content[:200])}...</em>
+    </div>
+    """
+
+def refresh_index(rag_chain: RAGChain):
+    """
+    Rebuild the index from data/ in the background; queries keep using the
+    current version until the swap.
+    """
+    manager = rag_chain.retriever.vector_store_manager
+    
+    def load_documents():
+        all_chunks, loaded_files, dedup_report, _ = load_chunks()
+        stats["loaded_files"] = loaded_files
+        stats["total_chunks"] = len(all_chunks)
+        stats["duplicates_removed"] = dedup_report["removed"]
+        return all_chunks
+    
+    stats = {}
+    st.session_state.index_refresh = (manager.rebuild_async(load_documents), stats)
 
 def main():
     # Header
@@ -148,23 +272,78 @@ def main():
         if "loaded_files" in st.session_state:
             st.success(f"**{len(st.session_state.loaded_files)} documents loaded**")
             st.info(f"**Total chunks:** {st.session_state.total_chunks}")
+            if st.session_state.get("duplicates_removed"):
+                st.caption(f"{st.session_state.duplicates_removed} near-duplicate chunks skipped")
             with st.expander("View all files"):
                 for file in st.session_state.loaded_files:
                     st.write(f"✓ {file}")
         else:
             st.info("Loading documents...")
         
+        st.header("🗂️ Index")
+        rag_chain = st.session_state.get("rag_chain")
+        if rag_chain is not None:
+            manager = rag_chain.retriever.vector_store_manager
+            refresh = st.session_state.get("index_refresh")
+            if refresh is not None and refresh[0].done():
+                future, stats = refresh
+                del st.session_state["index_refresh"]
+                try:
+                    st.success(f"Index version {future.result()} is live")
+                    st.session_state.loaded_files = stats["loaded_files"]
+                    st.session_state.total_chunks = stats["total_chunks"]
+                    st.session_state.duplicates_removed = stats["duplicates_removed"]
+                except Exception as e:
+                    st.error(f"❌ Index refresh failed: {str(e)}")
+            st.caption(f"Serving index version {manager.version}")
+            warmup_status = start_warmup(rag_chain.retriever).status()
+            if warmup_status["hot"]:
+                st.caption(f"🔥 Caches warm ({warmup_status['queries']} queries, "
+                           f"{warmup_status['elapsed_s']:.1f}s)")
+            elif warmup_status["state"] == "warming":
+                st.caption(f"Warming caches: {warmup_status['retrieved']}/"
+                           f"{warmup_status['queries']} queries")
+            _, ingestion_worker = start_auto_ingest(manager)
+            ingest_stats = ingestion_worker.stats()
+            if ingest_stats["files"]:
+                st.caption(
+                    f"Auto-ingested {ingest_stats['files']} changed file(s): "
+                    f"+{ingest_stats['chunks_added']}/-{ingest_stats['chunks_removed']} chunks"
+                    + (f", {ingest_stats['queued']} queued" if ingest_stats["queued"] else "")
+                )
+            if "index_refresh" in st.session_state:
+                st.info("Rebuilding in the background...")
+            elif st.button("🔁 Refresh Index"):
+                refresh_index(rag_chain)
+                st.rerun()
+            
+            st.header("📤 Upload Documents")
+            uploaded_files = st.file_uploader(
+                "Indexed in the background; keep chatting meanwhile",
+                type=UPLOAD_TYPES,
+                accept_multiple_files=True,
+            )
+            watcher, ingestion_worker = start_auto_ingest(manager)
+            submit_uploads(uploaded_files, watcher, ingestion_worker)
+            show_ingestion_progress(ingestion_worker)
+        
         if st.button("🔄 Clear Chat History"):
             st.session_state.messages = []
+            # A fresh session id starts a new conversation memory in the RAG chain
+            st.session_state.session_id = str(uuid.uuid4())
             st.rerun()
     
     # Initialize chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
     
     # Initialize RAG system
     try:
         rag_chain = initialize_rag_system()
+        st.session_state.rag_chain = rag_chain
+        start_warmup(rag_chain.retriever)
         st.success("✅ System Ready!")
     except Exception as e:
         st.error(f"❌ Error initializing system: {str(e)}")
@@ -177,15 +356,14 @@ def main():
             if "sources" in message and message["sources"]:
                 with st.expander("📄 View Sources"):
                     for i, source in enumerate(message["sources"], 1):
-                        st.markdown(f"""
-                        <div class="source-box">
-                            <strong>Source {i}:</strong> {source['source']}<br>
-                            <em>{source['content'][:200]}...</em>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        st.markdown(source_box_html(i, source['source'], source['content']),
+                                    unsafe_allow_html=True)
     
     # Chat input
     if prompt := st.chat_input("Ask me anything about the documents..."):
+        if os.getenv("QUERY_LOG_PATH"):
+            QueryLog(os.environ["QUERY_LOG_PATH"]).record(prompt)
+        
         # Add user message
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
@@ -195,7 +373,7 @@ def main():
         with st.chat_message("assistant"):
             with st.spinner("🤔 Thinking..."):
                 try:
-                    result = rag_chain.answer(prompt)
+                    result = rag_chain.answer(prompt, session_id=st.session_state.session_id)
                     answer = result["answer"]
                     sources = result["source_documents"]
                     
@@ -207,12 +385,8 @@ def main():
                         with st.expander("📄 View Sources"):
                             for i, doc in enumerate(sources, 1):
                                 source_name = doc.metadata.get('source', 'Unknown')
-                                st.markdown(f"""
-                                <div class="source-box">
-                                    <strong>Source {i}:</strong> {source_name}<br>
-                                    <em>{doc.page_content[:200]}...</em>
-                                </div>
-                                """, unsafe_allow_html=True)
+                                st.markdown(source_box_html(i, source_name, doc.page_content),
+                                            unsafe_allow_html=True)
                     
                     # Save to chat history
                     st.session_state.messages.append({
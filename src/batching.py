@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Initialize the dynamic micro-batcher.
+
+        Concurrent submit() calls are collected for up to max_wait_ms (or
+        until max_batch_size items are queued) and handed to batch_fn as a
+        single list, which runs in a worker thread so the event loop stays free.
+
+        Args:
+            batch_fn (Callable[[List[Any]], List[Any]]): Processes a batch and
+                returns one result per item, in order.
+            max_batch_size (int): Largest batch passed to batch_fn.
+            max_wait_ms (float): How long the first item of a batch may wait
+                for company.
+            executor (Executor, optional): Where batch_fn runs. Defaults to the
+                event loop's default executor.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+
+    def start(self):
+        """Start the collector task on the running event loop."""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the collector task; queued items are failed with CancelledError."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result from the next batch."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def stats(self) -> Dict[str, float]:
+        """Batches executed, items processed and batch size figures."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_observed_batch,
+        }
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up while queued do not need a slot in the batch
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logger.exception("Micro-batch of %d items failed", len(items))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            self.max_observed_batch = max(self.max_observed_batch, len(items))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
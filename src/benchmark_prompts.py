@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import timeit
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+from src.prompts import (
+    RAG_SYSTEM_PROMPT, RAG_USER_PROMPT, build_rag_messages, get_conversational_prompt_template,
+    get_rag_prompt_template,
+)
+
+def fresh_template_render(context: str, question: str):
+    # What every call used to pay: build the template, then render it
+    template = ChatPromptTemplate.from_messages(
+        [("system", RAG_SYSTEM_PROMPT), ("human", RAG_USER_PROMPT)]
+    )
+    return template.invoke({"context": context, "question": question})
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RAG prompt render overhead.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--context-chunks", type=int, default=8)
+    args = parser.parse_args()
+
+    context = "\n\n".join(
+        f"Chunk {i}: retrieval pipelines split documents into overlapping chunks." * 10
+        for i in range(args.context_chunks)
+    )
+    question = "How are documents chunked?"
+    history = [
+        HumanMessage(content="What is RAG?"),
+        AIMessage(content="Retrieval-augmented generation."),
+    ]
+    template = get_rag_prompt_template()
+    conversational = get_conversational_prompt_template()
+
+    cases = [
+        ("fresh template", lambda: fresh_template_render(context, question)),
+        ("precompiled template",
+         lambda: template.invoke({"context": context, "question": question})),
+        ("fast path", lambda: build_rag_messages(context, question)),
+        ("precompiled template + history", lambda: conversational.invoke(
+            {"context": context, "history": history, "question": question})),
+        ("fast path + history", lambda: build_rag_messages(context, question, history)),
+    ]
+
+    print(f"--- Prompt render overhead ({args.iterations} iterations) ---")
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=args.iterations, repeat=3))
+        print(f"{name:<32} {seconds / args.iterations * 1e6:8.1f} us/render")
+
+    # The system message must be identical byte for byte for provider prefix caching
+    prefixes = {
+        build_rag_messages(f"context {i}", f"question {i}").to_messages()[0].content.encode("utf-8")
+        for i in range(100)
+    }
+    print(f"\nDistinct system prefixes across 100 requests: {len(prefixes)} "
+          f"({len(RAG_SYSTEM_PROMPT.encode('utf-8'))} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dotenv import load_dotenv
+from src.evaluate import QUERY_CACHE_FILE, RELEVANCE_GATE_FILE, build_retriever
+from src.embedding_cache import QueryEmbeddingCache
+from src.relevance import FEATURE_NAMES, fit_gate, holdout_split, relevance_features
+from src.vectorizer import DEFAULT_EMBEDDING_MODEL
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="Fit the retrieval relevance gate on the eval set."
+    )
+    eval_set = os.path.join(os.path.dirname(__file__), '..', 'data', 'eval_set.json')
+    parser.add_argument("--eval-set", default=eval_set)
+    parser.add_argument("--output", default=RELEVANCE_GATE_FILE)
+    parser.add_argument("--k", type=int, default=8,
+                        help="Chunks retrieved per question (match serving)")
+    parser.add_argument("--min-recall", type=float, default=1.0,
+                        help="Share of answerable questions the threshold must let through")
+    parser.add_argument("--classifier", action="store_true",
+                        help="Also fit the logistic classifier")
+    parser.add_argument("--holdout", type=float, default=0.4,
+                        help="Share of each class kept out of calibration for src/evaluate.py")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the held-out split")
+    args = parser.parse_args()
+
+    with open(args.eval_set, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    queries = [case["question"] for case in cases]
+    answerable = [case.get("type") != "refusal" for case in cases]
+
+    query_cache = QueryEmbeddingCache(model_name=DEFAULT_EMBEDDING_MODEL)
+    query_cache.load(QUERY_CACHE_FILE)
+    print("--> Building index...")
+    retriever = build_retriever(query_cache)
+    retrievals = [retriever.retrieve_with_scores(query, k=args.k) for query in queries]
+
+    calibration, held_out = holdout_split(answerable, args.holdout, args.seed)
+    print(f"--> Calibrating on {len(calibration)} questions, holding out {len(held_out)}")
+    gate = fit_gate([queries[i] for i in calibration], [retrievals[i] for i in calibration],
+                    [answerable[i] for i in calibration], min_recall=args.min_recall,
+                    with_classifier=args.classifier)
+    in_calibration = set(calibration)
+
+    print(f"\n{'split':<7}{'label':<11}{'pass':<6}"
+          + "".join(f"{name:>22}" for name in FEATURE_NAMES) + "  question")
+    for i, (query, retrieval, label) in enumerate(zip(queries, retrievals, answerable)):
+        verdict = gate.assess(query, retrieval)
+        features = relevance_features(query, retrieval)
+        split = "fit" if i in in_calibration else "held"
+        kind = "answerable" if label else "refusal"
+        print(f"{split:<7}{kind:<11}{str(verdict['answerable']):<6}"
+              + "".join(f"{value:>22.3f}" for value in features) + f"  {query[:60]}")
+
+    print(f"\nThreshold: {gate.threshold:.4f}")
+    for name, indices in (("Calibration", calibration), ("Held-out", held_out)):
+        passed = [gate.assess(queries[i], retrievals[i])["answerable"] for i in indices]
+        n_answerable = sum(answerable[i] for i in indices)
+        n_refusal = len(indices) - n_answerable
+        passed_answerable = sum(p for p, i in zip(passed, indices) if answerable[i])
+        refused = sum(not p for p, i in zip(passed, indices) if not answerable[i])
+        print(f"{name}: answerable passed {passed_answerable}/{n_answerable}, "
+              f"refusals short-circuited {refused}/{n_refusal}")
+
+    gate.save(args.output)
+    query_cache.save(QUERY_CACHE_FILE)
+    print(f"--> Saved gate to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+from src.vectorizer import CURRENT_SNAPSHOT_FILE, VectorStoreManager, prune_snapshots
+from src.retrieval import Retriever
+
+logger = logging.getLogger(__name__)
+
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+def estimate_memory_bytes(manager: VectorStoreManager) -> int:
+    """
+    Approximate resident size of a loaded index.
+
+    Counts the FAISS vectors (float32) plus chunk text and metadata; Python
+    object overhead is not included, so treat it as a lower bound.
+    """
+    with manager.acquire() as snapshot:
+        if snapshot.vector_store is None:
+            return 0
+        index = snapshot.vector_store.index
+        total = index.ntotal * index.d * 4
+        docstore = snapshot.vector_store.docstore
+        for doc_id in snapshot.vector_store.index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            total += sys.getsizeof(doc.page_content)
+            total += len(json.dumps(doc.metadata, default=str))
+    return total
+
+class UnknownCollection(KeyError):
+    pass
+
+class _Loaded:
+    def __init__(self, manager: VectorStoreManager, retriever: Retriever, memory_bytes: int):
+        self.manager = manager
+        self.retriever = retriever
+        self.memory_bytes = memory_bytes
+        self.last_used = time.time()
+
+class CollectionManager:
+    def __init__(
+        self,
+        embedding_model: Any,
+        root: str,
+        memory_budget_mb: float = 1024.0,
+        retriever_factory: Optional[Callable[[VectorStoreManager], Retriever]] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_events: int = 256,
+        keep_snapshots: int = 1,
+    ):
+        """
+        Initialize the multi-collection index manager.
+
+        Each collection is a named, independently persisted index under
+        root/<name> (in VectorStoreManager snapshot format). Collections are
+        loaded on first use and kept in LRU order; when the loaded indexes
+        exceed the memory budget, the least recently used ones are evicted
+        (they reload from disk on their next query).
+
+        Args:
+            embedding_model (EmbeddingModel): Model shared by every collection.
+            root (str): Directory holding one sub-directory per collection.
+            memory_budget_mb (float): Resident budget for loaded indexes, as
+                measured by estimate_memory_bytes. The collection being
+                served is never evicted, even if it alone exceeds the budget.
+            retriever_factory (Callable, optional): Builds the Retriever for a
+                loaded collection. Defaults to Retriever(manager).
+            on_event (Callable, optional): Called with every load/evict/create event.
+            max_events (int): Recent events kept for events().
+            keep_snapshots (int): Persisted versions kept per collection,
+                the current one included; older ones are deleted after each
+                write. Raise it to keep versions to roll back to.
+        """
+        self.embedding_model = embedding_model
+        self.root = root
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.retriever_factory = retriever_factory or Retriever
+        self.on_event = on_event
+        self.keep_snapshots = max(keep_snapshots, 1)
+        self._loaded: "OrderedDict[str, _Loaded]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._name_locks: Dict[str, threading.Lock] = {}
+        self._events: deque = deque(maxlen=max_events)
+        self._counters: Dict[str, Dict[str, int]] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def names(self) -> List[str]:
+        """Every persisted collection, loaded or not."""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, CURRENT_SNAPSHOT_FILE))
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._loaded or os.path.exists(
+            os.path.join(self._path(name), CURRENT_SNAPSHOT_FILE)
+        )
+
+    def create(self, name: str, documents: List[Document]) -> VectorStoreManager:
+        """
+        Build (or replace) a collection from documents, persist it and load it.
+
+        Returns:
+            VectorStoreManager: The collection's live index.
+        """
+        with self._name_lock(name):
+            manager = self._create(name, documents)
+        self._enforce_budget(keep=name)
+        return manager
+
+    def add_documents(self, name: str, documents: List[Document]) -> VectorStoreManager:
+        """Append documents to a collection (creating it if needed) and persist it."""
+        path = self._path(name)
+        # Existence check, create and append happen under one name lock, so
+        # concurrent first writes cannot both create (and overwrite) the collection
+        with self._name_lock(name):
+            if not os.path.exists(os.path.join(path, CURRENT_SNAPSHOT_FILE)):
+                manager = self._create(name, documents)
+            else:
+                entry = self._load(name)
+                manager = entry.manager
+                manager.add_documents(documents)
+                self._persist(name, manager)
+                memory_bytes = estimate_memory_bytes(manager)
+                with self._lock:
+                    entry.memory_bytes = memory_bytes
+        self._enforce_budget(keep=name)
+        return manager
+
+    def get(self, name: str) -> VectorStoreManager:
+        """The collection's index, loading it from disk if needed."""
+        return self._entry(name).manager
+
+    def retriever(self, name: str) -> Retriever:
+        """The collection's Retriever, loading the index from disk if needed."""
+        return self._entry(name).retriever
+
+    def evict(self, name: str) -> bool:
+        """Unload a collection (it stays on disk). Returns False if it was not loaded."""
+        with self._lock:
+            entry = self._loaded.pop(name, None)
+        if entry is None:
+            return False
+        close = getattr(entry.retriever, "close", None)
+        if close is not None:
+            close()
+        self._count(name, "evictions")
+        self._emit({
+            "event": "evict", "collection": name,
+            "memory_bytes": entry.memory_bytes, "ts": time.time(),
+        })
+        return True
+
+    def close(self):
+        """Unload every collection, stopping their retrievers' threads."""
+        with self._lock:
+            names = list(self._loaded)
+        for name in names:
+            self.evict(name)
+
+    def drop(self, name: str):
+        """Unload a collection and delete its persisted index."""
+        path = self._path(name)
+        # Under the name lock, so a concurrent load cannot re-admit it half deleted
+        with self._name_lock(name):
+            self.evict(name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+        self._emit({"event": "drop", "collection": name, "ts": time.time()})
+
+    def memory_bytes(self) -> int:
+        """Estimated resident size of every loaded collection."""
+        with self._lock:
+            return sum(entry.memory_bytes for entry in self._loaded.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Budget, usage and per-collection state (loaded, memory, last use, counters)."""
+        with self._lock:
+            loaded = {name: entry for name, entry in self._loaded.items()}
+        collections = {}
+        for name in sorted(set(self.names()) | set(loaded)):
+            entry = loaded.get(name)
+            collections[name] = {
+                "loaded": entry is not None,
+                "memory_bytes": entry.memory_bytes if entry else 0,
+                "last_used": entry.last_used if entry else None,
+                **self._counters.get(name, {"loads": 0, "evictions": 0, "hits": 0}),
+            }
+        return {
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "memory_bytes": sum(entry.memory_bytes for entry in loaded.values()),
+            "loaded": list(loaded),
+            "collections": collections,
+        }
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Recent load/evict/create/drop events, oldest first."""
+        return list(self._events)
+
+    def _entry(self, name: str) -> _Loaded:
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                entry.last_used = time.time()
+                self._count(name, "hits")
+                return entry
+        # Load outside the global lock so other collections keep serving
+        with self._name_lock(name):
+            entry = self._load(name)
+        self._enforce_budget(keep=name)
+        return entry
+
+    def _load(self, name: str) -> _Loaded:
+        """The loaded entry, reading it from disk if needed (caller holds the name lock)."""
+        with self._lock:
+            entry = self._loaded.get(name)
+        if entry is not None:
+            return entry
+        path = self._path(name)
+        if not os.path.exists(os.path.join(path, CURRENT_SNAPSHOT_FILE)):
+            raise UnknownCollection(name)
+        started = time.monotonic()
+        manager = VectorStoreManager(self.embedding_model)
+        manager.load_snapshot(path)
+        entry = self._admit(name, manager)
+        self._count(name, "loads")
+        self._record("load", name, started)
+        return entry
+
+    def _create(self, name: str, documents: List[Document]) -> VectorStoreManager:
+        """Build, persist and load a collection (caller holds the name lock)."""
+        started = time.monotonic()
+        manager = VectorStoreManager(self.embedding_model)
+        manager.create_index(documents)
+        self._persist(name, manager)
+        self._admit(name, manager)
+        self._record("create", name, started, chunks=len(documents))
+        return manager
+
+    def _persist(self, name: str, manager: VectorStoreManager):
+        """Save a new version, then drop superseded ones (caller holds the name lock)."""
+        path = self._path(name)
+        manager.save_snapshot(path)
+        prune_snapshots(path, keep=self.keep_snapshots)
+
+    def _admit(self, name: str, manager: VectorStoreManager) -> _Loaded:
+        entry = _Loaded(manager, self.retriever_factory(manager), estimate_memory_bytes(manager))
+        with self._lock:
+            self._loaded[name] = entry
+            self._loaded.move_to_end(name)
+        return entry
+
+    def _enforce_budget(self, keep: str):
+        """Evict least recently used collections (never keep) until within budget."""
+        while True:
+            with self._lock:
+                if sum(e.memory_bytes for e in self._loaded.values()) <= self.memory_budget_bytes:
+                    return
+                victim = next((name for name in self._loaded if name != keep), None)
+            if victim is None:
+                logger.warning("Collection %s alone exceeds the %d byte budget",
+                               keep, self.memory_budget_bytes)
+                return
+            self.evict(victim)
+
+    def _path(self, name: str) -> str:
+        if not _COLLECTION_NAME.match(name or ""):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        return os.path.join(self.root, name)
+
+    def _name_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._name_locks.setdefault(name, threading.Lock())
+
+    def _count(self, name: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(name, {"loads": 0, "evictions": 0, "hits": 0})
+            counters[counter] += 1
+
+    def _record(self, event: str, name: str, started: float, **extra):
+        with self._lock:
+            entry = self._loaded.get(name)
+        self._emit({
+            "event": event,
+            "collection": name,
+            "memory_bytes": entry.memory_bytes if entry else 0,
+            "duration_ms": round((time.monotonic() - started) * 1000, 2),
+            "ts": time.time(),
+            **extra,
+        })
+
+    def _emit(self, event: Dict[str, Any]):
+        self._events.append(event)
+        logger.info("Collection %s: %s", event["event"], event["collection"])
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception:
+                logger.exception("Collection event callback failed")
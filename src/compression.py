@@ -0,0 +1,136 @@
+import logging
+import re
+from typing import Any, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from src.tokens import TokenCounter, get_token_counter
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends followed by whitespace, or line breaks (headings, list items)
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\s*\n\s*")
+
+def split_sentences(text: str) -> List[str]:
+    """Split chunk text into sentences and standalone lines, dropping blanks."""
+    return [part.strip() for part in _SENTENCE_BREAK.split(text) if part and part.strip()]
+
+class ContextCompressor:
+    def __init__(
+        self,
+        embedding_model: Any,
+        max_tokens: int = 512,
+        neighbors: int = 1,
+        min_similarity: float = 0.2,
+        token_counter: Optional[TokenCounter] = None,
+    ):
+        """
+        Initialize the query-focused extractive compressor.
+
+        Retrieved chunks are split into sentences, which are embedded in one
+        batch and scored against the query with a single matrix product. The
+        best sentences are kept, each with its neighbours for coherence,
+        until the token budget is spent. Kept sentences stay in their chunk
+        and in their original order, so every compressed block keeps its
+        chunk's metadata (source, page, ...).
+
+        Args:
+            embedding_model (EmbeddingModel): Embeds the query (embed_query)
+                and sentences (embed_documents).
+            max_tokens (int): Budget for all kept sentences together.
+            neighbors (int): Sentences kept on each side of a selected one.
+            min_similarity (float): Cosine similarity a sentence needs to be
+                selected; the best sentence is always kept.
+            token_counter (TokenCounter, optional): Defaults to the shared counter.
+        """
+        self.embedding_model = embedding_model
+        self.max_tokens = max_tokens
+        self.neighbors = neighbors
+        self.min_similarity = min_similarity
+        self.token_counter = token_counter
+
+    def compress(self, query: str, docs: List[Document]) -> List[Document]:
+        """
+        Keep only the parts of docs relevant to query.
+
+        Args:
+            query (str): The question the context must answer.
+            docs (List[Document]): Retrieved chunks, best first.
+
+        Returns:
+            List[Document]: One block per chunk with kept sentences, in the
+            input order. Gaps are marked with ' ... '. Metadata is copied and
+            gains 'sentences_kept' and 'sentences_total'.
+        """
+        sentences: List[str] = []
+        owners: List[Tuple[int, int]] = []  # (doc, sentence position in doc)
+        for i, doc in enumerate(docs):
+            for j, sentence in enumerate(split_sentences(doc.page_content)):
+                sentences.append(sentence)
+                owners.append((i, j))
+        if not sentences:
+            return []
+
+        similarities = self._similarities(query, sentences)
+        counter = self.token_counter or get_token_counter()
+        tokens = np.asarray(counter.count_batch(sentences))
+        index_of = {owner: position for position, owner in enumerate(owners)}
+
+        kept: Set[int] = set()
+        used = 0
+        for seed in np.argsort(-similarities, kind="stable"):
+            if kept and similarities[seed] < self.min_similarity:
+                break
+            if seed in kept:
+                continue
+            doc_index, position = owners[seed]
+            group = [seed] + [
+                index_of[(doc_index, position + offset)]
+                for offset in range(-self.neighbors, self.neighbors + 1)
+                if offset and (doc_index, position + offset) in index_of
+            ]
+            new = [s for s in group if s not in kept]
+            cost = int(tokens[new].sum())
+            if used + cost > self.max_tokens:
+                # No room for the neighbours: try the sentence alone. The best
+                # sentence is kept even if it exceeds the budget by itself.
+                new, cost = [seed], int(tokens[seed])
+                if kept and used + cost > self.max_tokens:
+                    continue
+            kept.update(int(s) for s in new)
+            used += cost
+
+        compressed = self._assemble(docs, sentences, owners, kept)
+        total = int(tokens.sum())
+        logger.info("Compressed context from %d to %d tokens (%d of %d sentences)",
+                    total, used, len(kept), len(sentences))
+        return compressed
+
+    def _similarities(self, query: str, sentences: List[str]) -> np.ndarray:
+        """Cosine similarity of every sentence to the query (one embedding batch)."""
+        query_vector = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        vectors = np.asarray(self.embedding_model.embed_documents(sentences), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+        return (vectors @ query_vector) / np.where(norms > 0, norms, 1.0)
+
+    @staticmethod
+    def _assemble(
+        docs: List[Document], sentences: List[str], owners: List[Tuple[int, int]], kept: Set[int]
+    ) -> List[Document]:
+        blocks: List[List[Tuple[int, str]]] = [[] for _ in docs]
+        totals = [0] * len(docs)
+        for position, (doc_index, sentence_index) in enumerate(owners):
+            totals[doc_index] += 1
+            if position in kept:
+                blocks[doc_index].append((sentence_index, sentences[position]))
+
+        compressed = []
+        for doc, block, total in zip(docs, blocks, totals):
+            if not block:
+                continue
+            text = block[0][1]
+            for (previous, _), (index, sentence) in zip(block, block[1:]):
+                text += (" " if index == previous + 1 else " ... ") + sentence
+            metadata = {**doc.metadata, "sentences_kept": len(block), "sentences_total": total}
+            compressed.append(Document(id=doc.id, page_content=text, metadata=metadata))
+        return compressed
@@ -0,0 +1,217 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from src.tokens import get_token_counter
+
+_FOLLOW_UP_RE = re.compile(
+    r"^(and|also|what about|how about|why|so)\b"
+    r"|\b(it|its|they|them|their|this|that|these|those|he|she|him|her)\b",
+    re.IGNORECASE,
+)
+_TOPIC_STOPWORDS = {
+    "what", "which", "who", "how", "why", "when", "where", "is", "are", "was", "were", "do",
+    "does", "did", "the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "can", "could",
+    "should", "would", "about", "with", "it", "this", "that", "i", "we", "you", "me", "tell",
+}
+
+def extractive_summary(previous_summary: str, turns: List[Tuple[str, str]]) -> str:
+    """
+    Default rolling summarizer: keeps the first sentence of each evicted turn.
+
+    Args:
+        previous_summary (str): Summary of turns evicted earlier.
+        turns (List[Tuple[str, str]]): (role, content) turns being evicted.
+
+    Returns:
+        str: The updated summary.
+    """
+    lines = [previous_summary] if previous_summary else []
+    for role, content in turns:
+        first_sentence = re.split(r"(?<=[.!?])\s", content.strip(), maxsplit=1)[0]
+        label = "User asked" if role == "user" else "Assistant answered"
+        lines.append(f"{label}: {first_sentence}")
+    return "\n".join(lines)
+
+class ConversationMemory:
+    def __init__(
+        self,
+        max_history_tokens: int = 800,
+        max_summary_tokens: int = 200,
+        summarizer: Optional[Callable[[str, List[Tuple[str, str]]], str]] = None,
+        length_function: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Initialize a session's conversation memory.
+
+        Recent turns are kept verbatim within max_history_tokens; older turns
+        are folded into a running summary capped at max_summary_tokens, so the
+        history sent with each prompt stays bounded however long the chat runs.
+
+        Args:
+            max_history_tokens (int): Budget for verbatim recent turns.
+            max_summary_tokens (int): Budget for the summary of older turns.
+            summarizer (Callable, optional): (previous_summary, evicted_turns) -> summary.
+                Defaults to extractive_summary; an LLM-backed summarizer fits here too.
+            length_function (Callable[[str], int], optional): Token counter.
+        """
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.summarizer = summarizer or extractive_summary
+        self._length_function = length_function
+        self.turns: Deque[Tuple[str, str, int]] = deque()
+        self.summary = ""
+        self._history_tokens = 0
+        self.last_used = time.monotonic()
+
+    def length(self, text: str) -> int:
+        if self._length_function is None:
+            self._length_function = get_token_counter().count
+        return self._length_function(text)
+
+    def add_turn(self, role: str, content: str):
+        """
+        Append a turn and fold the oldest turns into the summary if over budget.
+
+        A turn longer than max_history_tokens on its own (a pasted document)
+        is truncated to the budget, marked with a trailing ' ...'.
+        """
+        tokens = self.length(content)
+        if tokens > self.max_history_tokens:
+            content = self._truncate(content)
+            tokens = self.length(content)
+        self.turns.append((role, content, tokens))
+        self._history_tokens += tokens
+
+        evicted = []
+        while self._history_tokens > self.max_history_tokens and len(self.turns) > 1:
+            role_, content_, tokens_ = self.turns.popleft()
+            self._history_tokens -= tokens_
+            evicted.append((role_, content_))
+        if evicted:
+            self.summary = self._trim_summary(self.summarizer(self.summary, evicted))
+
+    def _truncate(self, content: str) -> str:
+        # Longest prefix (cut at whitespace when possible) that fits with the marker
+        low, high = 0, len(content)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.length(self._cut(content, middle)) <= self.max_history_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return self._cut(content, low)
+
+    @staticmethod
+    def _cut(content: str, size: int) -> str:
+        prefix = content[:size]
+        space = prefix.rfind(" ")
+        if 0 < space < size and not content[size:size + 1].isspace():
+            prefix = prefix[:space]
+        return prefix.rstrip() + " ..."
+
+    def _trim_summary(self, summary: str) -> str:
+        # Drop the oldest summary lines first; recent context matters most for follow-ups
+        lines = summary.split("\n")
+        while len(lines) > 1 and self.length("\n".join(lines)) > self.max_summary_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def history(self) -> List[Tuple[str, str]]:
+        """Verbatim recent turns as (role, content), oldest first."""
+        return [(role, content) for role, content, _ in self.turns]
+
+    def last_user_turn(self) -> Optional[str]:
+        for role, content, _ in reversed(self.turns):
+            if role == "user":
+                return content
+        return None
+
+class ConversationStore:
+    def __init__(self, max_sessions: int = 1000, ttl_s: float = 3600.0, **memory_kwargs):
+        """
+        Initialize the per-session memory store.
+
+        Sessions are kept in LRU order; the least recently used session is
+        evicted beyond max_sessions, and idle sessions expire after ttl_s.
+
+        Args:
+            max_sessions (int): Maximum resident sessions.
+            ttl_s (float): Idle time after which a session is dropped.
+            **memory_kwargs: Passed to each new ConversationMemory.
+        """
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.memory_kwargs = memory_kwargs
+        self._sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, session_id: str) -> ConversationMemory:
+        """Return the session's memory, creating it if needed."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = ConversationMemory(**self.memory_kwargs)
+                self._sessions[session_id] = memory
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            memory.last_used = now
+            return memory
+
+    def reset(self, session_id: str):
+        """Forget a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, memory = next(iter(self._sessions.items()))
+            if now - memory.last_used <= self.ttl_s:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+def rewrite_query(
+    query: str,
+    memory: ConversationMemory,
+    rewriter: Optional[Callable[[List[Tuple[str, str]], str], str]] = None,
+) -> str:
+    """
+    Make a follow-up question self-contained for retrieval.
+
+    Args:
+        query (str): The user's latest message.
+        memory (ConversationMemory): The session's history.
+        rewriter (Callable, optional): (history, query) -> standalone query,
+            e.g. backed by a small model. Defaults to a rule that appends the
+            previous question's key terms to short or anaphoric follow-ups.
+
+    Returns:
+        str: The query to retrieve with.
+    """
+    history = memory.history()
+    if not history:
+        return query
+    if rewriter is not None:
+        return rewriter(history, query)
+
+    previous = memory.last_user_turn()
+    if not previous:
+        return query
+    if len(query.split()) > 6 and not _FOLLOW_UP_RE.search(query):
+        return query
+    topic = [w for w in re.findall(r"[\w-]+", previous) if w.lower() not in _TOPIC_STOPWORDS]
+    if not topic:
+        return query
+    return f"{query} ({' '.join(topic)})"
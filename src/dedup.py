@@ -0,0 +1,173 @@
+import logging
+import re
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Prime just above 2**32, so (a * x + b) mod p permutes 32-bit shingle hashes.
+# a, b and x are all below 2**32, hence a * x + b <= (2**32 - 1)**2 + 2**32 - 1
+# < 2**64: the product never wraps in uint64 (x is masked to 32 bits to keep it so).
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD = re.compile(r"\w+")
+
+class NearDuplicateFilter:
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 5,
+        mode: str = "drop",
+        seed: int = 1,
+    ):
+        """
+        Initialize the MinHash/LSH near-duplicate filter.
+
+        Args:
+            threshold (float): Estimated Jaccard similarity of word shingles
+                above which two chunks count as near-duplicates.
+            num_perm (int): Number of MinHash permutations.
+            bands (int): Number of LSH bands; num_perm must be divisible by it.
+            shingle_size (int): Words per shingle.
+            mode (str): 'drop' removes duplicates; 'cluster' also keeps only the
+                first chunk of each cluster but records the removed sources on it.
+            seed (int): Seed for the permutation coefficients.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        if mode not in ("drop", "cluster"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.mode = mode
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        """Hashes the word shingles of text to 32-bit integers."""
+        words = _WORD.findall(text.lower())
+        if not words:
+            return np.zeros(1, dtype=np.uint64)
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+
+    def signatures(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        """
+        Computes MinHash signatures for texts.
+
+        Shingle hashes of a whole batch are permuted in one vectorized
+        operation and reduced per text with np.minimum.reduceat.
+
+        Returns:
+            np.ndarray: (len(texts), num_perm) uint64 signature matrix.
+        """
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for start in range(0, len(texts), batch_size):
+            hashed = [self._shingle_hashes(t) for t in texts[start:start + batch_size]]
+            offsets = np.cumsum([0] + [len(h) for h in hashed[:-1]])
+            flat = np.concatenate(hashed) & _MAX_HASH
+            permuted = (np.outer(flat, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+            signatures[start:start + len(hashed)] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return signatures
+
+    def find_clusters(self, texts: List[str]) -> List[List[int]]:
+        """
+        Groups near-duplicate texts.
+
+        Candidate pairs come from LSH band buckets, so the cost stays roughly
+        linear in the number of texts; candidates are confirmed on the full
+        signature before being merged.
+
+        Texts without any word (empty, whitespace or punctuation only) have
+        no shingles to compare and are never clustered.
+
+        Returns:
+            List[List[int]]: Clusters of two or more indices, each sorted ascending.
+        """
+        indices = [i for i, text in enumerate(texts) if _WORD.search(text)]
+        if len(indices) < 2:
+            return []
+        signatures = self.signatures([texts[i] for i in indices])
+        parent = list(range(len(indices)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        checked = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = {}
+            band_rows = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for index, row in enumerate(band_rows):
+                buckets.setdefault(row.tobytes(), []).append(index)
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                head = members[0]
+                others = np.array(members[1:])
+                # Confirm all bucket members against the head in one comparison
+                similarity = (signatures[others] == signatures[head]).mean(axis=1)
+                for other, score in zip(others.tolist(), similarity.tolist()):
+                    if (head, other) in checked:
+                        continue
+                    checked.add((head, other))
+                    if score >= self.threshold:
+                        root_a, root_b = find(head), find(other)
+                        if root_a != root_b:
+                            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        clusters: Dict[int, List[int]] = {}
+        for index in range(len(indices)):
+            clusters.setdefault(find(index), []).append(indices[index])
+        return [sorted(members) for members in clusters.values() if len(members) > 1]
+
+    def filter(self, documents: List[Document]) -> Tuple[List[Document], Dict[str, Any]]:
+        """
+        Removes near-duplicate chunks, keeping the first chunk of each cluster.
+
+        Args:
+            documents (List[Document]): Chunks from TextSplitter.split_documents.
+
+        Returns:
+            Tuple[List[Document], dict]: Kept documents and a report with
+            'input', 'kept', 'removed' counts and per-cluster 'clusters' details.
+        """
+        clusters = self.find_clusters([d.page_content for d in documents])
+        removed = set()
+        details = []
+        for members in clusters:
+            keeper = documents[members[0]]
+            duplicates = [documents[i] for i in members[1:]]
+            removed.update(members[1:])
+            details.append({
+                "kept_source": keeper.metadata.get("source", "unknown"),
+                "kept_snippet": keeper.page_content[:100],
+                "removed_sources": [d.metadata.get("source", "unknown") for d in duplicates],
+            })
+            if self.mode == "cluster":
+                keeper.metadata["duplicate_count"] = len(duplicates)
+                keeper.metadata["duplicate_sources"] = sorted(
+                    {d.metadata.get("source", "unknown") for d in duplicates}
+                )
+
+        kept = [d for i, d in enumerate(documents) if i not in removed]
+        report = {
+            "input": len(documents),
+            "kept": len(kept),
+            "removed": len(removed),
+            "clusters": details,
+        }
+        logger.info("Near-duplicate filter removed %d of %d chunks", len(removed), len(documents))
+        return kept, report
@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: whitespace-collapsed text."""
+    return " ".join(text.split())
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = 10000, model_name: str = ""):
+        """
+        Initialize the LRU cache of query embeddings.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is dropped.
+            model_name (str): Embedding model the vectors belong to; persisted
+                caches for another model are ignored on load.
+        """
+        self.max_entries = max_entries
+        self.model_name = model_name
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, text: str) -> bool:
+        return normalize_query(text) in self._entries
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached vector for text, or None."""
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, vector):
+        """Cache the vector for text."""
+        key = normalize_query(text)
+        with self._lock:
+            self._entries[key] = np.asarray(vector, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, path: str):
+        """Persist the cache to an .npz file (written atomically)."""
+        with self._lock:
+            keys = list(self._entries)
+            if keys:
+                vectors = np.stack(list(self._entries.values()))
+            else:
+                vectors = np.zeros((0, 0), dtype=np.float32)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, keys=np.array(keys, dtype=object), vectors=vectors,
+                 model_name=np.array(self.model_name))
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> int:
+        """
+        Load entries persisted by save().
+
+        Returns:
+            int: Entries loaded (0 if the file is missing or for another model).
+        """
+        if not os.path.exists(path):
+            return 0
+        # The file is written by save() above; object arrays need pickle
+        with np.load(path, allow_pickle=True) as data:
+            if str(data["model_name"]) != self.model_name:
+                logger.info("Ignoring query embedding cache for model %s", data["model_name"])
+                return 0
+            keys, vectors = data["keys"].tolist(), data["vectors"]
+        for key, vector in zip(keys, vectors):
+            self.put(key, vector)
+        return len(keys)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that serves repeated queries from a QueryEmbeddingCache."""
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(text, vector)
+        return list(vector)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed queries, running only the cache misses through the model in one batch."""
+        vectors = [self.cache.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Symmetric models embed queries and documents identically
+            fresh = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                self.cache.put(texts[i], vector)
+                vectors[i] = vector
+        return [list(vector) for vector in vectors]
@@ -6,17 +6,23 @@ from dotenv import load_dotenv
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.ingestion import DocumentLoader, TextCleaner, TextSplitter
-from src.vectorizer import EmbeddingModel, VectorStoreManager
+from src.ingestion import DocumentChunker, DocumentLoader, MetadataTagger
+from src.dedup import NearDuplicateFilter
+from src.vectorizer import DEFAULT_EMBEDDING_MODEL, EmbeddingModel, VectorStoreManager
+from src.embedding_cache import QueryEmbeddingCache
 from src.retrieval import Retriever
 from src.rag import RAGChain
+from src.relevance import RelevanceGate
 
-def setup_rag_system():
-    """Initializes the RAG system by loading data and building the index."""
-    print("--> Initializing System for Evaluation...")
+QUERY_CACHE_FILE = os.path.join(os.path.dirname(__file__), '..', '.cache', 'query_embeddings.npz')
+
+RELEVANCE_GATE_FILE = os.path.join(os.path.dirname(__file__), '..', '.cache', 'relevance_gate.json')
+
+def build_retriever(query_cache=None):
+    """Loads the evaluation corpus and builds its index and retriever."""
     loader = DocumentLoader()
-    cleaner = TextCleaner()
-    splitter = TextSplitter(chunk_size=500, chunk_overlap=50)
+    chunker = DocumentChunker()
+    tagger = MetadataTagger()
     
     data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
     files_to_load = [
@@ -30,21 +36,46 @@ def setup_rag_system():
         file_path = os.path.join(data_dir, filename)
         if os.path.exists(file_path):
             raw_docs = loader.load_file(file_path)
-            for doc in raw_docs:
-                doc.page_content = cleaner.clean(doc.page_content)
-            file_chunks = splitter.split_documents(raw_docs)
+            file_chunks = chunker.split_documents(raw_docs)
+            tagger.tag(file_chunks)
             all_chunks.extend(file_chunks)
+    
+    all_chunks, _ = NearDuplicateFilter().filter(all_chunks)
             
-    embedding_model = EmbeddingModel()
+    embedding_model = EmbeddingModel(query_cache=query_cache)
     manager = VectorStoreManager(embedding_model)
     manager.create_index(all_chunks)
     
-    retriever = Retriever(vector_store_manager=manager)
-    return RAGChain(retriever=retriever)
+    return Retriever(vector_store_manager=manager)
+
+def setup_rag_system(query_cache=None, relevance_gate=None):
+    """Initializes the RAG system by loading data and building the index."""
+    print("--> Initializing System for Evaluation...")
+    retriever = build_retriever(query_cache)
+    return RAGChain(retriever=retriever, relevance_gate=relevance_gate)
 
 def evaluate():
     load_dotenv()
-    rag_chain = setup_rag_system()
+    # Eval questions rarely change; reuse their embeddings from earlier runs
+    query_cache = QueryEmbeddingCache(model_name=DEFAULT_EMBEDDING_MODEL)
+    cached = query_cache.load(QUERY_CACHE_FILE)
+    if cached:
+        print(f"--> Loaded {cached} cached query embeddings")
+    # Calibrated by src/calibrate_relevance.py; refuses without an LLM call.
+    # Cases the gate was fitted on are not scored, so its results stay held-out.
+    relevance_gate = None
+    if os.path.exists(RELEVANCE_GATE_FILE):
+        relevance_gate = RelevanceGate.load(RELEVANCE_GATE_FILE)
+    excluded = set()
+    if relevance_gate is not None:
+        print(f"--> Using relevance gate (threshold {relevance_gate.threshold:.3f})")
+        if relevance_gate.calibration_queries is None:
+            print("--> The gate has no calibration record; re-run src/calibrate_relevance.py. "
+                  "Skipping the gate so results are not scored on its training data.")
+            relevance_gate = None
+        else:
+            excluded = set(relevance_gate.calibration_queries)
+    rag_chain = setup_rag_system(query_cache, relevance_gate)
     
     eval_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'eval_set.json')
     with open(eval_file, 'r') as f:
@@ -54,6 +85,7 @@ def evaluate():
     
     passed_refusals = 0
     total_refusals = 0
+    skipped = 0
     
     output_lines = []
     
@@ -64,6 +96,11 @@ def evaluate():
         
         output_lines.append(f"[{i+1}/{len(test_cases)}] Type: {type_}")
         output_lines.append(f"Q: {question}")
+        if question in excluded:
+            skipped += 1
+            output_lines.append("Result: SKIPPED (relevance gate calibration case)")
+            output_lines.append("-" * 50)
+            continue
         
         try:
             result = rag_chain.answer(question)
@@ -89,8 +126,13 @@ def evaluate():
         output_lines.append("-" * 50)
         
     output_lines.append("\n=== SUMMARY ===")
+    label = "Refusal Accuracy"
+    if relevance_gate is not None:
+        label += " (with relevance gate, held-out cases only)"
+        output_lines.append(f"Skipped {skipped} case(s) the relevance gate was calibrated on.")
     if total_refusals > 0:
-        output_lines.append(f"Refusal Accuracy: {passed_refusals}/{total_refusals} ({passed_refusals/total_refusals*100:.1f}%)")
+        output_lines.append(f"{label}: {passed_refusals}/{total_refusals} "
+                            f"({passed_refusals/total_refusals*100:.1f}%)")
     else:
         output_lines.append("No refusal cases found.")
         
@@ -101,6 +143,8 @@ def evaluate():
     
     with open("eval_output.txt", "w", encoding="utf-8") as f:
         f.write(full_output)
+    
+    query_cache.save(QUERY_CACHE_FILE)
 
 if __name__ == "__main__":
     evaluate()
@@ -1,33 +1,249 @@
 from langchain_community.document_loaders import TextLoader, UnstructuredMarkdownLoader
 from langchain_core.documents import Document
-from typing import List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import os
+import re
+
+def file_extension(file_path: str) -> str:
+    """Lower-cased extension, treating the corpus' odd "name,md" file names as ".md"."""
+    name = os.path.basename(file_path)
+    match = re.search(r'[.,]([A-Za-z0-9]+)$', name)
+    return match.group(1).lower() if match else ""
+
+def iter_text(file_path: str) -> Iterator[Document]:
+    """Plain text and markdown: the whole file as one Document."""
+    yield from TextLoader(file_path, encoding='utf-8').load()
+
+def iter_pdf(file_path: str) -> Iterator[Document]:
+    """
+    Yield one Document per PDF page.
+
+    pypdf resolves page objects on access, so each page is extracted only
+    when the consumer asks for it and chunking can start on page one.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError("PDF loading requires pypdf: pip install pypdf") from e
+    with open(file_path, "rb") as f:
+        reader = PdfReader(f)
+        total_pages = len(reader.pages)
+        for number in range(total_pages):
+            text = reader.pages[number].extract_text() or ""
+            if text.strip():
+                yield Document(
+                    page_content=text,
+                    metadata={"source": file_path, "page": number + 1, "total_pages": total_pages},
+                )
+
+class _HTMLSectionParser(HTMLParser):
+    """Collects visible text into sections that start at h1-h6 headings."""
+    _SKIP = {"script", "style", "noscript", "template", "head"}
+    _HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+    _BLOCKS = {"p", "div", "li", "br", "tr", "section", "article", "pre", "blockquote", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections: List[Tuple[str, str]] = []
+        self._heading = ""
+        self._parts: List[str] = []
+        self._heading_parts: Optional[List[str]] = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._HEADINGS:
+            self._close_section()
+            self._heading_parts = []
+        elif tag in self._BLOCKS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in self._HEADINGS and self._heading_parts is not None:
+            self._heading = " ".join("".join(self._heading_parts).split())
+            self._heading_parts = None
+        elif tag in self._BLOCKS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._heading_parts is not None:
+            self._heading_parts.append(data)
+        else:
+            self._parts.append(data)
+
+    def _close_section(self):
+        text = re.sub(r'\n\s*\n+', '\n\n', "".join(self._parts)).strip()
+        if text:
+            self.sections.append((self._heading, text))
+        self._parts = []
+
+    def close(self):
+        super().close()
+        self._close_section()
+
+def iter_html(file_path: str, block_size: int = 1 << 16) -> Iterator[Document]:
+    """
+    Yield one Document per heading-delimited HTML section.
+
+    The file is fed to the parser in blocks and finished sections are
+    yielded as soon as the next heading starts.
+    """
+    parser = _HTMLSectionParser()
+
+    def drain():
+        for heading, text in parser.sections:
+            yield Document(page_content=text, metadata={"source": file_path, "section": heading})
+        parser.sections.clear()
+
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            parser.feed(block)
+            yield from drain()
+    parser.close()
+    yield from drain()
+
+def iter_docx(file_path: str) -> Iterator[Document]:
+    """Yield one Document per heading-delimited DOCX section (tables included as rows of text)."""
+    try:
+        import docx
+        from docx.table import Table
+    except ImportError as e:
+        raise ImportError("DOCX loading requires python-docx: pip install python-docx") from e
+
+    heading, lines = "", []
+
+    def section():
+        text = "\n".join(line for line in lines if line.strip())
+        if not text:
+            return None
+        return Document(page_content=text, metadata={"source": file_path, "section": heading})
+
+    for block in docx.Document(file_path).iter_inner_content():
+        if isinstance(block, Table):
+            lines.extend(" | ".join(cell.text.strip() for cell in row.cells) for row in block.rows)
+            continue
+        style = block.style.name if block.style is not None else ""
+        if style.startswith("Heading") or style == "Title":
+            doc = section()
+            if doc is not None:
+                yield doc
+            heading, lines = block.text.strip(), []
+        else:
+            lines.append(block.text)
+    doc = section()
+    if doc is not None:
+        yield doc
+
+def _load_file_isolated(file_path: str) -> Tuple[str, List[Document], Optional[str]]:
+    # Module-level so ProcessPoolExecutor can pickle it
+    try:
+        return file_path, DocumentLoader().load_file(file_path), None
+    except Exception as e:
+        return file_path, [], f"{type(e).__name__}: {e}"
 
 class DocumentLoader:
+    # Extension -> streaming parser; extend with register()
+    PARSERS: Dict[str, Callable[[str], Iterator[Document]]] = {
+        "md": iter_text,
+        "markdown": iter_text,
+        "txt": iter_text,
+        "pdf": iter_pdf,
+        "html": iter_html,
+        "htm": iter_html,
+        "docx": iter_docx,
+    }
+
+    def __init__(self, parsers: Optional[Dict[str, Callable[[str], Iterator[Document]]]] = None):
+        """
+        Initialize the loader.
+        
+        Args:
+            parsers (dict, optional): Extra or overriding extension -> parser
+                entries for this loader only.
+        """
+        self.parsers = dict(self.PARSERS)
+        if parsers:
+            self.parsers.update(
+                {ext.lower().lstrip("."): parser for ext, parser in parsers.items()}
+            )
+
+    @classmethod
+    def register(cls, extensions: Iterable[str], parser: Callable[[str], Iterator[Document]]):
+        """Register a parser for file extensions on every loader."""
+        for ext in extensions:
+            cls.PARSERS[ext.lower().lstrip(".")] = parser
+
+    def supports(self, file_path: str) -> bool:
+        """Whether a parser is registered for the file's extension."""
+        return file_extension(file_path) in self.parsers
+
+    def iter_file(self, file_path: str) -> Iterator[Document]:
+        """
+        Stream a file's Documents (pages for PDF, sections for HTML/DOCX).
+        
+        Args:
+            file_path (str): The path to the file.
+            
+        Yields:
+            Document: One page or section at a time, with 'source' metadata.
+            
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If no parser is registered for the extension.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        parser = self.parsers.get(file_extension(file_path))
+        if parser is None:
+            raise ValueError(f"No loader registered for {file_path}")
+        return parser(file_path)
+
     def load_file(self, file_path: str) -> List[Document]:
         """
-        Loads a markdown or text file and returns a list of Documents.
+        Loads a supported file and returns a list of Documents.
+        
+        Markdown and text files load as a single Document; PDF, HTML and
+        DOCX files load as one Document per page or section.
         
         Args:
             file_path (str): The absolute path to the file.
             
         Returns:
-            List[Document]: A list containing the loaded document.
+            List[Document]: The loaded documents.
             
         Raises:
             FileNotFoundError: If the file does not exist.
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        return list(self.iter_file(file_path))
+
+    def load_files_parallel(
+        self, file_paths: List[str], max_workers: Optional[int] = None
+    ) -> Iterator[Tuple[str, List[Document], Optional[str]]]:
+        """
+        Parse files in a process pool, yielding each as soon as it is done.
+        
+        A file that fails to parse yields an error message instead of
+        aborting the batch. Workers use the class-level registry, so parsers
+        passed to this loader's constructor are not available there.
+        
+        Args:
+            file_paths (List[str]): Files to load.
+            max_workers (int, optional): Pool size. Defaults to the CPU count.
             
-        # Basic text loading for now, can be enhanced with UnstructuredMarkdownLoader if needed
-        # but standard TextLoader is safer for raw content control as per guidelines.
-        try:
-            loader = TextLoader(file_path, encoding='utf-8')
-            return loader.load()
-        except Exception as e:
-            # Fallback or specific handling could go here
-            raise e
+        Yields:
+            Tuple[str, List[Document], Optional[str]]: (path, documents, error).
+        """
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_load_file_isolated, path) for path in file_paths]
+            for future in as_completed(futures):
+                yield future.result()
 
 class TextCleaner:
     def clean(self, text: str) -> str:
@@ -59,17 +275,87 @@ class TextCleaner:
         # Strip leading/trailing whitespace
         return text.strip()
 
+class MetadataTagger:
+    def __init__(self, tags: Optional[List[str]] = None, **extra):
+        """
+        Initialize the metadata tagger.
+        
+        Args:
+            tags (List[str], optional): Custom tags attached to every chunk
+                (e.g. a team or collection name), usable as retrieval filters.
+            **extra: Additional fixed metadata fields to attach.
+        """
+        self.tags = list(tags or [])
+        self.extra = extra
+
+    def tag(self, documents: List[Document], ingested_at: Optional[str] = None) -> List[Document]:
+        """
+        Stamps filterable metadata onto chunks in place.
+        
+        Adds 'doc_type' (file extension), 'section' (if not already set by the
+        splitter), 'ingested_at' (ISO timestamp), 'ingested_date' (YYYY-MM-DD)
+        and 'tags', alongside the loader's 'source'.
+        
+        Args:
+            documents (List[Document]): Chunks to tag.
+            ingested_at (str, optional): ISO timestamp; defaults to now (UTC).
+            
+        Returns:
+            List[Document]: The same documents.
+        """
+        from datetime import datetime, timezone
+        if ingested_at is None:
+            ingested_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        for doc in documents:
+            doc.metadata.setdefault("doc_type", file_extension(doc.metadata.get("source", "")))
+            doc.metadata.setdefault("section", "")
+            doc.metadata["ingested_at"] = ingested_at
+            doc.metadata["ingested_date"] = ingested_at[:10]
+            doc.metadata["tags"] = sorted(set(doc.metadata.get("tags", [])) | set(self.tags))
+            for key, value in self.extra.items():
+                doc.metadata.setdefault(key, value)
+        return documents
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from bisect import bisect_right
+from src.tokens import TokenCounter, describe_token_counts, get_token_counter
+
+# Preferred chunk boundaries in token mode, strongest first
+_TOKEN_BOUNDARIES = ["\n\n", "\n", ". ", " "]
+
+# Chunk size used by the ingestion pipelines (about 500 characters of English)
+PIPELINE_CHUNK_TOKENS = 128
+PIPELINE_CHUNK_OVERLAP_TOKENS = 16
 
 class TextSplitter:
-    def __init__(self, chunk_size: int = 400, chunk_overlap: int = 50):
+    def __init__(
+        self,
+        chunk_size: int = 400,
+        chunk_overlap: int = 50,
+        length_unit: str = "chars",
+        encoding_name: str = "cl100k_base",
+        token_counter: Optional[TokenCounter] = None,
+    ):
         """
         Initialize the text splitter.
         
         Args:
-            chunk_size (int): Check size in characters (approx tokens).
-            chunk_overlap (int): Overlap size.
+            chunk_size (int): Check size in characters (approx tokens), or in
+                tokens when length_unit is 'tokens'.
+            chunk_overlap (int): Overlap size, in the same unit as chunk_size.
+            length_unit (str): 'chars' or 'tokens'.
+            encoding_name (str): tiktoken encoding used in token mode.
+            token_counter (TokenCounter, optional): Counter to use in token mode.
+                Defaults to the shared cached counter for encoding_name.
         """
+        if length_unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown length_unit: {length_unit}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+        self.token_counter = token_counter
+        if length_unit == "tokens" and token_counter is None:
+            self.token_counter = get_token_counter(encoding_name)
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -79,8 +365,457 @@ class TextSplitter:
 
     def split_text(self, text: str) -> List[str]:
         """Splits text into chunks."""
+        if self.length_unit == "tokens":
+            return [chunk for chunk, _ in self._split_tokens(text, self.token_counter.encode(text))]
         return self.splitter.split_text(text)
         
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Splits a list of documents into chunks."""
-        return self.splitter.split_documents(documents)
+        if self.length_unit != "tokens":
+            return self.splitter.split_documents(documents)
+
+        # One batched encode per document; candidate boundaries are then
+        # resolved against the token offsets instead of re-encoding substrings.
+        encoded = self.token_counter.encode_batch([doc.page_content for doc in documents])
+        chunks = []
+        for doc, tokens in zip(documents, encoded):
+            for chunk_text, token_count in self._split_tokens(doc.page_content, tokens):
+                metadata = dict(doc.metadata)
+                metadata["token_count"] = token_count
+                chunks.append(Document(page_content=chunk_text, metadata=metadata))
+        return chunks
+
+    def _split_tokens(self, text: str, tokens: List[int]) -> List[Tuple[str, int]]:
+        """Cuts text into windows of at most chunk_size tokens, snapped to natural boundaries."""
+        if not tokens:
+            return []
+        starts = self.token_counter.token_offsets(tokens)
+        total = len(tokens)
+        chunks = []
+        begin = 0
+        while begin < total:
+            end = min(begin + self.chunk_size, total)
+            if end < total:
+                end = self._snap_boundary(text, starts, begin, end)
+            char_end = starts[end] if end < total else len(text)
+            chunk_text = text[starts[begin]:char_end].strip()
+            if chunk_text:
+                chunks.append((chunk_text, end - begin))
+            if end >= total:
+                break
+            begin = max(end - self.chunk_overlap, begin + 1)
+        return chunks
+
+    def _snap_boundary(self, text: str, starts: List[int], begin: int, end: int) -> int:
+        """Moves end back to the strongest separator in the second half of the window."""
+        window_start, window_end = starts[begin], starts[end]
+        floor = starts[begin + (end - begin) // 2]
+        for separator in _TOKEN_BOUNDARIES:
+            position = text.rfind(separator, floor, window_end)
+            if position > window_start:
+                # Token holding the first character after the separator
+                boundary = bisect_right(starts, position + len(separator), begin + 1, end + 1) - 1
+                if begin < boundary <= end:
+                    return boundary
+        return end
+
+    def token_distribution(self, chunks: List[Document]) -> dict:
+        """
+        Reports the token count distribution of split chunks.
+        
+        Args:
+            chunks (List[Document]): Output of split_documents.
+            
+        Returns:
+            dict: count, min, max, mean, p50, p90 and p99 token counts.
+        """
+        counts = [c.metadata.get("token_count") for c in chunks]
+        if any(count is None for count in counts):
+            counter = self.token_counter or get_token_counter()
+            counts = counter.count_batch([c.page_content for c in chunks])
+        return describe_token_counts(counts)
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^\s*(```|~~~)')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+def _locate_chunks(text: str, chunks: List[str], overlap: int) -> List[Tuple[str, int]]:
+    """Pairs each chunk with its character offset in text (chunks are in order)."""
+    located, cursor = [], 0
+    for chunk in chunks:
+        start = text.find(chunk, max(cursor - overlap, 0))
+        if start == -1:
+            start = text.find(chunk)
+        located.append((chunk, start))
+        if start != -1:
+            cursor = start + len(chunk)
+    return located
+
+class ParentChildSplitter:
+    def __init__(
+        self,
+        parent_chunk_size: int = 2000,
+        child_chunk_size: int = 400,
+        child_chunk_overlap: int = 50,
+    ):
+        """
+        Initialize the small-to-big splitter.
+
+        Documents are cut into large parent sections, and each parent into
+        small child chunks. Only children are embedded; each child records
+        its parent's id and character offsets so a retriever can swap hits
+        for their parents with a dictionary lookup instead of a second search.
+
+        Args:
+            parent_chunk_size (int): Parent section size in characters.
+            child_chunk_size (int): Child chunk size in characters.
+            child_chunk_overlap (int): Overlap between children of one parent.
+        """
+        if child_chunk_size > parent_chunk_size:
+            raise ValueError("child_chunk_size must not exceed parent_chunk_size")
+        self.parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=parent_chunk_size, chunk_overlap=0, length_function=len,
+        )
+        self.child_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=child_chunk_size, chunk_overlap=child_chunk_overlap, length_function=len,
+        )
+        self.child_chunk_overlap = child_chunk_overlap
+
+    @staticmethod
+    def parent_id(metadata: dict, start: int) -> str:
+        """Stable id of the parent starting at start in the document described by metadata."""
+        source = metadata.get("source", "")
+        page = metadata.get("page")
+        return f"{source}#p{page}:{start}" if page is not None else f"{source}:{start}"
+
+    def split_documents(self, documents: List[Document]) -> Tuple[List[Document], List[Document]]:
+        """
+        Splits documents into child chunks and their parent sections.
+
+        Parents get 'parent_id', 'start_index' and 'end_index' (offsets in the
+        source document). Children get the same 'parent_id', their own
+        'start_index'/'end_index' and the parent's as 'parent_start'/'parent_end'.
+
+        Returns:
+            Tuple[List[Document], List[Document]]: (children, parents).
+        """
+        children, parents = [], []
+        for doc in documents:
+            text = doc.page_content
+            parent_texts = self.parent_splitter.split_text(text)
+            for parent_text, parent_start in _locate_chunks(text, parent_texts, 0):
+                if parent_start == -1:
+                    continue
+                parent_end = parent_start + len(parent_text)
+                parent_id = self.parent_id(doc.metadata, parent_start)
+                metadata = dict(doc.metadata)
+                metadata.update(parent_id=parent_id, start_index=parent_start, end_index=parent_end)
+                parents.append(Document(page_content=parent_text, metadata=metadata))
+
+                child_texts = self.child_splitter.split_text(parent_text)
+                located = _locate_chunks(parent_text, child_texts, self.child_chunk_overlap)
+                for child_text, offset in located:
+                    if offset == -1:
+                        continue
+                    child_metadata = dict(metadata)
+                    child_metadata.update(
+                        start_index=parent_start + offset,
+                        end_index=parent_start + offset + len(child_text),
+                        parent_start=parent_start,
+                        parent_end=parent_end,
+                    )
+                    children.append(Document(page_content=child_text, metadata=child_metadata))
+        return children, parents
+
+class MarkdownSplitter:
+    def __init__(
+        self,
+        chunk_size: int = 400,
+        length_function: Optional[Callable[[str], int]] = None,
+        encoding_name: str = "cl100k_base",
+        include_headings: bool = True,
+    ):
+        """
+        Initialize the structure-aware markdown splitter.
+        
+        Chunks never cross a heading boundary, and code blocks and tables are
+        kept whole unless they alone exceed the chunk size. Run it on the raw
+        file content: `TextCleaner.clean` collapses the blank lines that
+        delimit markdown blocks.
+        
+        Args:
+            chunk_size (int): Maximum chunk size in tokens.
+            length_function (Callable[[str], int], optional): Custom length
+                function. Defaults to a tiktoken token count.
+            encoding_name (str): tiktoken encoding used by the default length function.
+            include_headings (bool): Prefix each chunk with its nearest heading.
+        """
+        self.chunk_size = chunk_size
+        self.encoding_name = encoding_name
+        self.include_headings = include_headings
+        self._length_function = length_function
+
+    def length(self, text: str) -> int:
+        """Returns the size of text in tokens."""
+        if self._length_function is None:
+            self._length_function = get_token_counter(self.encoding_name).count
+        return self._length_function(text)
+
+    def parse_blocks(self, text: str) -> List[Tuple[str, str, Tuple[str, ...]]]:
+        """
+        Parses markdown into blocks in a single pass over its lines.
+        
+        Args:
+            text (str): Raw markdown text.
+            
+        Returns:
+            List[Tuple[str, str, Tuple[str, ...]]]: (block_type, text, heading_path)
+            triples, where block_type is 'paragraph', 'code' or 'table'.
+        """
+        blocks = []
+        headings: List[Tuple[int, str]] = []
+        current: List[str] = []
+        current_type = None
+        fence = None
+
+        def flush():
+            nonlocal current, current_type
+            if current:
+                if current_type == 'code':
+                    body = "\n".join(current)
+                else:
+                    body = "\n".join(re.sub(r'[ \t]+', ' ', line).strip() for line in current)
+                if body.strip():
+                    path = tuple(title for _, title in headings)
+                    blocks.append((current_type, body.strip('\n'), path))
+            current = []
+            current_type = None
+
+        for line in text.splitlines():
+            if fence is not None:
+                current.append(line)
+                if line.strip().startswith(fence):
+                    fence = None
+                    flush()
+                continue
+
+            fence_match = _FENCE_RE.match(line)
+            if fence_match:
+                flush()
+                fence = fence_match.group(1)
+                current_type = 'code'
+                current.append(line)
+                continue
+
+            heading_match = _HEADING_RE.match(line)
+            if heading_match:
+                flush()
+                level = len(heading_match.group(1))
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, heading_match.group(2)))
+                continue
+
+            if not line.strip():
+                flush()
+                continue
+
+            line_type = 'table' if line.lstrip().startswith('|') else 'paragraph'
+            if current_type is not None and current_type != line_type:
+                flush()
+            current_type = line_type
+            current.append(line)
+
+        # An unterminated fence still yields its content
+        flush()
+        return blocks
+
+    def _split_oversized(self, block_type: str, body: str, budget: int) -> List[str]:
+        """Breaks a single block that exceeds the token budget into smaller pieces."""
+        if block_type == 'paragraph':
+            units = [s for s in _SENTENCE_RE.split(body) if s]
+            joiner = " "
+            if any(self.length(u) > budget for u in units):
+                units = body.split()
+        else:
+            units = body.split("\n")
+            joiner = "\n"
+
+        # Tables repeat their header rows and code keeps its fences in every piece
+        prefix: List[str] = []
+        suffix: List[str] = []
+        if block_type == 'table' and len(units) > 2:
+            prefix, units = units[:2], units[2:]
+        elif block_type == 'code' and len(units) > 2:
+            prefix, units, suffix = units[:1], units[1:-1], units[-1:]
+
+        # Sizes are accumulated per unit rather than re-measuring the joined text
+        joiner_size = self.length(joiner)
+        frame_size = sum(self.length(u) + joiner_size for u in prefix + suffix)
+        allowance = budget - frame_size - joiner_size
+        units = [piece for unit in units for piece in self._break_unit(unit, allowance)]
+        pieces = []
+        current: List[str] = []
+        current_size = frame_size
+        for unit in units:
+            unit_size = self.length(unit) + joiner_size
+            if current and current_size + unit_size > budget:
+                pieces.append(joiner.join(prefix + current + suffix))
+                current = []
+                current_size = frame_size
+            current.append(unit)
+            current_size += unit_size
+        if current:
+            pieces.append(joiner.join(prefix + current + suffix))
+        return pieces
+
+    def _break_unit(self, unit: str, budget: int) -> List[str]:
+        """Cuts a single line or word longer than budget, at spaces where possible."""
+        budget = max(budget, 1)
+        pieces = []
+        rest = unit
+        while self.length(rest) > budget:
+            # Longest prefix that fits, found by bisecting on characters
+            low, high = 1, len(rest)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.length(rest[:middle]) <= budget:
+                    low = middle
+                else:
+                    high = middle - 1
+            cut = rest.rfind(" ", 0, low + 1)
+            if cut <= 0:
+                cut = low
+            pieces.append(rest[:cut].rstrip())
+            rest = rest[cut:].lstrip()
+        if rest:
+            pieces.append(rest)
+        return pieces
+
+    def _chunk_section(self, section_blocks: List[Tuple[str, str]], heading: str) -> List[str]:
+        """Packs the blocks of one section into chunks of at most chunk_size tokens."""
+        header = f"{heading}\n\n" if heading else ""
+        budget = self.chunk_size - (self.length(header) if header else 0)
+
+        separator_size = self.length("\n\n")
+        chunks = []
+        current: List[str] = []
+        current_size = 0
+        for block_type, body in section_blocks:
+            body_size = self.length(body)
+            if body_size <= budget:
+                pieces = [(body, body_size)]
+            else:
+                pieces = [
+                    (p, self.length(p)) for p in self._split_oversized(block_type, body, budget)
+                ]
+            for piece, piece_size in pieces:
+                if current and current_size + separator_size + piece_size > budget:
+                    chunks.append(header + "\n\n".join(current))
+                    current = []
+                    current_size = 0
+                current_size += piece_size + (separator_size if current else 0)
+                current.append(piece)
+        if current:
+            chunks.append(header + "\n\n".join(current))
+        return chunks
+
+    def split_text(self, text: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        Splits markdown text into section-aligned chunks.
+        
+        Args:
+            text (str): Raw markdown text.
+            
+        Returns:
+            List[Tuple[str, Tuple[str, ...]]]: (chunk_text, heading_path) pairs.
+        """
+        chunks = []
+        section_blocks: List[Tuple[str, str]] = []
+        section_path: Optional[Tuple[str, ...]] = None
+
+        def flush_section():
+            if section_blocks:
+                heading = ""
+                if self.include_headings and section_path:
+                    heading = section_path[-1]
+                for chunk in self._chunk_section(section_blocks, heading):
+                    chunks.append((chunk, section_path))
+
+        for block_type, body, path in self.parse_blocks(text):
+            if path != section_path:
+                flush_section()
+                section_blocks = []
+                section_path = path
+            section_blocks.append((block_type, body))
+        flush_section()
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Splits documents into chunks carrying their heading path as metadata.
+        
+        Each chunk gets 'heading_path' (headings joined with ' > '), 'section'
+        (the innermost heading) and 'chunk_index' on top of the parent metadata.
+        """
+        chunks = []
+        for doc in documents:
+            for index, (chunk_text, path) in enumerate(self.split_text(doc.page_content)):
+                metadata = dict(doc.metadata)
+                metadata["heading_path"] = " > ".join(path or ())
+                metadata["section"] = path[-1] if path else ""
+                metadata["chunk_index"] = index
+                chunks.append(Document(page_content=chunk_text, metadata=metadata))
+        return chunks
+
+class DocumentChunker:
+    def __init__(
+        self,
+        splitter: Optional[TextSplitter] = None,
+        markdown_splitter: Optional[MarkdownSplitter] = None,
+        cleaner: Optional[TextCleaner] = None,
+    ):
+        """
+        Initialize the chunk builder shared by the ingestion pipelines.
+
+        Markdown sources go through MarkdownSplitter on their raw text, so
+        chunks follow headings and keep code blocks and tables whole. Every
+        other document is cleaned and cut by the TextSplitter. Both are sized
+        in tokens by default (PIPELINE_CHUNK_TOKENS) and share one counter.
+
+        Args:
+            splitter (TextSplitter, optional): Splitter for non-markdown documents.
+            markdown_splitter (MarkdownSplitter, optional): Splitter for .md sources.
+            cleaner (TextCleaner, optional): Cleaner for non-markdown documents.
+        """
+        self.splitter = splitter or TextSplitter(
+            chunk_size=PIPELINE_CHUNK_TOKENS,
+            chunk_overlap=PIPELINE_CHUNK_OVERLAP_TOKENS,
+            length_unit="tokens",
+        )
+        if markdown_splitter is None:
+            counter = self.splitter.token_counter
+            markdown_splitter = MarkdownSplitter(
+                chunk_size=PIPELINE_CHUNK_TOKENS,
+                length_function=counter.count if counter is not None else None,
+            )
+        self.markdown_splitter = markdown_splitter
+        self.cleaner = cleaner or TextCleaner()
+
+    @staticmethod
+    def is_markdown(doc: Document) -> bool:
+        return file_extension(doc.metadata.get("source", "")) in ("md", "markdown")
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Splits loaded documents into chunks, in order."""
+        chunks = []
+        for doc in documents:
+            if self.is_markdown(doc):
+                chunks.extend(self.markdown_splitter.split_documents([doc]))
+            else:
+                cleaned = Document(
+                    page_content=self.cleaner.clean(doc.page_content),
+                    metadata=dict(doc.metadata),
+                )
+                chunks.extend(self.splitter.split_documents([cleaned]))
+        return chunks
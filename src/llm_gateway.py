@@ -0,0 +1,276 @@
+import functools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+@functools.lru_cache(maxsize=None)
+def get_http_client(
+    max_connections: int = 32, max_keepalive: int = 16, timeout_s: float = 60.0
+) -> httpx.Client:
+    """
+    Returns the process-wide pooled HTTP client for LLM providers.
+
+    Sharing one client keeps TLS connections alive across requests and
+    RAGChain instances instead of reconnecting per call.
+    """
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_keepalive
+        ),
+        timeout=httpx.Timeout(timeout_s, connect=10.0),
+    )
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the token-bucket rate limiter.
+
+        Args:
+            rate (float): Tokens (requests) added per second.
+            capacity (float, optional): Burst size. Defaults to rate.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a token is available.
+
+        Args:
+            timeout (float, optional): Give up after this many seconds.
+
+        Returns:
+            bool: True if a token was taken, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_s = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_s = min(wait_s, remaining)
+            time.sleep(wait_s)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception) -> bool:
+    """Transport failures, timeouts, 429s and 5xx responses are worth retrying."""
+    if isinstance(error, (httpx.TransportError, TimeoutError)):
+        return True
+    # Provider SDKs wrap transport failures in their own connection errors
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+class LLMGateway:
+    def __init__(
+        self,
+        llm: Any,
+        max_concurrency: int = 8,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_retries: int = 3,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 8.0,
+        deadline_s: float = 60.0,
+        hedge_after_s: Optional[float] = None,
+    ):
+        """
+        Initialize the LLM gateway.
+
+        Every call passes through a concurrency cap and an optional
+        token-bucket rate limit, is retried with exponential backoff and full
+        jitter on retryable errors (honouring Retry-After), and never runs
+        past its deadline. With hedge_after_s set, an attempt that has not
+        returned by then is raced against a duplicate request.
+
+        Args:
+            llm: Chat model exposing invoke(messages).
+            max_concurrency (int): Maximum in-flight calls.
+            rate_per_second (float, optional): Request rate limit; None disables it.
+            burst (float, optional): Rate limiter burst size.
+            max_retries (int): Retries after the first attempt.
+            backoff_base_s (float): First backoff ceiling.
+            backoff_max_s (float): Largest backoff ceiling.
+            deadline_s (float): Default total time budget per call.
+            hedge_after_s (float, optional): Delay before sending a hedge request.
+        """
+        self.llm = llm
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.deadline_s = deadline_s
+        self.hedge_after_s = hedge_after_s
+        self.rate_limiter = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = None
+        if hedge_after_s is not None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_concurrency * 2, thread_name_prefix="llm-hedge"
+            )
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0, "retries": 0, "rate_limited": 0,
+            "hedges": 0, "hedge_wins": 0, "failures": 0,
+        }
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for calls, retries, 429s, hedges sent/won and failures."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def invoke(self, messages: Any, deadline_s: Optional[float] = None) -> Any:
+        """
+        Call the LLM under the gateway's policies.
+
+        Args:
+            messages: Prompt passed to llm.invoke.
+            deadline_s (float, optional): Overrides the default call budget.
+
+        Returns:
+            The LLM response.
+
+        Raises:
+            TimeoutError: If no slot or rate-limit token frees up, or (with
+                hedging) no attempt returns, before the deadline.
+            Exception: The last provider error once retries or time run out.
+        """
+        deadline = time.monotonic() + (deadline_s if deadline_s is not None else self.deadline_s)
+        self._count("calls")
+        if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self._count("failures")
+            raise TimeoutError("LLM gateway saturated: no free slot before the deadline")
+        try:
+            return self._invoke_with_retries(messages, deadline)
+        finally:
+            self._slots.release()
+
+    def _invoke_with_retries(self, messages: Any, deadline: float) -> Any:
+        attempt = 0
+        while True:
+            remaining = max(deadline - time.monotonic(), 0)
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=remaining):
+                self._count("failures")
+                raise TimeoutError("LLM gateway rate limit: no token before the deadline")
+            try:
+                return self._attempt(messages, deadline)
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if _status_code(e) == 429:
+                    self._count("rate_limited")
+                    if self.rate_limiter is not None and retry_after:
+                        self.rate_limiter.pause(retry_after)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count("failures")
+                    raise
+                ceiling = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
+                delay = random.uniform(0, ceiling)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    self._count("failures")
+                    raise
+                logger.warning("LLM call failed (%s); retry %d in %.2fs", e, attempt + 1, delay)
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def _attempt(self, messages: Any, deadline: float) -> Any:
+        if self._executor is None:
+            return self.llm.invoke(messages)
+
+        primary = self._executor.submit(self.llm.invoke, messages)
+        remaining = max(deadline - time.monotonic(), 0)
+        done, _ = wait([primary], timeout=min(self.hedge_after_s, remaining))
+        if done:
+            return primary.result()
+        # Only hedge when the rate limit allows an extra request
+        hedging = time.monotonic() < deadline and (
+            self.rate_limiter is None or self.rate_limiter.try_acquire()
+        )
+        pending = {primary}
+        hedge = None
+        if hedging:
+            self._count("hedges")
+            hedge = self._executor.submit(self.llm.invoke, messages)
+            pending.add(hedge)
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                self._cancel(pending)
+                raise TimeoutError("LLM call did not return before the deadline")
+            for future in done:
+                if future.exception() is None:
+                    self._cancel(pending)
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    def _cancel(futures):
+        # Requests still queued are dropped; a running request finishes in the
+        # background and its result is discarded
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+PROVIDERS = ("groq", "stub", "local")
+
+_STUB_VOCABULARY = (
+    "the", "retrieval", "context", "documents", "chunk", "index", "answer", "system",
+    "enterprise", "pipeline", "embedding", "vector", "query", "model", "source", "data",
+)
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline chat model with configurable latency and deterministic output.
+
+    The same prompt always yields the same tokens, so load tests and CI runs
+    exercise the whole pipeline without a network or an API key.
+    """
+    first_token_latency_s: float = 0.05
+    token_latency_s: float = 0.005
+    max_tokens: int = 32
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        words = [rng.choice(_STUB_VOCABULARY) for _ in range(self.max_tokens)]
+        return [words[0]] + [" " + w for w in words[1:]]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.first_token_latency_s + self.token_latency_s * max(len(tokens) - 1, 0))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for index, token in enumerate(self._tokens(messages)):
+            time.sleep(self.first_token_latency_s if index == 0 else self.token_latency_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+def create_llm(
+    provider: Optional[str] = None, model_name: Optional[str] = None, **kwargs
+) -> BaseChatModel:
+    """
+    Build a chat model for a provider.
+
+    Args:
+        provider (str, optional): 'groq', 'stub' or 'local'. Defaults to the
+            LLM_PROVIDER environment variable, then 'groq'.
+        model_name (str, optional): Groq model name, or the GGUF model path for 'local'
+            (falls back to LOCAL_MODEL_PATH).
+        **kwargs: Passed to the model constructor. For 'stub', latencies default
+            to STUB_FIRST_TOKEN_MS and STUB_TOKEN_MS when set.
+
+    Returns:
+        BaseChatModel: The chat model.
+    """
+    provider = provider or os.getenv("LLM_PROVIDER", "groq")
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        from src.llm_gateway import get_http_client
+        # Uses GROQ_API_KEY from environment. Retries are left to the gateway
+        # so backoff and deadlines are applied in one place.
+        kwargs.setdefault("max_retries", 0)
+        kwargs.setdefault("http_client", get_http_client())
+        return ChatGroq(model=model_name or "llama-3.3-70b-versatile", temperature=0, **kwargs)
+
+    if provider == "stub":
+        if os.getenv("STUB_FIRST_TOKEN_MS"):
+            kwargs.setdefault("first_token_latency_s",
+                              float(os.environ["STUB_FIRST_TOKEN_MS"]) / 1000)
+        if os.getenv("STUB_TOKEN_MS"):
+            kwargs.setdefault("token_latency_s", float(os.environ["STUB_TOKEN_MS"]) / 1000)
+        return StubChatModel(**kwargs)
+
+    if provider == "local":
+        model_path = model_name or os.getenv("LOCAL_MODEL_PATH")
+        if not model_path:
+            raise ValueError(
+                "The local provider needs a GGUF model path (model_name or LOCAL_MODEL_PATH)."
+            )
+        kwargs.setdefault("n_ctx", 4096)
+        kwargs.setdefault("n_threads", os.cpu_count())
+        try:
+            # llama-cpp-python is only needed for this backend and is imported on construction
+            from langchain_community.chat_models import ChatLlamaCpp
+            return ChatLlamaCpp(model_path=model_path, temperature=0, **kwargs)
+        except ImportError as e:
+            raise ImportError(
+                "The local provider requires llama-cpp-python: pip install llama-cpp-python"
+            ) from e
+
+    raise ValueError(f"Unknown LLM provider: {provider}. Expected one of {PROVIDERS}")
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+Target = Callable[[str], Awaitable[Any]]
+
+def poisson_arrivals(rate: float, duration_s: float, seed: Optional[int] = None) -> np.ndarray:
+    """
+    Arrival offsets (seconds) of a Poisson process over duration_s.
+
+    Inter-arrival gaps are drawn in one vectorized call; a few extra are
+    drawn so the sum almost surely covers the duration.
+    """
+    if rate <= 0 or duration_s <= 0:
+        return np.zeros(0)
+    rng = np.random.default_rng(seed)
+    expected = rate * duration_s
+    gaps = rng.exponential(1.0 / rate, size=int(expected + 6 * np.sqrt(expected) + 10))
+    arrivals = np.cumsum(gaps)
+    return arrivals[arrivals < duration_s]
+
+def summarize(
+    offered_rate: float,
+    scheduled: np.ndarray,
+    started: np.ndarray,
+    finished: np.ndarray,
+    errors: int,
+) -> Dict[str, Any]:
+    """
+    Throughput, latency percentiles and queueing figures for one run.
+
+    Latency is measured from the scheduled arrival (open loop), so time
+    spent waiting for a free worker counts; queue_wait is that waiting alone.
+    A run is 'saturated' when the 95th percentile request waits longer for
+    a worker than the median request takes to serve, or when more than 1%
+    of requests fail or never finish.
+    """
+    ok = ~np.isnan(finished)
+    latency = (finished - scheduled)[ok] * 1000
+    queue_wait = (started - scheduled)[ok] * 1000
+    service = (finished - started)[ok] * 1000
+    # Requests cancelled before their arrival time were never scheduled (NaN)
+    span = float(np.nanmax(finished) - np.nanmin(scheduled)) if ok.any() else 0.0
+    achieved = ok.sum() / span if span > 0 else 0.0
+
+    def pct(values: np.ndarray, q: float) -> float:
+        return round(float(np.percentile(values, q)), 2) if len(values) else 0.0
+
+    summary = {
+        "offered_rps": round(offered_rate, 3),
+        "achieved_rps": round(float(achieved), 3),
+        "requests": int(len(scheduled)),
+        "completed": int(ok.sum()),
+        "errors": int(errors),
+        "latency_ms": {"p50": pct(latency, 50), "p90": pct(latency, 90), "p95": pct(latency, 95),
+                       "p99": pct(latency, 99), "max": pct(latency, 100)},
+        "queue_wait_ms": {"mean": round(float(queue_wait.mean()), 2) if len(queue_wait) else 0.0,
+                          "p95": pct(queue_wait, 95)},
+        "service_ms": {"p50": pct(service, 50), "p95": pct(service, 95)},
+    }
+    summary["saturated"] = bool(
+        len(scheduled) > 0
+        and (len(scheduled) - ok.sum() > 0.01 * len(scheduled)
+             or summary["queue_wait_ms"]["p95"] > max(summary["service_ms"]["p50"], 1.0))
+    )
+    return summary
+
+async def run_open_loop(
+    target: Target,
+    queries: Sequence[str],
+    rate: float,
+    duration_s: float,
+    concurrency: int = 8,
+    seed: Optional[int] = None,
+    drain_timeout_s: float = 60.0,
+) -> Dict[str, Any]:
+    """
+    Offer Poisson traffic at rate req/s for duration_s, whatever the system's pace.
+
+    Arrivals are scheduled up front and never wait for earlier requests
+    (open loop), so an overloaded target builds a queue instead of slowing
+    the generator down. At most concurrency requests are in service at once,
+    like a fixed worker pool in front of the pipeline.
+
+    Args:
+        target (Callable[[str], Awaitable]): Sends one query.
+        queries (Sequence[str]): Replayed round-robin.
+        rate (float): Offered requests per second.
+        duration_s (float): Length of the arrival window.
+        concurrency (int): Requests in service at once.
+        seed (int, optional): Seed for the arrival process.
+        drain_timeout_s (float): How long to wait for stragglers after the window.
+
+    Returns:
+        dict: The summarize() report.
+    """
+    if not queries:
+        raise ValueError("No queries to replay")
+    offsets = poisson_arrivals(rate, duration_s, seed)
+    n = len(offsets)
+    scheduled, started, finished = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    origin = loop.time()
+
+    async def one(i: int):
+        nonlocal errors
+        await asyncio.sleep(max(origin + offsets[i] - loop.time(), 0))
+        scheduled[i] = loop.time()
+        async with semaphore:
+            started[i] = loop.time()
+            try:
+                await target(queries[i % len(queries)])
+                finished[i] = loop.time()
+            except Exception:
+                errors += 1
+
+    tasks = [asyncio.ensure_future(one(i)) for i in range(n)]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=duration_s + drain_timeout_s)
+        for task in pending:
+            task.cancel()
+    return summarize(rate, scheduled, started, finished, errors)
+
+async def sweep(
+    target: Target,
+    queries: Sequence[str],
+    rates: Sequence[float],
+    duration_s: float,
+    concurrency: int = 8,
+    seed: Optional[int] = 0,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run one open-loop level per rate (lowest first); the reports form the saturation curve.
+
+    A target with a reset() method (see InProcessTarget) is reset before each
+    level, so work left over from a saturated level does not hold the next
+    level's workers.
+    """
+    results = []
+    reset = getattr(target, "reset", None)
+    for rate in sorted(rates):
+        if reset is not None:
+            await asyncio.get_running_loop().run_in_executor(None, reset)
+        result = await run_open_loop(target, queries, rate, duration_s, concurrency, seed=seed)
+        result["concurrency"] = concurrency
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return results
+
+def capacity(results: Sequence[Dict[str, Any]]) -> Optional[float]:
+    """Highest offered rate that was not saturated (None if every level was)."""
+    healthy = [r["offered_rps"] for r in results if not r["saturated"]]
+    return max(healthy) if healthy else None
+
+class InProcessTarget:
+    def __init__(self, fn: Callable[[str], Any], concurrency: int):
+        """
+        Run fn(query) on a pool of concurrency threads.
+
+        Cancelling the awaiting task does not stop a call already running in
+        the pool, so reset() waits for those and starts a fresh pool.
+        """
+        self.fn = fn
+        self.concurrency = concurrency
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    async def __call__(self, query: str) -> Any:
+        if self._pool is None:
+            self.reset()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self.fn, query)
+
+    def reset(self):
+        """Drop queued calls, wait for running ones, then start a fresh pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="load-test"
+        )
+
+def in_process_target(rag_chain: Any, concurrency: int) -> InProcessTarget:
+    """Calls RAGChain.answer on a pool of concurrency threads."""
+    return InProcessTarget(rag_chain.answer, concurrency)
+
+def http_target(session: Any, url: str, k: int = 8) -> Target:
+    """POSTs to a running server's /query endpoint."""
+    async def target(query: str):
+        async with session.post(url, json={"query": query, "k": k}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            await response.read()
+    return target
+
+def format_row(result: Dict[str, Any]) -> str:
+    latency, wait = result["latency_ms"], result["queue_wait_ms"]
+    return (f"{result['offered_rps']:>8.2f} {result['achieved_rps']:>9.2f} "
+            f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} "
+            f"{wait['mean']:>10.1f} {result['errors']:>6d}"
+            f"  {'SATURATED' if result['saturated'] else ''}")
+
+def main():
+    from dotenv import load_dotenv
+    from src.warmup import load_eval_queries, load_query_log
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Open-loop load test for the RAG pipeline.")
+    parser.add_argument("--rates", default="1,2,4,8,16",
+                        help="Comma-separated offered rates (req/s)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in service at once")
+    eval_set = os.path.join(os.path.dirname(__file__), '..', 'data', 'eval_set.json')
+    parser.add_argument("--queries", default=eval_set,
+                        help="eval_set.json-style file, or a query log with --query-log")
+    parser.add_argument("--query-log", action="store_true", help="Read --queries as a query log")
+    parser.add_argument("--url",
+                        help="Load a running server (e.g. http://localhost:8000/query) instead")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(__file__), '..', 'data'))
+    parser.add_argument("--stub-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--stub-token-ms", type=float, default=15.0)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the retrieval cache in-process")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = load_query_log(args.queries) if args.query_log else load_eval_queries(args.queries)
+    rates = [float(rate) for rate in args.rates.split(",")]
+    print(f"--> Replaying {len(queries)} queries at {rates} req/s, {args.duration:.0f}s each, "
+          f"concurrency {args.concurrency}")
+    print(f"{'offered':>8} {'achieved':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'queue ms':>10} {'errors':>6}")
+
+    def report(result: Dict[str, Any]):
+        print(format_row(result), file=sys.__stdout__, flush=True)
+
+    async def run_http():
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            return await sweep(http_target(session, args.url), queries, rates, args.duration,
+                               args.concurrency, args.seed, report)
+
+    if args.url:
+        results = asyncio.run(run_http())
+    else:
+        from src.llm_providers import create_llm
+        from src.server import build_rag_chain
+
+        print("--> Building index...")
+        llm = create_llm("stub", first_token_latency_s=args.stub_first_token_ms / 1000,
+                         token_latency_s=args.stub_token_ms / 1000)
+        rag_chain = build_rag_chain(args.data_dir, llm=llm)
+        if args.no_cache:
+            rag_chain.retriever.cache = None
+        target = in_process_target(rag_chain, args.concurrency)
+        # RAGChain prints every prompt; keep the report readable
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = asyncio.run(sweep(target, queries, rates, args.duration,
+                                        args.concurrency, args.seed, report))
+
+    limit = capacity(results)
+    if limit is not None:
+        print(f"\nSustainable rate: {limit:.2f} req/s")
+    else:
+        print("\nSaturated at every rate tested")
+
+if __name__ == "__main__":
+    main()
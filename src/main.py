@@ -4,7 +4,8 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from dotenv import load_dotenv
-from src.ingestion import DocumentLoader, TextCleaner, TextSplitter
+from src.ingestion import DocumentChunker, DocumentLoader, MetadataTagger
+from src.dedup import NearDuplicateFilter
 from src.vectorizer import EmbeddingModel, VectorStoreManager
 from src.retrieval import Retriever
 from src.rag import RAGChain
@@ -17,8 +18,8 @@ def main():
     # 1. Ingestion
     print("--> Loading Documents...")
     loader = DocumentLoader()
-    cleaner = TextCleaner()
-    splitter = TextSplitter(chunk_size=500, chunk_overlap=50)
+    chunker = DocumentChunker()
+    tagger = MetadataTagger()
     
     data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
     # In a real system we might scan the dir, here we load specific key files
@@ -35,17 +36,19 @@ def main():
         if os.path.exists(file_path):
             print(f"    Processing: {filename}")
             raw_docs = loader.load_file(file_path)
-            # Clean
-            for doc in raw_docs:
-                doc.page_content = cleaner.clean(doc.page_content)
-            # Split
-            file_chunks = splitter.split_documents(raw_docs)
+            # Clean and split (markdown by its headings)
+            file_chunks = chunker.split_documents(raw_docs)
+            tagger.tag(file_chunks)
             all_chunks.extend(file_chunks)
         else:
             print(f"    WARNING: File not found {filename}")
 
     print(f"--> Total Chunks Created: {len(all_chunks)}")
     
+    # Drop near-duplicate chunks before paying to embed them
+    all_chunks, dedup_report = NearDuplicateFilter().filter(all_chunks)
+    print(f"--> Near-Duplicates Removed: {dedup_report['removed']} (kept {dedup_report['kept']})")
+    
     # 2. Vector Store
     print("--> Building Vector Index...")
     try:
@@ -0,0 +1,162 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_RANGE_OPERATORS = {
+    "gt": lambda value, bound: value > bound,
+    "gte": lambda value, bound: value >= bound,
+    "lt": lambda value, bound: value < bound,
+    "lte": lambda value, bound: value <= bound,
+}
+
+def _in_range(value: Any, condition: Dict[str, Any]) -> bool:
+    try:
+        return all(_RANGE_OPERATORS[op](value, bound) for op, bound in condition.items())
+    except TypeError:
+        # Values of another type (e.g. a stray int among ISO dates) never match
+        return False
+
+def _bitset(positions: Sequence[int]) -> int:
+    """Bitset of positions, packed in one pass over their span instead of one OR per bit."""
+    positions = np.asarray(positions, dtype=np.int64)
+    low = int(positions.min())
+    bits = np.zeros(int(positions.max()) - low + 1, dtype=bool)
+    bits[positions - low] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little") << low
+
+class MetadataIndex:
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        """
+        Initialize the inverted metadata index.
+
+        Each (field, value) pair maps to a bitset of chunk positions, stored
+        as a Python int so AND/OR across large postings run in C.
+
+        Args:
+            fields (Iterable[str], optional): Metadata fields to index.
+                Defaults to every field with hashable (or list-of-hashable) values.
+        """
+        self.fields = set(fields) if fields is not None else None
+        self._postings: Dict[str, Dict[Hashable, int]] = {}
+        self._entries: Dict[int, List[Tuple[str, Hashable]]] = {}
+        self.size = 0
+
+    def _pairs(self, metadata: Dict[str, Any]) -> List[Tuple[str, Hashable]]:
+        pairs = []
+        for field, value in metadata.items():
+            if self.fields is not None and field not in self.fields:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            for item in values:
+                if isinstance(item, Hashable):
+                    pairs.append((field, item))
+        return pairs
+
+    def add(self, position: int, metadata: Dict[str, Any]):
+        """
+        Index the metadata of the chunk stored at a vector index position.
+
+        Args:
+            position (int): The chunk's position in the FAISS index.
+            metadata (dict): The chunk's metadata. List values are indexed per item.
+        """
+        self.remove(position)
+        pairs = self._pairs(metadata)
+        bit = 1 << position
+        for field, value in pairs:
+            postings = self._postings.setdefault(field, {})
+            postings[value] = postings.get(value, 0) | bit
+        self._entries[position] = pairs
+        self.size = max(self.size, position + 1)
+
+    def add_batch(self, start: int, metadatas: Sequence[Dict[str, Any]]):
+        """
+        Index the metadata of consecutive chunks stored from position start.
+
+        Positions are grouped per (field, value) first, so each posting is
+        ORed with one bitset built once. Adding chunks one by one copies the
+        growing posting int for every chunk, which is quadratic in the index size.
+
+        Args:
+            start (int): Position of the first chunk.
+            metadatas (Sequence[dict]): Metadata of each chunk, in position order.
+        """
+        grouped: Dict[Tuple[str, Hashable], List[int]] = {}
+        for offset, metadata in enumerate(metadatas):
+            position = start + offset
+            self.remove(position)
+            pairs = self._pairs(metadata)
+            self._entries[position] = pairs
+            for pair in pairs:
+                grouped.setdefault(pair, []).append(position)
+        for (field, value), positions in grouped.items():
+            postings = self._postings.setdefault(field, {})
+            postings[value] = postings.get(value, 0) | _bitset(positions)
+        if metadatas:
+            self.size = max(self.size, start + len(metadatas))
+
+    def copy(self) -> "MetadataIndex":
+        """Independent copy (postings are immutable ints, so this is shallow per field)."""
+        clone = MetadataIndex(self.fields)
+        clone._postings = {field: dict(postings) for field, postings in self._postings.items()}
+        clone._entries = dict(self._entries)
+        clone.size = self.size
+        return clone
+
+    def remove(self, position: int):
+        """Drop a chunk position from every posting it appears in."""
+        mask = ~(1 << position)
+        for field, value in self._entries.pop(position, []):
+            postings = self._postings[field]
+            postings[value] &= mask
+            if not postings[value]:
+                del postings[value]
+
+    def values(self, field: str) -> List[Hashable]:
+        """Distinct indexed values of a field."""
+        return list(self._postings.get(field, {}))
+
+    def match(self, filter: Dict[str, Any]) -> int:
+        """
+        Resolve a filter to a bitset of matching chunk positions.
+
+        Fields are ANDed together. A field's condition is either a value, a
+        list of values (ORed), or a range dict using gt/gte/lt/lte, which is
+        evaluated against the field's distinct values (e.g. ISO dates).
+
+        Args:
+            filter (dict): Mapping of field to condition.
+
+        Returns:
+            int: Bitset with bit i set when position i matches.
+        """
+        result = None
+        for field, condition in filter.items():
+            postings = self._postings.get(field, {})
+            if isinstance(condition, dict):
+                unknown = set(condition) - set(_RANGE_OPERATORS)
+                if unknown:
+                    raise ValueError(f"Unknown range operators for '{field}': {sorted(unknown)}")
+                values = [v for v in postings if _in_range(v, condition)]
+            elif isinstance(condition, (list, tuple, set)):
+                values = list(condition)
+            else:
+                values = [condition]
+
+            bits = 0
+            for value in values:
+                bits |= postings.get(value, 0)
+            result = bits if result is None else result & bits
+            if not result:
+                return 0
+        return result if result is not None else (1 << self.size) - 1
+
+    def to_bitmap(self, bits: int) -> np.ndarray:
+        """Pack a bitset into the little-endian uint8 bitmap FAISS selectors expect."""
+        packed = bits.to_bytes((self.size + 7) // 8 or 1, "little")
+        return np.frombuffer(packed, dtype=np.uint8).copy()
+
+    def positions(self, bits: int) -> np.ndarray:
+        """Expand a bitset into a sorted array of positions."""
+        unpacked = np.unpackbits(self.to_bitmap(bits), bitorder="little")
+        return np.flatnonzero(unpacked[:self.size]).astype(np.int64)
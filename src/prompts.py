@@ -1,28 +1,80 @@
-from langchain_core.prompts import ChatPromptTemplate
+from typing import List, Optional
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompt_values import ChatPromptValue
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 # Strict System Prompt
 # Enforces:
 # 1. Grounding (Use ONLY provided context)
 # 2. Refusal (Say "I don't know" if context is missing)
 # 3. Citation (Cite sources if possible - implied by sticking to context)
+#
+# Layout: the system prompt is fully static and always sent first, so every
+# request shares a byte-identical prefix that providers can cache. Per-request
+# data (history, retrieved context, question) only appears after it.
 
-RAG_SYSTEM_PROMPT = """You are a rag system document assistance that answers questions based on the provided context.
-You will be provided with a set of retrieved document chunks (Context).
+# Fixed refusal the model is told to give; the relevance gate returns it without a model call
+REFUSAL_ANSWER = "I don't know based on the provided documents."
+
+RAG_SYSTEM_PROMPT = f"""You are a rag system document assistance that answers questions based on the provided context.
+You will be provided with a set of retrieved document chunks (Context) together with the user's question.
 You must answer the user's question using ONLY the provided Context.
 
 Rules:
 1. Do NOT use your internal knowledge to answer the question.
-2. If the answer is not present in the Context, you MUST respond with EXACTLY this phrase and nothing else: "I don't know based on the provided documents."
+2. If the answer is not present in the Context, you MUST respond with EXACTLY this phrase and nothing else: "{REFUSAL_ANSWER}"
 3. Do not make up or hallucinate information.
 4. Keep your answer concise and directly related to the question.
+"""
 
-Context:
+RAG_USER_PROMPT = """Context:
 {context}
-"""
+
+Question: {question}"""
+
+# Built once at import; ChatPromptTemplate is immutable so sharing is safe
+_RAG_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", RAG_SYSTEM_PROMPT),
+    ("human", RAG_USER_PROMPT),
+])
+
+_CONVERSATIONAL_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", RAG_SYSTEM_PROMPT),
+    MessagesPlaceholder("history"),
+    ("human", RAG_USER_PROMPT),
+])
+
+_SYSTEM_MESSAGE = SystemMessage(content=RAG_SYSTEM_PROMPT)
+_USER_PREFIX, _USER_SEPARATOR = "Context:\n", "\n\nQuestion: "
 
 def get_rag_prompt_template() -> ChatPromptTemplate:
     """Returns the chat prompt template for the RAG chain."""
-    return ChatPromptTemplate.from_messages([
-        ("system", RAG_SYSTEM_PROMPT),
-        ("human", "{question}"),
-    ])
+    return _RAG_PROMPT_TEMPLATE
+
+def get_conversational_prompt_template() -> ChatPromptTemplate:
+    """Returns the RAG prompt with a slot for (bounded) conversation history."""
+    return _CONVERSATIONAL_PROMPT_TEMPLATE
+
+def build_rag_messages(
+    context: str, question: str, history: Optional[List[BaseMessage]] = None
+) -> ChatPromptValue:
+    """
+    Fast-path equivalent of the RAG templates' invoke().
+
+    Reuses the static system message and concatenates the user turn directly,
+    skipping template parsing and variable validation on the hot path.
+
+    Args:
+        context (str): Retrieved context text.
+        question (str): The user question.
+        history (List[BaseMessage], optional): Conversation messages to place
+            between the system prompt and the user turn.
+
+    Returns:
+        ChatPromptValue: Same messages as the templates produce.
+    """
+    messages: List[BaseMessage] = [_SYSTEM_MESSAGE]
+    if history:
+        messages.extend(history)
+    messages.append(HumanMessage(content=_USER_PREFIX + context + _USER_SEPARATOR + question))
+    return ChatPromptValue(messages=messages)
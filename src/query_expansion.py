@@ -0,0 +1,87 @@
+import re
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did",
+    "what", "which", "who", "whom", "how", "why", "when", "where", "can", "could",
+    "should", "would", "will", "of", "in", "on", "for", "to", "with", "about", "and",
+    "or", "it", "its", "this", "that", "these", "those", "i", "we", "you", "my", "our",
+    "me", "please", "tell", "explain", "there", "between", "by", "as", "at", "from",
+}
+
+# Splits "What is X and how does Y work?" into its sub-questions
+_PART_SPLIT_RE = re.compile(
+    r"\?\s+|;\s*|,?\s+and\s+(?=(?:what|how|why|when|where|which|who|does|do|is|are|can)\b)",
+    re.IGNORECASE,
+)
+
+class QueryExpander:
+    def __init__(
+        self,
+        max_queries: int = 4,
+        generator: Optional[Callable[[str], List[str]]] = None,
+    ):
+        """
+        Initialize the query expander.
+
+        Args:
+            max_queries (int): Upper bound on queries returned, original included.
+            generator (Callable[[str], List[str]], optional): Extra paraphrase
+                source, e.g. a small local model. It may be slow; callers run it
+                under a deadline.
+        """
+        self.max_queries = max_queries
+        self.generator = generator
+
+    def expand(self, query: str) -> List[str]:
+        """
+        Rule-based expansion: the original query, its sub-questions and a
+        keyword-only variant. Cheap enough to run inline.
+
+        Returns:
+            List[str]: Distinct queries, original first.
+        """
+        candidates = [query.strip()]
+        parts = [p.strip(" ?.,") for p in _PART_SPLIT_RE.split(query) if p and p.strip(" ?.,")]
+        if len(parts) > 1:
+            candidates.extend(p for p in parts if len(p.split()) >= 2)
+
+        keywords = [w for w in re.findall(r"[\w-]+", query.lower()) if w not in _STOPWORDS]
+        if len(keywords) >= 2:
+            candidates.append(" ".join(keywords))
+        return self._distinct(candidates)
+
+    def generate(self, query: str) -> List[str]:
+        """Paraphrases from the configured generator (empty without one)."""
+        if self.generator is None:
+            return []
+        return self._distinct(self.generator(query))
+
+    def _distinct(self, queries: Sequence[str]) -> List[str]:
+        seen = set()
+        result = []
+        for q in queries:
+            key = " ".join(q.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                result.append(q.strip())
+        return result[:self.max_queries]
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Hashable]], k: int = 60
+) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse several ranked lists with Reciprocal Rank Fusion.
+
+    Args:
+        rankings (List[List[Hashable]]): Ranked ids, best first, one list per query.
+        k (int): RRF damping constant.
+
+    Returns:
+        List[Tuple[Hashable, float]]: (id, fused score) pairs, best first.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
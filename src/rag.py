@@ -1,29 +1,95 @@
-from typing import Dict, Any, List
-from langchain_groq import ChatGroq
+import os
+from typing import Dict, Any, List, Optional, Tuple
 from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from src.retrieval import Retriever
-from src.prompts import get_rag_prompt_template
+from src.prompts import (
+    REFUSAL_ANSWER, build_rag_messages, get_rag_prompt_template, get_conversational_prompt_template,
+)
+from src.embedding_cache import normalize_query
+from src.conversation import ConversationMemory, ConversationStore, rewrite_query
+from src.llm_gateway import LLMGateway
+from src.llm_providers import create_llm
+from src.relevance import RelevanceGate
+from src.compression import ContextCompressor
+from src.singleflight import SingleFlight
+from src.tiered_store import chunk_key
+
+def history_messages(memory: ConversationMemory) -> List[BaseMessage]:
+    """Converts a session's summary and recent turns into chat messages."""
+    messages: List[BaseMessage] = []
+    if memory.summary:
+        messages.append(
+            SystemMessage(content=f"Summary of the earlier conversation:\n{memory.summary}")
+        )
+    for role, content in memory.history():
+        message_type = HumanMessage if role == "user" else AIMessage
+        messages.append(message_type(content=content))
+    return messages
+
+def generation_key(query: str, docs: List[Document]) -> Tuple[str, str, Tuple[str, ...]]:
+    """Identity of a stateless generation: the normalized question and its exact context."""
+    return ("generate", normalize_query(query), tuple(chunk_key(doc) for doc in docs))
 
 class RAGChain:
-    def __init__(self, retriever: Retriever, model_name: str = "llama-3.3-70b-versatile"):
+    def __init__(
+        self,
+        retriever: Retriever,
+        model_name: str = "llama-3.3-70b-versatile",
+        gateway: Optional[LLMGateway] = None,
+        llm: Optional[Any] = None,
+        conversations: Optional[ConversationStore] = None,
+        relevance_gate: Optional[RelevanceGate] = None,
+        single_flight: Optional[SingleFlight] = None,
+        compressor: Optional[ContextCompressor] = None,
+    ):
         """
         Initialize the RAG Chain.
         
         Args:
             retriever (Retriever): The retrieval engine.
-            model_name (str): LLM model name.
+            model_name (str): Groq model name (other providers use their own
+                settings, see create_llm).
+            gateway (LLMGateway, optional): Gateway (and model) to call through.
+            llm (optional): Chat model to use behind a default gateway. When
+                neither gateway nor llm is given, the LLM_PROVIDER environment
+                variable picks the backend ('groq' by default, 'stub' or 'local').
+            conversations (ConversationStore, optional): Per-session memory used
+                when answer() is given a session_id.
+            relevance_gate (RelevanceGate, optional): When set, answer() refuses
+                questions whose retrieval fails the gate without calling the LLM.
+            single_flight (SingleFlight, optional): Concurrent generate() calls
+                for the same normalized question and the same context share
+                one LLM call. Calls with conversation memory are never shared.
+                Give the retriever a SingleFlight too to share retrievals.
+            compressor (ContextCompressor, optional): Cuts retrieved chunks
+                down to the sentences relevant to the question before
+                prompting; source_documents are then the compressed blocks.
         """
         self.retriever = retriever
-        # Uses GROQ_API_KEY from environment
-        self.llm = ChatGroq(model=model_name, temperature=0)
+        if gateway is None:
+            if llm is None:
+                provider = os.getenv("LLM_PROVIDER", "groq")
+                llm = create_llm(provider, model_name if provider == "groq" else None)
+            gateway = LLMGateway(llm)
+        self.gateway = gateway
+        self.llm = gateway.llm
         self.prompt_template = get_rag_prompt_template()
+        self.conversational_prompt_template = get_conversational_prompt_template()
+        self.conversations = conversations if conversations is not None else ConversationStore()
+        self.relevance_gate = relevance_gate
+        self.single_flight = single_flight
+        self.compressor = compressor
 
-    def answer(self, query: str) -> Dict[str, Any]:
+    def answer(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Answer a user query using RAG.
         
         Args:
             query (str): User question.
+            session_id (str, optional): Conversation to continue. Follow-ups are
+                rewritten into standalone queries before retrieval, and the
+                session's bounded history is included in the prompt.
             
         Returns:
             dict: {
@@ -32,17 +98,82 @@ class RAGChain:
                 "query": str
             }
         """
-        # 1. Retrieve
-        docs = self.retriever.retrieve(query)
+        if session_id is None:
+            # 1. Retrieve
+            docs, verdict = self._retrieve(query)
+            if verdict is not None and not verdict["answerable"]:
+                return self.refuse(query, verdict)
+            
+            return self.generate(query, docs)
+
+        memory = self.conversations.get(session_id)
+        retrieval_query = rewrite_query(query, memory)
+        docs, verdict = self._retrieve(retrieval_query)
+        if verdict is not None and not verdict["answerable"]:
+            result = self.refuse(query, verdict)
+        else:
+            result = self.generate(query, docs, memory=memory)
+        memory.add_turn("user", query)
+        memory.add_turn("assistant", result["answer"])
+        result["retrieval_query"] = retrieval_query
+        return result
+
+    def _retrieve(self, query: str) -> Tuple[List[Document], Optional[Dict[str, Any]]]:
+        """Retrieve context and, with a relevance gate, its verdict."""
+        if self.relevance_gate is None:
+            return self.retriever.retrieve(query), None
+        scored = self.retriever.retrieve_with_scores(query)
+        verdict = self.relevance_gate.assess(query, scored)
+        return self.retriever.expand_to_parents([doc for doc, _ in scored]), verdict
+
+    def refuse(self, query: str, verdict: Dict[str, Any]) -> Dict[str, Any]:
+        """The fixed refusal, returned without an LLM call; same shape as answer()."""
+        print("\n--- [OBSERVABILITY] RELEVANCE GATE REFUSED "
+              f"(top similarity {verdict['top_similarity']:.3f}) ---\n")
+        return {
+            "answer": REFUSAL_ANSWER,
+            "source_documents": [],
+            "query": query,
+            "refused": True,
+            "relevance": verdict,
+        }
+
+    def generate(
+        self, query: str, docs: List[Document], memory: Optional[ConversationMemory] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate an answer from already retrieved documents.
+        
+        Lets callers that retrieve in batches (e.g. the HTTP server) reuse
+        the prompting and generation steps of answer().
         
+        Args:
+            query (str): User question.
+            docs (List[Document]): Retrieved context documents.
+            memory (ConversationMemory, optional): History to include in the prompt.
+            
+        Returns:
+            dict: Same shape as answer().
+        """
+        if self.single_flight is not None and memory is None:
+            key = generation_key(query, docs)
+            result = dict(self.single_flight.do(key, lambda: self._generate(query, docs)))
+            result["query"] = query
+            return result
+        return self._generate(query, docs, memory)
+
+    def _generate(
+        self, query: str, docs: List[Document], memory: Optional[ConversationMemory] = None
+    ) -> Dict[str, Any]:
         # 2. Format Context
+        if self.compressor is not None:
+            docs = self.compressor.compress(query, docs)
         context_text = "\n\n".join([d.page_content for d in docs])
         
         # 3. Prepare Prompt
-        messages = self.prompt_template.invoke({
-            "context": context_text,
-            "question": query
-        })
+        # Static system prefix first, then history, then context + question
+        history = history_messages(memory) if memory is not None else None
+        messages = build_rag_messages(context_text, query, history)
         
         # LOGGING (Observability)
         # In a real app we'd use a logger, here we print or store for inspection as per reqs
@@ -52,7 +183,7 @@ class RAGChain:
         print("--------------------------------------------------\n")
         
         # 4. Generate
-        response = self.llm.invoke(messages)
+        response = self.gateway.invoke(messages)
         
         # Handle Gemini parsed content (sometimes list of dicts)
         content_text = response.content
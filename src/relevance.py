@@ -0,0 +1,258 @@
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+FEATURE_NAMES = ("top_similarity", "mean_top3_similarity", "top_gap", "term_overlap")
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by does for from how in is it of on or the that this to was what "
+    "when where which who why with according based documents document text explain concept".split()
+)
+
+def similarity_from_distance(distances) -> np.ndarray:
+    """
+    Cosine similarity from FAISS squared L2 distances between unit-length vectors.
+
+    The default sentence-transformers model normalizes its embeddings, so
+    ||a - b||^2 = 2 - 2 cos(a, b).
+    """
+    return 1.0 - np.asarray(distances, dtype=np.float32) / 2.0
+
+def content_terms(text: str) -> set:
+    return {
+        word for word in _WORD.findall(text.lower()) if len(word) > 2 and word not in _STOPWORDS
+    }
+
+def relevance_features(
+    query: str, docs_and_distances: Sequence[Tuple[Document, float]]
+) -> np.ndarray:
+    """
+    Feature vector for one retrieval, in FEATURE_NAMES order.
+
+    Similarity features come from the score array; term_overlap is the share
+    of the query's content words that appear in any retrieved chunk.
+    """
+    if not docs_and_distances:
+        return np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+    similarities = np.sort(similarity_from_distance([d for _, d in docs_and_distances]))[::-1]
+    top = float(similarities[0])
+    gap = top - float(similarities[1]) if len(similarities) > 1 else 0.0
+    terms = content_terms(query)
+    if terms:
+        found = set().union(*(content_terms(doc.page_content) for doc, _ in docs_and_distances))
+        overlap = len(terms & found) / len(terms)
+    else:
+        overlap = 0.0
+    return np.array([top, float(similarities[:3].mean()), gap, overlap], dtype=np.float32)
+
+def calibrate_threshold(
+    scores: Sequence[float], answerable: Sequence[bool], min_recall: float = 1.0
+) -> float:
+    """
+    Pick the top-similarity threshold that refuses the most unanswerable
+    questions while still passing at least min_recall of the answerable ones.
+
+    Candidates are midpoints between consecutive observed scores, so the
+    threshold sits in the widest margin the data allows.
+
+    Args:
+        scores (Sequence[float]): Top similarity per question.
+        answerable (Sequence[bool]): Whether each question has an answer in the corpus.
+        min_recall (float): Share of answerable questions that must pass.
+
+    Returns:
+        float: The threshold (questions pass when their score is >= it).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(answerable, dtype=bool)
+    if not labels.any():
+        raise ValueError("Calibration needs at least one answerable question")
+    values = np.unique(scores)
+    candidates = np.concatenate(
+        [[values[0] - 1e-6], (values[:-1] + values[1:]) / 2, [values[-1] + 1e-6]]
+    )
+
+    passed = scores[None, :] >= candidates[:, None]
+    recall = (passed & labels).sum(axis=1) / labels.sum()
+    refused = (~passed & ~labels).sum(axis=1)
+    eligible = recall >= min_recall - 1e-12
+    # Most refusals first, then the highest threshold among equals
+    best = max(np.flatnonzero(eligible), key=lambda i: (refused[i], candidates[i]))
+    return float(candidates[best])
+
+class LogisticClassifier:
+    def __init__(self, weights: Optional[Sequence[float]] = None, bias: float = 0.0,
+                 mean: Optional[Sequence[float]] = None, scale: Optional[Sequence[float]] = None):
+        """
+        Small L2-regularized logistic regression over relevance_features.
+
+        Args:
+            weights (Sequence[float], optional): One weight per feature.
+            bias (float): Intercept.
+            mean (Sequence[float], optional): Feature means used for standardization.
+            scale (Sequence[float], optional): Feature standard deviations.
+        """
+        n = len(FEATURE_NAMES)
+        self.weights = np.asarray(weights if weights is not None else np.zeros(n), dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean if mean is not None else np.zeros(n), dtype=np.float64)
+        self.scale = np.asarray(scale if scale is not None else np.ones(n), dtype=np.float64)
+
+    def fit(self, features: np.ndarray, labels: Sequence[bool], l2: float = 0.1,
+            learning_rate: float = 0.5, steps: int = 2000) -> "LogisticClassifier":
+        """Fit by full-batch gradient descent (the calibration sets are tiny)."""
+        X = np.asarray(features, dtype=np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        self.mean = X.mean(axis=0)
+        self.scale = np.where(X.std(axis=0) > 1e-9, X.std(axis=0), 1.0)
+        Z = (X - self.mean) / self.scale
+        w, b = np.zeros(Z.shape[1]), 0.0
+        for _ in range(steps):
+            p = 1.0 / (1.0 + np.exp(-(Z @ w + b)))
+            w -= learning_rate * (Z.T @ (p - y) / len(y) + l2 * w)
+            b -= learning_rate * float(np.mean(p - y))
+        self.weights, self.bias = w, b
+        return self
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Probability that each retrieval can answer its question."""
+        Z = (np.atleast_2d(np.asarray(features, dtype=np.float64)) - self.mean) / self.scale
+        return 1.0 / (1.0 + np.exp(-(Z @ self.weights + self.bias)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"weights": self.weights.tolist(), "bias": self.bias,
+                "mean": self.mean.tolist(), "scale": self.scale.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogisticClassifier":
+        return cls(data["weights"], data["bias"], data["mean"], data["scale"])
+
+class RelevanceGate:
+    def __init__(self, threshold: float = 0.3, classifier: Optional[LogisticClassifier] = None,
+                 min_probability: float = 0.5, calibration_queries: Optional[List[str]] = None):
+        """
+        Initialize the retrieval-confidence gate.
+
+        A question passes when its best chunk's similarity reaches threshold
+        and, if a classifier is given, its predicted probability of being
+        answerable reaches min_probability. Questions that fail can be
+        refused without calling the LLM.
+
+        Args:
+            threshold (float): Minimum top cosine similarity (see calibrate_threshold).
+            classifier (LogisticClassifier, optional): Second opinion over
+                relevance_features.
+            min_probability (float): Classifier cut-off.
+            calibration_queries (List[str], optional): Questions the gate was
+                fitted on; evaluations must leave them out to stay held-out.
+        """
+        self.threshold = threshold
+        self.classifier = classifier
+        self.min_probability = min_probability
+        self.calibration_queries = calibration_queries
+
+    def assess(
+        self, query: str, docs_and_distances: Sequence[Tuple[Document, float]]
+    ) -> Dict[str, Any]:
+        """
+        Judge whether a retrieval can answer its question.
+
+        Args:
+            query (str): The question.
+            docs_and_distances (Sequence[Tuple[Document, float]]): Hits with
+                their FAISS L2 distances, as from Retriever.retrieve_with_scores.
+
+        Returns:
+            dict: 'answerable', 'top_similarity' and, with a classifier, 'probability'.
+        """
+        features = relevance_features(query, docs_and_distances)
+        top = float(features[0]) if docs_and_distances else float("-inf")
+        verdict: Dict[str, Any] = {"answerable": bool(docs_and_distances) and top >= self.threshold,
+                                   "top_similarity": top}
+        if self.classifier is not None and docs_and_distances:
+            probability = float(self.classifier.predict_proba(features)[0])
+            verdict["probability"] = probability
+            verdict["answerable"] = verdict["answerable"] and probability >= self.min_probability
+        return verdict
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "threshold": self.threshold,
+            "min_probability": self.min_probability,
+            "classifier": self.classifier.to_dict() if self.classifier is not None else None,
+            "calibration_queries": self.calibration_queries,
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "RelevanceGate":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        classifier = data.get("classifier")
+        return cls(
+            threshold=data["threshold"],
+            classifier=LogisticClassifier.from_dict(classifier) if classifier else None,
+            min_probability=data.get("min_probability", 0.5),
+            calibration_queries=data.get("calibration_queries"),
+        )
+
+def holdout_split(labels: Sequence[bool], fraction: float = 0.4,
+                  seed: int = 0) -> Tuple[List[int], List[int]]:
+    """
+    Stratified (calibration, held-out) split of labelled questions.
+
+    Each class contributes round(fraction * size) questions to the held-out
+    part, but always keeps at least one for calibration.
+
+    Returns:
+        Tuple[List[int], List[int]]: Sorted calibration and held-out indices.
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.asarray(labels, dtype=bool)
+    held_out: List[int] = []
+    for value in (True, False):
+        members = rng.permutation(np.flatnonzero(labels == value))
+        n_held = min(int(round(fraction * len(members))), max(len(members) - 1, 0))
+        held_out.extend(int(i) for i in members[:n_held])
+    calibration = sorted(set(range(len(labels))) - set(held_out))
+    return calibration, sorted(held_out)
+
+def fit_gate(
+    queries: List[str],
+    retrievals: List[Sequence[Tuple[Document, float]]],
+    answerable: List[bool],
+    min_recall: float = 1.0,
+    with_classifier: bool = False,
+) -> RelevanceGate:
+    """
+    Calibrate a gate on labelled questions and their retrievals.
+
+    Args:
+        queries (List[str]): The questions.
+        retrievals (List[Sequence[Tuple[Document, float]]]): Hits per question.
+        answerable (List[bool]): Labels (False for refusal cases).
+        min_recall (float): Share of answerable questions the threshold must pass.
+        with_classifier (bool): Also fit a LogisticClassifier; it needs both classes.
+
+    Returns:
+        RelevanceGate: The calibrated gate.
+    """
+    features = np.stack([relevance_features(q, r) for q, r in zip(queries, retrievals)])
+    threshold = calibrate_threshold(features[:, 0], answerable, min_recall=min_recall)
+    classifier = None
+    if with_classifier:
+        if len(set(answerable)) < 2:
+            raise ValueError("The classifier needs answerable and unanswerable examples")
+        classifier = LogisticClassifier().fit(features, answerable)
+    return RelevanceGate(
+        threshold=threshold, classifier=classifier, calibration_queries=list(queries)
+    )
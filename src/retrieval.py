@@ -1,24 +1,372 @@
-from typing import List, Optional
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
 from langchain_core.documents import Document
 from src.vectorizer import VectorStoreManager
+from src.query_expansion import QueryExpander, reciprocal_rank_fusion
+from src.embedding_cache import normalize_query
+from src.singleflight import SingleFlight
+from src.tiered_store import AccessStats
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TYPES = ("similarity", "mmr", "multi_query")
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int = 4,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Select a relevant yet diverse subset of candidates.
+
+    Similarities are computed once as matrix products; each selection step
+    only updates the running max-similarity-to-selected vector, so the loop
+    runs k times rather than over candidate pairs.
+
+    Args:
+        query_vector (np.ndarray): The query embedding, shape (dim,).
+        candidate_vectors (np.ndarray): Candidate embeddings, shape (n, dim).
+        k (int): Number of candidates to select.
+        lambda_mult (float): 1.0 ranks purely by relevance, 0.0 purely by diversity.
+
+    Returns:
+        List[int]: Indices into candidate_vectors, in selection order.
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    max_redundancy = pairwise[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, pairwise[best], out=max_redundancy)
+    return selected
+
+def select_k(
+    distances,
+    min_k: int = 2,
+    max_k: Optional[int] = None,
+    min_gap_ratio: float = 2.5,
+    min_knee: float = 0.3,
+) -> np.ndarray:
+    """
+    Choose how many hits to keep from ranked distances, per query.
+
+    A row is cut at its largest gap when that gap is at least min_gap_ratio
+    times the row's mean gap. Otherwise it is cut at the knee: the point
+    furthest below the straight line from the best to the worst distance,
+    when that is at least min_knee in normalized units. Rows with neither
+    (a steady decline, typical of hard or broad questions) keep every hit.
+    All rows are processed together as array operations.
+
+    Args:
+        distances: Ranked L2 distances, shape (n,) or (queries, n). Missing
+            neighbours (non-finite or FAISS' float max) are ignored.
+        min_k (int): Fewest hits to keep (if available).
+        max_k (int, optional): Most hits to keep; defaults to n.
+        min_gap_ratio (float): Gap strength needed for a gap cut.
+        min_knee (float): Knee strength needed for a knee cut.
+
+    Returns:
+        np.ndarray: Number of hits to keep per row (int64).
+    """
+    d = np.atleast_2d(np.asarray(distances, dtype=np.float64))
+    if max_k is not None:
+        d = d[:, :max_k]
+    width = d.shape[1]
+    valid = np.isfinite(d) & (d < 1e30)
+    n = valid.sum(axis=1)
+    if width < 2:
+        return n.astype(np.int64)
+
+    # Pad missing neighbours with the row's worst distance so they add no gap
+    worst = np.max(np.where(valid, d, -np.inf), axis=1)
+    worst = np.where(n > 0, worst, 0.0)
+    d = np.where(valid, d, worst[:, None])
+    span = worst - d[:, 0]
+    flat = span <= 1e-12
+    span = np.where(flat, 1.0, span)
+
+    cut_sizes = np.arange(1, width)  # a cut after gap j keeps j + 1 hits
+    usable = cut_sizes[None, :] < n[:, None]
+
+    gaps = np.diff(d, axis=1) / span[:, None]
+    mean_gap = 1.0 / np.maximum(n - 1, 1)  # normalized gaps of a row sum to 1
+    gap_strength = np.where(usable, gaps / mean_gap[:, None], -np.inf)
+    gap_cut = np.argmax(gap_strength, axis=1) + 1
+
+    x = np.arange(width)[None, :] / np.maximum(n - 1, 1)[:, None]
+    y = (d - d[:, :1]) / span[:, None]
+    knee_strength = np.where(usable, (x - y)[:, :-1], -np.inf)
+    knee_cut = np.argmax(knee_strength, axis=1) + 1
+
+    k = np.where(gap_strength.max(axis=1) >= min_gap_ratio, gap_cut,
+                 np.where(knee_strength.max(axis=1) >= min_knee, knee_cut, n))
+    k = np.where(flat, n, k)
+    return np.minimum(np.maximum(k, np.minimum(min_k, n)), n).astype(np.int64)
+
+class RetrievalCache:
+    def __init__(self, max_entries: int = 2048):
+        """
+        Initialize the LRU cache of retrieval results.
+
+        Keys include the index version, so results from before a hot-swap or
+        an append (each publishes a new version) are never served afterwards.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is dropped.
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, List[Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(index_version: Hashable, query: str, **params) -> Hashable:
+        """Cache key for a query, its search parameters and the index version."""
+        return (
+            index_version, normalize_query(query), json.dumps(params, sort_keys=True, default=str)
+        )
+
+    def get(self, key: Hashable) -> Optional[List[Document]]:
+        with self._lock:
+            docs = self._entries.get(key)
+            if docs is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(docs)
+
+    def put(self, key: Hashable, docs: List[Document]):
+        with self._lock:
+            self._entries[key] = list(docs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class ParentStore:
+    def __init__(self, merge_gap: int = 2):
+        """
+        Initialize the parent-section store for small-to-big retrieval.
+
+        Holds the parents produced by ParentChildSplitter, keyed by parent_id,
+        so child hits expand to their sections with a lookup.
+
+        Args:
+            merge_gap (int): Parents of the same document whose offsets are at
+                most this many characters apart (the whitespace stripped
+                between sections) are merged into one context block.
+        """
+        self.merge_gap = merge_gap
+        self._parents: Dict[str, Document] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def add(self, parents: List[Document]):
+        """Store parents, replacing any with the same parent_id."""
+        with self._lock:
+            for parent in parents:
+                self._parents[parent.metadata["parent_id"]] = parent
+
+    def remove_sources(self, sources: List[str]) -> int:
+        """Drop every parent of the given sources; returns how many were removed."""
+        sources = set(sources)
+        with self._lock:
+            stale = [
+                pid for pid, doc in self._parents.items() if doc.metadata.get("source") in sources
+            ]
+            for pid in stale:
+                del self._parents[pid]
+        return len(stale)
+
+    def get(self, parent_id: str) -> Optional[Document]:
+        return self._parents.get(parent_id)
+
+    def expand(self, children: List[Document]) -> List[Document]:
+        """
+        Replace ranked child hits with their parent sections.
+
+        Children sharing a parent collapse into it, and neighbouring parents
+        of the same document are merged. Blocks keep the rank of their best
+        child and carry 'child_hits' (children that selected them) and
+        'parent_ids'. Children without a known parent are returned as they are.
+
+        Args:
+            children (List[Document]): Retrieved child chunks, best first.
+
+        Returns:
+            List[Document]: Context blocks, best first.
+        """
+        ranked: List[Tuple[int, Any]] = []
+        hits: Dict[str, int] = {}
+        for rank, child in enumerate(children):
+            parent_id = child.metadata.get("parent_id")
+            parent = self._parents.get(parent_id) if parent_id is not None else None
+            if parent is None:
+                ranked.append((rank, child))
+            elif parent_id in hits:
+                hits[parent_id] += 1
+            else:
+                hits[parent_id] = 1
+                ranked.append((rank, parent))
+
+        # Merge neighbouring parents of the same document (and page)
+        groups: Dict[Tuple[Any, Any], List[Tuple[int, Document]]] = {}
+        blocks: List[Tuple[int, Document]] = []
+        for rank, doc in ranked:
+            if "parent_id" in doc.metadata and doc.metadata.get("parent_id") in hits:
+                key = (doc.metadata.get("source"), doc.metadata.get("page"))
+                groups.setdefault(key, []).append((rank, doc))
+            else:
+                blocks.append((rank, doc))
+        for members in groups.values():
+            members.sort(key=lambda item: item[1].metadata["start_index"])
+            run = [members[0]]
+            for member in members[1:]:
+                gap = member[1].metadata["start_index"] - run[-1][1].metadata["end_index"]
+                if gap <= self.merge_gap:
+                    run.append(member)
+                else:
+                    blocks.append(self._merge(run, hits))
+                    run = [member]
+            blocks.append(self._merge(run, hits))
+
+        blocks.sort(key=lambda item: item[0])
+        return [doc for _, doc in blocks]
+
+    @staticmethod
+    def _merge(run: List[Tuple[int, Document]], hits: Dict[str, int]) -> Tuple[int, Document]:
+        """One context block from parents sorted by offset; ranked by the best of them."""
+        first, last = run[0][1], run[-1][1]
+        parent_ids = [doc.metadata["parent_id"] for _, doc in run]
+        metadata = dict(first.metadata)
+        metadata.update(
+            end_index=last.metadata["end_index"],
+            parent_ids=parent_ids,
+            child_hits=sum(hits[pid] for pid in parent_ids),
+        )
+        text = "\n\n".join(doc.page_content for _, doc in run)
+        return min(rank for rank, _ in run), Document(page_content=text, metadata=metadata)
 
 class Retriever:
-    def __init__(self, vector_store_manager: VectorStoreManager):
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreManager,
+        query_expander: Optional[QueryExpander] = None,
+        cache: Optional[RetrievalCache] = None,
+        parent_store: Optional[ParentStore] = None,
+        access_stats: Optional[AccessStats] = None,
+        adaptive_k: bool = False,
+        min_k: int = 2,
+        max_k: int = 20,
+        single_flight: Optional[SingleFlight] = None,
+    ):
         """
         Initialize the Retriever.
         
         Args:
             vector_store_manager (VectorStoreManager): The managed vector store.
+            query_expander (QueryExpander, optional): Sub-query source for the
+                'multi_query' search type. Defaults to rule-based expansion.
+            cache (RetrievalCache, optional): Serves repeated retrieve() calls
+                against the same index version from memory.
+            parent_store (ParentStore, optional): For an index of
+                ParentChildSplitter children: hits are expanded to their
+                parent sections, so k counts children, not returned blocks.
+            access_stats (AccessStats, optional): Counts every chunk returned,
+                for hot/cold tiering (see TieredStorage).
+            adaptive_k (bool): Default for the per-call 'adaptive' flag:
+                over-fetch similarity results and cut them where the scores
+                drop sharply (see select_k).
+            min_k (int): Fewest hits an adaptive cut keeps.
+            max_k (int): Hits an adaptive search fetches (or k, if larger);
+                the cut keeps between min_k and that many.
+            single_flight (SingleFlight, optional): Concurrent identical
+                retrievals (same normalized query, parameters and index
+                version) share one embedding and search.
         """
         self.vector_store_manager = vector_store_manager
+        self.query_expander = query_expander or QueryExpander()
+        self.cache = cache
+        self.parent_store = parent_store
+        self.access_stats = access_stats
+        self.adaptive_k = adaptive_k
+        self.min_k = min_k
+        self.max_k = max_k
+        self.single_flight = single_flight
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def close(self):
+        """
+        Stop the query-expansion threads. Pending paraphrase requests are
+        cancelled; a later multi-query search starts a new pool.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    def retrieve(self, query: str, k: int = 8) -> List[Document]:
+    def retrieve(
+        self,
+        query: str,
+        k: int = 8,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        deadline_s: float = 1.0,
+        adaptive: Optional[bool] = None,
+    ) -> List[Document]:
         """
         Retrieve relevant documents for the query.
         
         Args:
             query (str): The search query.
             k (int): Number of documents to retrieve.
+            search_type (str): 'similarity', 'mmr' (maximal marginal relevance) or
+                'multi_query' (expanded sub-queries fused with RRF).
+            fetch_k (int): Candidates fetched per query before MMR re-ranking or fusion.
+            lambda_mult (float): MMR relevance/diversity trade-off.
+            filter (dict, optional): Metadata pre-filter, e.g.
+                {"source": path, "tags": ["team-a"], "ingested_date": {"gte": "2025-01-01"}}.
+            deadline_s (float): multi_query budget; generated expansions that are
+                not ready by then are dropped and the partial fusion is used.
+            adaptive (bool, optional): Fetch max(k, max_k) hits once and keep
+                only those before the first sharp score drop. Applies to
+                'similarity' search; defaults to the retriever's adaptive_k.
             
         Returns:
             List[Document]: Retrieved documents.
@@ -27,36 +375,223 @@ class Retriever:
             # Decide on behavior for empty query. Returning empty list is safest.
             return []
             
-        retriever = self.vector_store_manager.get_retriever(k=k)
+        adaptive = self.adaptive_k if adaptive is None else adaptive
+        with self._pinned() as manager:
+            def search() -> List[Document]:
+                return self._search(manager, query, k, search_type, fetch_k, lambda_mult,
+                                    filter, deadline_s, adaptive)
+
+            if self.cache is None and self.single_flight is None:
+                return self._finish(search())
+            key = RetrievalCache.key(
+                self._index_version(manager), query, k=k, search_type=search_type,
+                fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter,
+                adaptive=adaptive and search_type == "similarity", min_k=self.min_k,
+                max_k=self.max_k,
+            )
+            docs = self.cache.get(key) if self.cache is not None else None
+            if docs is None:
+                docs = list(self._coalesce(key, search))
+                if self.cache is not None:
+                    self.cache.put(key, docs)
+            return self._finish(docs)
+
+    def _coalesce(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn through the single-flight group, if any (results are shared,
+        do not mutate them).
+        """
+        if self.single_flight is None:
+            return fn()
+        return self.single_flight.do(key, fn)
+
+    def index_version(self) -> Any:
+        """Version of the index currently being served."""
+        with self._pinned() as manager:
+            return self._index_version(manager)
+
+    def _finish(self, docs: List[Document]) -> List[Document]:
+        """Count the retrieved chunks' accesses, then expand them to parents."""
+        if self.access_stats is not None:
+            self.access_stats.record(docs)
+        return self.expand_to_parents(docs)
+
+    def expand_to_parents(self, docs: List[Document]) -> List[Document]:
+        """Child hits -> parent sections when a parent store is configured."""
+        if self.parent_store is None:
+            return docs
+        return self.parent_store.expand(docs)
+
+    def _search(
+        self, manager: Any, query: str, k: int, search_type: str, fetch_k: int,
+        lambda_mult: float, filter: Optional[Dict[str, Any]], deadline_s: float,
+        adaptive: bool = False,
+    ) -> List[Document]:
+        if search_type == "mmr":
+            docs_and_scores = self._mmr_search(manager, query, k, fetch_k, lambda_mult, filter)
+            return [doc for doc, _ in docs_and_scores]
+        if search_type == "multi_query":
+            docs_and_scores, _ = self._multi_query_search(
+                manager, query, k, fetch_k, filter, deadline_s
+            )
+            return [doc for doc, _ in docs_and_scores]
+        self._check_search_type(search_type)
+        if adaptive:
+            found = self._vector_search(manager, query, self._fetch_size(k, True), filter)
+            return [doc for doc, _ in self._cut(found)]
+        if filter:
+            return [doc for doc, _ in self._vector_search(manager, query, k, filter)]
+
+        retriever = manager.get_retriever(k=k)
         return retriever.invoke(query)
 
-    def retrieve_with_logs(self, query: str, k: int = 8):
+    def retrieve_with_scores(
+        self,
+        query: str,
+        k: int = 8,
+        filter: Optional[Dict[str, Any]] = None,
+        adaptive: Optional[bool] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Similarity search returning each hit with its FAISS L2 distance.
+
+        Hits are not expanded to parents, so scores stay attached to the
+        chunks that earned them; see expand_to_parents.
+
+        Args:
+            query (str): The search query.
+            k (int): Number of documents to retrieve.
+            filter (dict, optional): Metadata pre-filter.
+            adaptive (bool, optional): Cut at the first sharp score drop (see retrieve).
+
+        Returns:
+            List[Tuple[Document, float]]: (document, distance), best first.
+        """
+        if not query or not query.strip():
+            return []
+        adaptive = self.adaptive_k if adaptive is None else adaptive
+        with self._pinned() as manager:
+            def search() -> List[Tuple[Document, float]]:
+                found = self._vector_search(manager, query, self._fetch_size(k, adaptive), filter)
+                return self._cut(found) if adaptive else found
+
+            key = RetrievalCache.key(self._index_version(manager), query, scored=True, k=k,
+                                     filter=filter, adaptive=adaptive, min_k=self.min_k,
+                                     max_k=self.max_k)
+            docs_and_scores = list(self._coalesce(key, search))
+        if self.access_stats is not None:
+            self.access_stats.record(doc for doc, _ in docs_and_scores)
+        return docs_and_scores
+
+    @staticmethod
+    def _index_version(manager: Any) -> Any:
+        """Version of the pinned snapshot; managers without versions share one key space."""
+        return getattr(manager, "version", None)
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        k: int = 8,
+        filter: Optional[Dict[str, Any]] = None,
+        adaptive: Optional[bool] = None,
+    ) -> List[List[Document]]:
+        """
+        Retrieve documents for several queries at once.
+
+        All queries are embedded in one batch and searched in one FAISS call,
+        which is much cheaper than one forward pass and search per query.
+
+        Args:
+            queries (List[str]): The search queries.
+            k (int): Number of documents per query.
+            filter (dict, optional): Metadata pre-filter shared by all queries.
+            adaptive (bool, optional): Cut each query's hits at its first sharp
+                score drop (see retrieve); the cut points of the whole batch
+                are computed in one pass over the distance matrix.
+
+        Returns:
+            List[List[Document]]: Retrieved documents, one list per query.
+        """
+        results: List[List[Document]] = [[] for _ in queries]
+        valid = [i for i, q in enumerate(queries) if q and q.strip()]
+        if not valid:
+            return results
+        adaptive = self.adaptive_k if adaptive is None else adaptive
+        with self._pinned() as manager:
+            rankings = self._batch_rankings(
+                manager, [queries[i] for i in valid], self._fetch_size(k, adaptive),
+                filter, adaptive,
+            )
+            for i, ranking in zip(valid, rankings):
+                results[i] = self._finish(manager.get_documents(ranking))
+        return results
+
+    def retrieve_with_logs(
+        self,
+        query: str,
+        k: int = 8,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        deadline_s: float = 1.0,
+        adaptive: Optional[bool] = None,
+    ):
         """
         Retrieve documents and return them with detailed logging info.
         
         Args:
             query (str): The search query.
             k (int): Number of documents.
+            search_type (str): 'similarity', 'mmr' or 'multi_query'.
+            fetch_k (int): Candidates fetched per query before MMR re-ranking or fusion.
+            lambda_mult (float): MMR relevance/diversity trade-off.
+            filter (dict, optional): Metadata pre-filter applied inside the search.
+            deadline_s (float): multi_query budget for generated expansions.
+            adaptive (bool, optional): Cut similarity results at the first sharp
+                score drop (see retrieve).
             
         Returns:
-            dict: Contains 'results' (documents) and 'logs' (list of dicts).
+            dict: Contains 'results' (documents), 'logs' (list of dicts) and
+            'k' (the number of documents returned).
+            multi_query also returns the 'queries' that were searched; its
+            scores are fused RRF scores (higher is better).
         """
         if not query or not query.strip():
-            return {"results": [], "logs": []}
+            return {"results": [], "logs": [], "k": 0}
             
-        # We need to access the vector store directly to get scores if possible,
-        # but standard retriever.invoke() returns just docs.
-        # To get scores, we might need similarity_search_with_score on the store.
+        adaptive = self.adaptive_k if adaptive is None else adaptive
+        queries = None
+        with self._pinned() as manager:
+            if search_type == "mmr":
+                docs_and_scores = self._mmr_search(manager, query, k, fetch_k, lambda_mult, filter)
+            elif search_type == "multi_query":
+                docs_and_scores, queries = self._multi_query_search(
+                    manager, query, k, fetch_k, filter, deadline_s
+                )
+            elif filter or adaptive:
+                self._check_search_type(search_type)
+                fetch = self._fetch_size(k, adaptive)
+                docs_and_scores = self._vector_search(manager, query, fetch, filter)
+                if adaptive:
+                    docs_and_scores = self._cut(docs_and_scores)
+            else:
+                self._check_search_type(search_type)
+                # We need to access the vector store directly to get scores if possible,
+                # but standard retriever.invoke() returns just docs.
+                # To get scores, we might need similarity_search_with_score on the store.
         
-        vector_store = self.vector_store_manager.vector_store
-        if vector_store is None:
-             raise ValueError("Vector store not initialized.")
+                vector_store = manager.vector_store
+                if vector_store is None:
+                     raise ValueError("Vector store not initialized.")
              
-        # Perform search with scores
-        docs_and_scores = vector_store.similarity_search_with_score(query, k=k)
+                # Perform search with scores
+                docs_and_scores = vector_store.similarity_search_with_score(query, k=k)
         
         results = []
         logs = []
+        if self.access_stats is not None:
+            self.access_stats.record(doc for doc, _ in docs_and_scores)
         
         for i, (doc, score) in enumerate(docs_and_scores):
             results.append(doc)
@@ -67,4 +602,128 @@ class Retriever:
                 "score": float(score) # Lower is better for L2, Higher for Cosine usually (FAISS default depends)
             })
             
-        return {"results": results, "logs": logs}
+        response = {"results": results, "logs": logs, "k": len(results)}
+        if queries is not None:
+            response["queries"] = queries
+        return response
+
+    @contextmanager
+    def _pinned(self):
+        """
+        Serve one request from a single index version.
+
+        Positions returned by a search are resolved against the same snapshot,
+        even if a rebuild is swapped in mid-request. Managers without
+        snapshots (e.g. sharded ones) are used as they are.
+        """
+        manager = self.vector_store_manager
+        if isinstance(manager, VectorStoreManager):
+            with manager.acquire() as snapshot:
+                yield snapshot
+        else:
+            yield manager
+
+    def _check_search_type(self, search_type: str):
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Unknown search_type: {search_type}. Expected one of {SEARCH_TYPES}")
+
+    def _vector_search(
+        self, manager: Any, query: str, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Similarity search through the manager's raw vector path (supports pre-filtering)."""
+        query_vector = manager.embedding_model.embed_query(query)
+        distances, positions = manager.search_by_vectors(query_vector, k, filter=filter)
+        found = positions[0] != -1
+        docs = manager.get_documents(positions[0][found])
+        return list(zip(docs, distances[0][found].tolist()))
+
+    def _fetch_size(self, k: int, adaptive: bool) -> int:
+        """Hits to search for: adaptive searches over-fetch up to max_k and let the cut decide."""
+        return max(k, self.max_k) if adaptive else k
+
+    def _cut(self, docs_and_scores: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        """Keep the hits before the first sharp distance jump (select_k)."""
+        if not docs_and_scores:
+            return docs_and_scores
+        keep = int(select_k([score for _, score in docs_and_scores], min_k=self.min_k)[0])
+        logger.info("Adaptive k: kept %d of %d hits", keep, len(docs_and_scores))
+        return docs_and_scores[:keep]
+
+    def _mmr_search(
+        self, manager: Any, query: str, k: int, fetch_k: int, lambda_mult: float,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Fetch fetch_k candidates, then keep a diverse top-k of them with MMR."""
+        query_vector = np.asarray(manager.embedding_model.embed_query(query), dtype=np.float32)
+        distances, positions = manager.search_by_vectors(
+            query_vector, max(fetch_k, k), filter=filter
+        )
+
+        found = positions[0] != -1
+        positions, distances = positions[0][found], distances[0][found]
+        if len(positions) == 0:
+            return []
+
+        order = maximal_marginal_relevance(
+            query_vector, manager.get_vectors(positions), k, lambda_mult
+        )
+        docs = manager.get_documents(positions[order])
+        return list(zip(docs, distances[order].tolist()))
+
+    def _batch_rankings(
+        self, manager: Any, queries: List[str], k: int, filter: Optional[Dict[str, Any]],
+        adaptive: bool = False,
+    ) -> List[List[int]]:
+        """Embed all queries in one batch and search them in one FAISS call."""
+        vectors = manager.embedding_model.embed_queries(queries)
+        distances, positions = manager.search_by_vectors(vectors, k, filter=filter)
+        rankings = [[int(p) for p in row if p != -1] for row in positions]
+        if adaptive:
+            keep = select_k(np.where(positions == -1, np.inf, distances), min_k=self.min_k)
+            rankings = [ranking[:n] for ranking, n in zip(rankings, keep.tolist())]
+            logger.info("Adaptive k: kept %s of %d hits per query", keep.tolist(), k)
+        return rankings
+
+    def _multi_query_search(
+        self, manager: Any, query: str, k: int, fetch_k: int,
+        filter: Optional[Dict[str, Any]], deadline_s: float,
+    ) -> Tuple[List[Tuple[Document, float]], List[str]]:
+        """Search the query and its expansions together, then fuse the rankings with RRF."""
+        started = time.monotonic()
+        expander = self.query_expander
+
+        generated = None
+        if expander.generator is not None:
+            # Model-generated paraphrases run alongside the rule-based search
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=2, thread_name_prefix="query-expansion"
+                    )
+                generated = self._executor.submit(expander.generate, query)
+
+        queries = expander.expand(query)
+        rankings = self._batch_rankings(manager, queries, max(fetch_k, k), filter)
+
+        if generated is not None:
+            remaining = deadline_s - (time.monotonic() - started)
+            try:
+                seen = {q.lower() for q in queries}
+                generated_queries = generated.result(timeout=max(remaining, 0))
+                extra = [q for q in generated_queries if q.lower() not in seen]
+            except FutureTimeoutError:
+                generated.cancel()
+                logger.info("Query expansion missed its %.2fs deadline; using partial results",
+                            deadline_s)
+                extra = []
+            except Exception:
+                # A failing generator must not fail the search it only widens
+                logger.warning("Query expansion failed; using the original rankings", exc_info=True)
+                extra = []
+            if extra:
+                rankings.extend(self._batch_rankings(manager, extra, max(fetch_k, k), filter))
+                queries = queries + extra
+
+        fused = reciprocal_rank_fusion(rankings)[:k]
+        docs = manager.get_documents([position for position, _ in fused])
+        return list(zip(docs, [score for _, score in fused])), queries
@@ -0,0 +1,428 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from aiohttp import web
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from src.batching import MicroBatcher
+from src.dedup import NearDuplicateFilter
+from src.ingestion import (
+    DocumentChunker, DocumentLoader, TextCleaner, MetadataTagger, ParentChildSplitter,
+)
+from src.vectorizer import EmbeddingModel, VectorStoreManager
+from src.sharding import ShardedVectorStoreManager
+from src.collection_manager import CollectionManager, UnknownCollection
+from src.tiered_store import TieredDocstore, TieredStorage
+from src.watcher import start_ingestion_daemon
+from src.embedding_cache import QueryEmbeddingCache, normalize_query
+from src.retrieval import ParentStore, RetrievalCache
+from src.warmup import QueryLog, WarmupRunner, default_warmup_queries
+from src.retrieval import Retriever
+from src.rag import RAGChain, generation_key
+from src.compression import ContextCompressor
+from src.evaluate import RELEVANCE_GATE_FILE
+from src.relevance import RelevanceGate
+from src.singleflight import SingleFlight
+
+DEFAULT_K = 8
+# One request's k sizes the FAISS search for its whole micro-batch
+MAX_K = 100
+BATCHER_KEY = web.AppKey("batcher", MicroBatcher)
+
+def bad_request(message: str) -> web.HTTPBadRequest:
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+def serialize_document(doc: Document) -> Dict[str, Any]:
+    """JSON-friendly view of a retrieved chunk."""
+    return {
+        "content": doc.page_content,
+        "source": doc.metadata.get("source", "unknown"),
+        "metadata": doc.metadata,
+    }
+
+def build_chunks(documents: List[Document]) -> List[Document]:
+    """Clean, split and tag loaded documents the same way as the batch pipeline."""
+    return MetadataTagger().tag(DocumentChunker().split_documents(documents))
+
+def resolve_data_path(data_dir: Optional[str], path: str) -> str:
+    """
+    Resolve an /ingest path, which must name a file inside data_dir.
+
+    Symlinks and '..' are resolved first, so neither can reach outside it.
+
+    Raises:
+        ValueError: If no data_dir is configured or the path leaves it.
+    """
+    if data_dir is None:
+        raise ValueError("This server does not ingest 'paths'; send 'documents' instead")
+    root = os.path.realpath(data_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path is outside the data directory: {path}")
+    return resolved
+
+def create_app(
+    rag_chain: RAGChain,
+    max_batch_size: int = 32,
+    max_wait_ms: float = 5.0,
+    warmup: Optional[WarmupRunner] = None,
+    query_log: Optional[QueryLog] = None,
+    collections: Optional[CollectionManager] = None,
+    data_dir: Optional[str] = None,
+) -> web.Application:
+    """
+    Build the HTTP API around a RAG chain.
+
+    Query embeddings and FAISS searches from concurrent /query and /retrieve
+    requests go through a MicroBatcher, so a burst of N requests costs one
+    embedding forward pass and one index search instead of N. Identical
+    concurrent requests are coalesced first: duplicates await the one
+    in-flight retrieval (same normalized query and k against the same index
+    version) and the one LLM call for the same question and context.
+
+    Args:
+        rag_chain (RAGChain): The chain whose retriever and LLM serve requests.
+        max_batch_size (int): Largest retrieval batch.
+        max_wait_ms (float): Batching window for the first request of a batch.
+        warmup (WarmupRunner, optional): Warm-up whose progress /health reports;
+            until it is hot, /health answers "warming".
+        query_log (QueryLog, optional): Records served queries for future warm-ups.
+        collections (CollectionManager, optional): Named indexes that requests
+            select with a "collection" field; requests without one use rag_chain's.
+        data_dir (str, optional): Directory /ingest "paths" are resolved in;
+            paths outside it are rejected. Without it, "paths" are refused.
+
+    Returns:
+        web.Application: The aiohttp application.
+    """
+    retriever = rag_chain.retriever
+
+    def retrieve_batch(items: List[Tuple[str, int]]) -> List[List[Document]]:
+        fetch_k = max(k for _, k in items)
+        results = retriever.retrieve_batch([query for query, _ in items], k=fetch_k)
+        return [docs[:k] for docs, (_, k) in zip(results, items)]
+
+    batcher = MicroBatcher(retrieve_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    # Separate from any SingleFlight inside rag_chain: a leader here runs
+    # code that may lead the same key there
+    flights = SingleFlight()
+
+    async def on_startup(app):
+        batcher.start()
+
+    async def on_cleanup(app):
+        await batcher.stop()
+        close = getattr(retriever, "close", None)
+        if close is not None:
+            close()
+        if collections is not None:
+            collections.close()
+
+    async def read_query(request: web.Request) -> Tuple[str, int, Dict[str, Any]]:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise bad_request("Body must be JSON")
+        query = body.get("query")
+        k = body.get("k", DEFAULT_K)
+        if not isinstance(query, str) or not query.strip():
+            raise bad_request("'query' is required")
+        if not isinstance(k, int) or isinstance(k, bool) or not 0 < k <= MAX_K:
+            raise bad_request(f"'k' must be an integer between 1 and {MAX_K}")
+        return query, k, body
+
+    def collection_name(body: Dict[str, Any]) -> Optional[str]:
+        name = body.get("collection")
+        if name is not None and collections is None:
+            raise bad_request("This server has no collections")
+        if name is not None and not isinstance(name, str):
+            raise bad_request("'collection' must be a string")
+        return name
+
+    async def fetch_documents(query: str, k: int, body: Dict[str, Any]) -> List[Document]:
+        if query_log is not None:
+            query_log.record(query)
+        name = collection_name(body)
+        if name is not None:
+            # Loading a cold collection reads it from disk; keep it off the event loop
+            def retrieve() -> List[Document]:
+                return collections.retriever(name).retrieve(query, k=k, filter=body.get("filter"))
+            try:
+                return await asyncio.get_running_loop().run_in_executor(None, retrieve)
+            except UnknownCollection:
+                raise web.HTTPNotFound(text=json.dumps({"error": f"Unknown collection: {name}"}),
+                                       content_type="application/json")
+            except ValueError as e:
+                raise bad_request(str(e))
+        if body.get("filter"):
+            # Filtered searches cannot share a batch with other filters
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, lambda: retriever.retrieve(query, k=k, filter=body["filter"])
+            )
+        key = ("retrieve", retriever.index_version(), normalize_query(query), k)
+        return list(await flights.do_async(key, lambda: batcher.submit((query, k))))
+
+    async def handle_retrieve(request: web.Request) -> web.Response:
+        query, k, body = await read_query(request)
+        docs = await fetch_documents(query, k, body)
+        return web.json_response(
+            {"query": query, "documents": [serialize_document(d) for d in docs]}
+        )
+
+    async def gate(query: str, k: int, body: Dict[str, Any]) -> Tuple[List[Document], Any]:
+        """(context, refusal or None) for a query checked by rag_chain's relevance gate."""
+        if query_log is not None:
+            query_log.record(query)
+        # The gate needs distances, which the batched retrieval path drops
+        scored = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: retriever.retrieve_with_scores(query, k=k, filter=body.get("filter"))
+        )
+        verdict = rag_chain.relevance_gate.assess(query, scored)
+        if not verdict["answerable"]:
+            return [], rag_chain.refuse(query, verdict)
+        return retriever.expand_to_parents([doc for doc, _ in scored]), None
+
+    async def handle_query(request: web.Request) -> web.Response:
+        query, k, body = await read_query(request)
+        # The gate is calibrated on the main index; named collections are not gated
+        if rag_chain.relevance_gate is not None and collection_name(body) is None:
+            docs, refusal = await gate(query, k, body)
+            if refusal is not None:
+                return web.json_response({
+                    "query": query, "answer": refusal["answer"], "sources": [], "refused": True,
+                })
+        else:
+            docs = await fetch_documents(query, k, body)
+        loop = asyncio.get_running_loop()
+        result = await flights.do_async(
+            generation_key(query, docs),
+            lambda: loop.run_in_executor(None, rag_chain.generate, query, docs),
+        )
+        return web.json_response({
+            "query": query,
+            "answer": result["answer"],
+            "sources": [serialize_document(d) for d in result["source_documents"]],
+        })
+
+    async def handle_ingest(request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise bad_request("Body must be JSON")
+        name = collection_name(body)
+
+        def ingest() -> int:
+            documents = [
+                Document(page_content=item["text"], metadata=item.get("metadata", {}))
+                for item in body.get("documents", [])
+            ]
+            loader = DocumentLoader()
+            for path in body.get("paths", []):
+                documents.extend(loader.load_file(resolve_data_path(data_dir, path)))
+            chunks = build_chunks(documents)
+            if chunks and name is not None:
+                collections.add_documents(name, chunks)
+            elif chunks:
+                retriever.vector_store_manager.add_documents(chunks)
+            return len(chunks)
+
+        try:
+            added = await asyncio.get_running_loop().run_in_executor(None, ingest)
+        except (KeyError, FileNotFoundError, ValueError) as e:
+            raise bad_request(str(e))
+        return web.json_response({"chunks_added": added})
+
+    async def handle_health(request: web.Request) -> web.Response:
+        body = {"status": "ok", "batcher": batcher.stats(), "single_flight": flights.stats()}
+        if warmup is not None:
+            body["warmup"] = warmup.status()
+            if not warmup.is_hot.is_set():
+                body["status"] = "warming"
+        manager = retriever.vector_store_manager
+        if isinstance(manager, ShardedVectorStoreManager):
+            shards = await asyncio.get_running_loop().run_in_executor(None, manager.health)
+            body["shards"] = shards
+            if not all(shard["healthy"] for shard in shards):
+                body["status"] = "degraded"
+        docstore = getattr(getattr(manager, "vector_store", None), "docstore", None)
+        if isinstance(docstore, TieredDocstore):
+            body["tiers"] = docstore.stats()
+        if collections is not None:
+            stats = collections.stats()
+            body["collections"] = {
+                key: stats[key] for key in ("memory_budget_bytes", "memory_bytes", "loaded")
+            }
+        return web.json_response(body)
+
+    async def handle_collections(request: web.Request) -> web.Response:
+        if collections is None:
+            return web.json_response({"collections": {}, "events": []})
+        stats = collections.stats()
+        stats["events"] = collections.events()
+        return web.json_response(stats)
+
+    app = web.Application()
+    app[BATCHER_KEY] = batcher
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/query", handle_query)
+    app.router.add_post("/retrieve", handle_retrieve)
+    app.router.add_post("/ingest", handle_ingest)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/collections", handle_collections)
+    return app
+
+def build_parent_child_chunks(documents: List[Document]) -> Tuple[List[Document], ParentStore]:
+    """
+    Clean documents and split them into tagged child chunks plus a store of
+    their parent sections.
+    """
+    cleaner = TextCleaner()
+    for doc in documents:
+        doc.page_content = cleaner.clean(doc.page_content)
+    children, parents = ParentChildSplitter().split_documents(documents)
+    parent_store = ParentStore()
+    parent_store.add(MetadataTagger().tag(parents))
+    return MetadataTagger().tag(children), parent_store
+
+def build_rag_chain(
+    data_dir: str,
+    num_shards: int = 1,
+    parent_child: bool = False,
+    llm: Any = None,
+    tiered_storage: Optional[TieredStorage] = None,
+    adaptive_k: bool = False,
+    context_tokens: Optional[int] = None,
+    relevance_gate: Optional[RelevanceGate] = None,
+) -> RAGChain:
+    """
+    Index every supported file in data_dir (across num_shards processes if > 1)
+    and return a ready RAG chain with query embedding and retrieval caches.
+    With parent_child, small chunks are indexed and expanded to their
+    parent sections at retrieval time. llm overrides the LLM_PROVIDER backend.
+    With tiered_storage, only frequently retrieved chunks stay in memory.
+    With adaptive_k, each query over-fetches candidates and is cut at the
+    first sharp score drop. With context_tokens, retrieved chunks are compressed
+    to their most query-relevant sentences within that many tokens. With
+    relevance_gate, /query refuses unanswerable questions without an LLM call.
+    """
+    loader = DocumentLoader()
+    documents = []
+    for filename in sorted(os.listdir(data_dir)):
+        if loader.supports(filename):
+            documents.extend(loader.load_file(os.path.join(data_dir, filename)))
+    parent_store = None
+    if parent_child:
+        chunks, parent_store = build_parent_child_chunks(documents)
+    else:
+        chunks = build_chunks(documents)
+    chunks, _ = NearDuplicateFilter().filter(chunks)
+
+    embedding_model = EmbeddingModel(query_cache=QueryEmbeddingCache())
+    if num_shards > 1:
+        manager = ShardedVectorStoreManager(embedding_model, num_shards=num_shards)
+    else:
+        manager = VectorStoreManager(embedding_model, docstore_factory=tiered_storage)
+    manager.create_index(chunks)
+    single_flight = SingleFlight()
+    retriever = Retriever(
+        vector_store_manager=manager, cache=RetrievalCache(), parent_store=parent_store,
+        single_flight=single_flight,
+        access_stats=tiered_storage.access_stats if tiered_storage is not None else None,
+        adaptive_k=adaptive_k,
+    )
+    compressor = None
+    if context_tokens:
+        compressor = ContextCompressor(embedding_model, max_tokens=context_tokens)
+    return RAGChain(
+        retriever=retriever, llm=llm, single_flight=single_flight, compressor=compressor,
+        relevance_gate=relevance_gate,
+    )
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve the RAG system over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(__file__), '..', 'data'))
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Shard the index across this many processes")
+    parser.add_argument("--watch", action="store_true",
+                        help="Ingest changed files in --data-dir as they appear")
+    parser.add_argument("--parent-child", action="store_true",
+                        help="Index small child chunks and answer from their parent sections")
+    parser.add_argument("--collections-dir",
+                        help="Serve named collections persisted here (selected per request)")
+    parser.add_argument("--memory-budget-mb", type=float, default=1024.0,
+                        help="Resident budget for loaded collections")
+    parser.add_argument("--cold-dir",
+                        help="Keep rarely retrieved chunks in compressed segments here")
+    parser.add_argument("--hot-fraction", type=float, default=0.2,
+                        help="Share of chunks kept in memory with --cold-dir")
+    parser.add_argument("--adaptive-k", action="store_true",
+                        help="Over-fetch hits and drop those after a sharp score drop")
+    parser.add_argument("--context-tokens", type=int,
+                        help="Compress retrieved context to its most relevant sentences "
+                             "within this budget")
+    parser.add_argument("--relevance-gate", default=RELEVANCE_GATE_FILE,
+                        help="Gate fitted by src/calibrate_relevance.py (used if the file exists)")
+    parser.add_argument("--query-log", help="Append served queries to this JSON-lines file")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Skip replaying the query log and eval set at startup")
+    args = parser.parse_args()
+
+    print("--> Building index...")
+    tiered_storage = None
+    if args.cold_dir:
+        if args.shards > 1:
+            parser.error("--cold-dir is not supported with --shards")
+        tiered_storage = TieredStorage(args.cold_dir, hot_fraction=args.hot_fraction)
+    relevance_gate = None
+    if args.relevance_gate and os.path.exists(args.relevance_gate):
+        relevance_gate = RelevanceGate.load(args.relevance_gate)
+        print(f"--> Refusing unanswerable questions with the gate in {args.relevance_gate}")
+    rag_chain = build_rag_chain(args.data_dir, args.shards, args.parent_child,
+                                tiered_storage=tiered_storage, adaptive_k=args.adaptive_k,
+                                context_tokens=args.context_tokens,
+                                relevance_gate=relevance_gate)
+    if tiered_storage is not None:
+        tiered_storage.start(rag_chain.retriever.vector_store_manager)
+        print(f"--> Tiering chunks: {args.hot_fraction:.0%} hot, the rest in {args.cold_dir}")
+    if args.watch:
+        if args.shards > 1:
+            parser.error("--watch is not supported with --shards")
+        if args.parent_child:
+            parser.error("--watch is not supported with --parent-child")
+        start_ingestion_daemon(rag_chain.retriever.vector_store_manager, args.data_dir)
+        print(f"--> Watching {args.data_dir} for changes")
+    warmup = None
+    if not args.no_warmup:
+        queries = default_warmup_queries(args.data_dir, args.query_log)
+        warmup = WarmupRunner(rag_chain.retriever, queries, k=DEFAULT_K).start()
+        print(f"--> Warming up with {len(queries)} queries in the background")
+    query_log = QueryLog(args.query_log) if args.query_log else None
+    collections = None
+    if args.collections_dir:
+        collections = CollectionManager(
+            rag_chain.retriever.vector_store_manager.embedding_model, args.collections_dir,
+            memory_budget_mb=args.memory_budget_mb,
+            retriever_factory=lambda manager: Retriever(manager, single_flight=SingleFlight()),
+        )
+        print(f"--> Serving {len(collections.names())} collection(s) from {args.collections_dir}")
+    print(f"--> Serving on http://{args.host}:{args.port}")
+    app = create_app(rag_chain, args.max_batch_size, args.max_wait_ms, warmup=warmup,
+                     query_log=query_log, collections=collections, data_dir=args.data_dir)
+    web.run_app(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+def shard_for(doc: Document, num_shards: int) -> int:
+    """Stable hash partitioning: the same chunk always lands on the same shard."""
+    key = f"{doc.metadata.get('source', '')}\0{doc.page_content}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") % num_shards
+
+def merge_topk(
+    distances: Sequence[np.ndarray], positions: Sequence[np.ndarray], k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge per-shard (n, k) search results into a global top-k.
+
+    Args:
+        distances (Sequence[np.ndarray]): Per-shard distance matrices (lower is better).
+        positions (Sequence[np.ndarray]): Matching global position matrices; -1 marks a miss.
+        k (int): Neighbours to keep per query.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (distances, positions), each of shape (n, k).
+    """
+    all_distances = np.concatenate(distances, axis=1)
+    all_positions = np.concatenate(positions, axis=1)
+    all_distances[all_positions == -1] = np.inf
+    order = np.argsort(all_distances, axis=1, kind="stable")[:, :k]
+    top_distances = np.take_along_axis(all_distances, order, axis=1)
+    top_positions = np.take_along_axis(all_positions, order, axis=1)
+    if top_positions.shape[1] < k:
+        pad = k - top_positions.shape[1]
+        top_distances = np.pad(top_distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        top_positions = np.pad(top_positions, ((0, 0), (0, pad)), constant_values=-1)
+    return top_distances, top_positions
+
+def _shard_worker(conn):
+    """Shard process: hosts one flat FAISS index, its documents and metadata postings."""
+    import faiss
+    from src.metadata_index import MetadataIndex
+
+    index = None
+    documents: List[Document] = []
+    metadata_index = MetadataIndex()
+
+    def search(vectors, k, filter):
+        n = len(vectors)
+        if index is None or index.ntotal == 0:
+            return np.full((n, k), np.inf, dtype=np.float32), np.full((n, k), -1, dtype=np.int64)
+        if not filter:
+            return index.search(vectors, k)
+        bits = metadata_index.match(filter)
+        if not bits:
+            return np.full((n, k), np.inf, dtype=np.float32), np.full((n, k), -1, dtype=np.int64)
+        bitmap = metadata_index.to_bitmap(bits)
+        selector = faiss.IDSelectorBitmap(metadata_index.size, faiss.swig_ptr(bitmap))
+        return index.search(vectors, k, params=faiss.SearchParameters(sel=selector))
+
+    while True:
+        try:
+            request_id, op, payload = conn.recv()
+        except EOFError:
+            return
+        try:
+            if op == "stop":
+                conn.send((request_id, True, None))
+                return
+            if op == "add":
+                vectors, docs = payload
+                if index is None:
+                    index = faiss.IndexFlatL2(vectors.shape[1])
+                start = index.ntotal
+                index.add(vectors)
+                documents.extend(docs)
+                metadata_index.add_batch(start, [doc.metadata for doc in docs])
+                result = index.ntotal
+            elif op == "reset":
+                index, documents, metadata_index = None, [], MetadataIndex()
+                result = 0
+            elif op == "truncate":
+                # Roll back to the first `payload` entries (undoes a partial add)
+                size = payload
+                if index is not None and index.ntotal > size:
+                    index.remove_ids(np.arange(size, index.ntotal, dtype=np.int64))
+                documents = documents[:size]
+                metadata_index = MetadataIndex()
+                metadata_index.add_batch(0, [doc.metadata for doc in documents])
+                result = len(documents)
+            elif op == "search":
+                result = search(*payload)
+            elif op == "get_documents":
+                result = [documents[p] for p in payload]
+            elif op == "get_vectors":
+                result = index.reconstruct_batch(np.asarray(payload, dtype=np.int64))
+            elif op == "ping":
+                result = 0 if index is None else index.ntotal
+            else:
+                raise ValueError(f"Unknown shard operation: {op}")
+            conn.send((request_id, True, result))
+        except Exception as e:
+            conn.send((request_id, False, repr(e)))
+
+class ShardUnavailable(RuntimeError):
+    """A shard process died or did not answer before the timeout."""
+
+class _ReadWriteLock:
+    """Many readers or one writer; a waiting writer holds back new readers."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+class _Shard:
+    def __init__(self, shard_id: int, context, latency_window: int):
+        self.shard_id = shard_id
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_shard_worker, args=(child_conn,), name=f"vector-shard-{shard_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latencies_ms: deque = deque(maxlen=latency_window)
+        # Local position -> global position
+        self.global_positions = np.zeros(0, dtype=np.int64)
+
+    def send(self, request_id: int, op: str, payload: Any = None) -> float:
+        self.conn.send((request_id, op, payload))
+        return time.perf_counter()
+
+    def receive(self, request_id: int, started: float, timeout_s: float) -> Any:
+        deadline = started + timeout_s
+        while True:
+            remaining = deadline - time.perf_counter()
+            if not self.process.is_alive() and not self.conn.poll():
+                self.errors += 1
+                raise ShardUnavailable(f"Shard {self.shard_id} is not running")
+            if remaining <= 0 or not self.conn.poll(remaining):
+                self.timeouts += 1
+                raise ShardUnavailable(f"Shard {self.shard_id} timed out after {timeout_s:.2f}s")
+            reply_id, ok, result = self.conn.recv()
+            # Replies to requests that timed out earlier are stale; skip them
+            if reply_id != request_id:
+                continue
+            self.requests += 1
+            self.latencies_ms.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                self.errors += 1
+                raise RuntimeError(f"Shard {self.shard_id} failed: {result}")
+            return result
+
+class ShardedVectorStoreManager:
+    def __init__(
+        self,
+        embedding_model: Any,
+        num_shards: int = 4,
+        timeout_s: float = 5.0,
+        start_method: str = "spawn",
+        latency_window: int = 256,
+    ):
+        """
+        Initialize a vector store split across worker processes.
+
+        Chunks are hash-partitioned over num_shards processes, each owning a
+        flat FAISS index, its documents and its metadata postings. Queries are
+        embedded once here, scattered to every shard and the per-shard top-k
+        lists merged. Exposes the same methods Retriever uses on
+        VectorStoreManager, so it is a drop-in replacement.
+
+        Args:
+            embedding_model (EmbeddingModel): The embedding model wrapper.
+            num_shards (int): Number of shard processes.
+            timeout_s (float): Per-request shard timeout. A shard that misses it
+                is reported unhealthy and searches return the other shards' results.
+            start_method (str): multiprocessing start method.
+            latency_window (int): Recent requests kept per shard for latency stats.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.embedding_model = embedding_model
+        self.num_shards = num_shards
+        self.timeout_s = timeout_s
+        context = multiprocessing.get_context(start_method)
+        self._shards = [_Shard(i, context, latency_window) for i in range(num_shards)]
+        # Global position -> (shard, local position)
+        self._locations = np.zeros((0, 2), dtype=np.int64)
+        self._dim = 0
+        # Bumped on every write, so result caches keyed on it never serve stale hits
+        self.version = 0
+        self._request_ids = itertools.count(1)
+        # Writes (reset, add) are exclusive; searches and lookups share the
+        # lock, so they never map shard replies through half-updated positions
+        self._lock = _ReadWriteLock()
+        # Set when a failed add could not be rolled back on every shard
+        self._failed: Optional[Exception] = None
+        self._closed = False
+
+    def _scatter(
+        self, requests: Dict[int, Tuple[str, Any]], tolerate_failures: bool = False
+    ) -> Dict[int, Any]:
+        """
+        Send each shard its request, then gather the replies.
+
+        Raises the first shard failure unless tolerate_failures is set, in
+        which case failures are logged and the other shards' replies returned.
+        """
+        results, failures = self._exchange(requests)
+        if failures:
+            if not tolerate_failures:
+                raise failures[0]
+            for error in failures:
+                logger.warning("Searching without a shard: %s", error)
+        return results
+
+    def _exchange(
+        self, requests: Dict[int, Tuple[str, Any]]
+    ) -> Tuple[Dict[int, Any], List[Exception]]:
+        """
+        (replies by shard, failures) for one request per shard.
+
+        Shard locks are taken in shard order so concurrent scatters cannot
+        deadlock, and all requests are sent before any reply is awaited so
+        the shards work in parallel.
+        """
+        shard_ids = sorted(requests)
+        request_id = next(self._request_ids)
+        started = {}
+        for shard_id in shard_ids:
+            self._shards[shard_id].lock.acquire()
+        try:
+            results, failures = {}, []
+            for shard_id in shard_ids:
+                op, payload = requests[shard_id]
+                try:
+                    started[shard_id] = self._shards[shard_id].send(request_id, op, payload)
+                except OSError as e:
+                    self._shards[shard_id].errors += 1
+                    failures.append(ShardUnavailable(f"Shard {shard_id} is not reachable: {e}"))
+            for shard_id in started:
+                try:
+                    results[shard_id] = self._shards[shard_id].receive(
+                        request_id, started[shard_id], self.timeout_s
+                    )
+                except (ShardUnavailable, RuntimeError) as e:
+                    failures.append(e)
+        finally:
+            for shard_id in shard_ids:
+                self._shards[shard_id].lock.release()
+        return results, failures
+
+    def create_index(self, documents: List[Document]):
+        """
+        Replace the sharded index with the given documents.
+
+        Args:
+            documents (List[Document]): The documents to index.
+        """
+        with self._lock.write():
+            self._scatter({shard.shard_id: ("reset", None) for shard in self._shards})
+            self._failed = None
+            for shard in self._shards:
+                shard.size = 0
+                shard.global_positions = np.zeros(0, dtype=np.int64)
+            self._locations = np.zeros((0, 2), dtype=np.int64)
+            self.version += 1
+            self._add(documents)
+
+    def add_documents(self, documents: List[Document]):
+        """
+        Add documents to the sharded index.
+
+        If a shard fails or times out, the shards that took their share are
+        rolled back and the error is raised; the index is unchanged.
+
+        Args:
+            documents (List[Document]): The documents to add.
+        """
+        with self._lock.write():
+            self._add(documents)
+            self.version += 1
+
+    def _add(self, documents: List[Document]):
+        if self._failed is not None:
+            raise RuntimeError(
+                "Sharded index is inconsistent after a failed add; rebuild it with create_index"
+            ) from self._failed
+        if not documents:
+            return
+        vectors = np.asarray(
+            self.embedding_model.embed_documents([d.page_content for d in documents]),
+            dtype=np.float32,
+        )
+        self._dim = vectors.shape[1]
+        assignment = np.array([shard_for(d, self.num_shards) for d in documents], dtype=np.int64)
+        start = len(self._locations)
+        global_positions = np.arange(start, start + len(documents), dtype=np.int64)
+
+        requests = {}
+        local_positions = np.zeros(len(documents), dtype=np.int64)
+        for shard in self._shards:
+            members = np.flatnonzero(assignment == shard.shard_id)
+            if len(members) == 0:
+                continue
+            local_positions[members] = shard.size + np.arange(len(members))
+            requests[shard.shard_id] = ("add", (vectors[members], [documents[i] for i in members]))
+
+        _, failures = self._exchange(requests)
+        if failures:
+            self._roll_back(list(requests), failures[0])
+            raise failures[0]
+        for shard_id in requests:
+            shard = self._shards[shard_id]
+            members = np.flatnonzero(assignment == shard_id)
+            shard.global_positions = np.concatenate(
+                [shard.global_positions, global_positions[members]]
+            )
+            shard.size += len(members)
+        self._locations = np.concatenate(
+            [self._locations, np.stack([assignment, local_positions], axis=1)]
+        )
+
+    def _roll_back(self, shard_ids: List[int], error: Exception):
+        # Failed shards are truncated too: one that timed out may still apply the add
+        _, failures = self._exchange(
+            {shard_id: ("truncate", self._shards[shard_id].size) for shard_id in shard_ids}
+        )
+        if failures:
+            logger.error("Could not roll back a failed add: %s", failures[0])
+            self._failed = error
+        else:
+            logger.warning("Rolled back a failed add on shards %s: %s", shard_ids, error)
+
+    def search_by_vectors(
+        self, query_vectors, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scatter a search to every shard and merge the per-shard top-k.
+
+        Args:
+            query_vectors: A single vector or a (n, dim) matrix of query vectors.
+            k (int): Number of neighbours per query.
+            filter (dict, optional): Metadata filter, applied inside each shard's search.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (distances, global positions), each of
+            shape (n, k). Missing neighbours have position -1.
+        """
+        vectors = np.array(query_vectors, dtype=np.float32, ndmin=2)
+        with self._lock.read():
+            results = self._scatter(
+                {
+                    shard.shard_id: ("search", (vectors, k, filter))
+                    for shard in self._shards if shard.size
+                },
+                tolerate_failures=True,
+            )
+            mappings = {shard_id: self._shards[shard_id].global_positions for shard_id in results}
+        if not results:
+            return (np.full((len(vectors), k), np.inf, dtype=np.float32),
+                    np.full((len(vectors), k), -1, dtype=np.int64))
+
+        distances, positions = [], []
+        for shard_id, (shard_distances, local_positions) in results.items():
+            mapping = mappings[shard_id]
+            # Entries past the known size are left over from a failed rollback
+            found = (local_positions != -1) & (local_positions < len(mapping))
+            positions.append(np.where(found, mapping[np.where(found, local_positions, 0)], -1))
+            distances.append(np.where(found, shard_distances, np.inf))
+        return merge_topk(distances, positions, k)
+
+    def _gather_by_shard(
+        self, op: str, positions: Sequence[int]
+    ) -> Tuple[List[int], Dict[int, Any]]:
+        """(owning shard of each wanted position, replies by shard); -1 entries are skipped."""
+        wanted = [int(p) for p in positions if p != -1]
+        with self._lock.read():
+            locations = self._locations[wanted] if wanted else np.zeros((0, 2), dtype=np.int64)
+            requests = {}
+            for shard_id in np.unique(locations[:, 0]):
+                requests[int(shard_id)] = (op, locations[locations[:, 0] == shard_id, 1].tolist())
+            return locations[:, 0].tolist(), self._scatter(requests)
+
+    def get_documents(self, positions: Sequence[int]) -> List[Document]:
+        """
+        Look up documents by global position, fetching each shard's share in parallel.
+
+        Args:
+            positions (Sequence[int]): Global positions; -1 entries are skipped.
+
+        Returns:
+            List[Document]: Documents in the same order as positions.
+        """
+        owners, results = self._gather_by_shard("get_documents", positions)
+        iterators = {shard_id: iter(docs) for shard_id, docs in results.items()}
+        return [next(iterators[shard_id]) for shard_id in owners]
+
+    def get_vectors(self, positions: Sequence[int]) -> np.ndarray:
+        """Reconstruct the stored embedding vectors at the given global positions."""
+        owners, results = self._gather_by_shard("get_vectors", positions)
+        if not owners:
+            return np.zeros((0, self._dim), dtype=np.float32)
+        iterators = {shard_id: iter(vectors) for shard_id, vectors in results.items()}
+        return np.stack([next(iterators[shard_id]) for shard_id in owners])
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Scatter-gather similarity search returning (document, L2 distance) pairs."""
+        distances, positions = self.search_by_vectors(self.embedding_model.embed_query(query), k)
+        found = positions[0] != -1
+        return list(zip(self.get_documents(positions[0][found]), distances[0][found].tolist()))
+
+    @property
+    def vector_store(self) -> Optional["ShardedVectorStoreManager"]:
+        # Retriever.retrieve_with_logs calls vector_store.similarity_search_with_score
+        return self if len(self._locations) else None
+
+    def get_retriever(self, k: int = 4) -> "ShardedRetriever":
+        """Returns a retriever over all shards."""
+        if not len(self._locations):
+            raise ValueError("Vector store not initialized.")
+        return ShardedRetriever(self, k)
+
+    def health(self) -> List[Dict[str, Any]]:
+        """
+        Ping every shard and report its state and recent latency.
+
+        Returns:
+            List[dict]: Per shard: alive, healthy (answered the ping), size,
+            requests, errors, timeouts and p50/p95/last latency in ms.
+        """
+        reachable = set()
+        for shard in self._shards:
+            try:
+                reachable.update(self._scatter({shard.shard_id: ("ping", None)}))
+            except (ShardUnavailable, RuntimeError) as e:
+                logger.warning("Shard health check failed: %s", e)
+
+        report = []
+        for shard in self._shards:
+            latencies = np.asarray(shard.latencies_ms, dtype=np.float64)
+            report.append({
+                "shard": shard.shard_id,
+                "alive": shard.process.is_alive(),
+                "healthy": shard.shard_id in reachable,
+                "size": shard.size,
+                "requests": shard.requests,
+                "errors": shard.errors,
+                "timeouts": shard.timeouts,
+                "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else None,
+                "last_latency_ms": float(latencies[-1]) if len(latencies) else None,
+            })
+        return report
+
+    def close(self):
+        """Stop the shard processes."""
+        if self._closed:
+            return
+        self._closed = True
+        for shard in self._shards:
+            try:
+                with shard.lock:
+                    started = shard.send(0, "stop")
+                    shard.receive(0, started, self.timeout_s)
+            except (ShardUnavailable, RuntimeError, OSError):
+                pass
+            shard.process.join(timeout=self.timeout_s)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ShardedRetriever:
+    """Minimal stand-in for the LangChain retriever returned by VectorStoreManager.get_retriever."""
+
+    def __init__(self, manager: ShardedVectorStoreManager, k: int):
+        self.manager = manager
+        self.k = k
+
+    def invoke(self, query: str) -> List[Document]:
+        return [doc for doc, _ in self.manager.similarity_search_with_score(query, k=self.k)]
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesce concurrent calls that share a key into one computation.
+
+        The first caller for a key (the leader) runs the work; callers that
+        arrive while it is in flight wait for the leader's result (or
+        exception) instead of repeating it. Once the flight lands the key is
+        released, so later calls compute afresh (pair with a cache to serve
+        those). Thread callers use do(); coroutines use do_async(). Both share
+        the same flights, so a coroutine can join a flight led by a thread
+        and the other way round.
+
+        Keys should include everything the result depends on, typically the
+        index version and the normalized query.
+        """
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+
+    def _join(self, key: Hashable):
+        """(future, is_leader) for key, starting a new flight if none is in progress."""
+        with self._lock:
+            self.calls += 1
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self.executions += 1
+            return future, True
+
+    def _land(self, key: Hashable, future: Future):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() once for all concurrent callers with this key.
+
+        Must not be called from an event loop thread while that loop leads
+        the same key (it would block the loop the leader needs).
+
+        Args:
+            key (Hashable): Identity of the computation.
+            fn (Callable[[], Any]): The work; only the leader runs it.
+
+        Returns:
+            The leader's result. The leader's exception is raised in every caller.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._land(key, future)
+            future.set_exception(e)
+            raise
+        self._land(key, future)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once for all concurrent callers with this key.
+
+        Args:
+            key (Hashable): Identity of the computation.
+            fn (Callable[[], Awaitable]): Returns the awaitable to run; only
+                the leader calls it.
+
+        Returns:
+            The leader's result. If the leader is cancelled, waiting callers
+            are cancelled too.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._land(key, future)
+            future.cancel()
+            raise
+        except BaseException as e:
+            self._land(key, future)
+            future.set_exception(e)
+            raise
+        self._land(key, future)
+        future.set_result(result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        """Calls, executions (leaders) and calls served by another caller's flight."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.calls - self.executions,
+                "in_flight": len(self._flights),
+            }
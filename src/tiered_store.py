@@ -0,0 +1,338 @@
+import hashlib
+import itertools
+import logging
+import os
+import pickle
+import threading
+import uuid
+import weakref
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+def chunk_key(doc: Document) -> str:
+    """
+    Stable identity of a chunk across index versions.
+
+    FAISS docstore ids are regenerated whenever a snapshot is rebuilt, so
+    access statistics are keyed on source and content instead.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(str(doc.metadata.get("source", "")).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(doc.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+class AccessStats:
+    def __init__(self, decay: float = 0.5):
+        """
+        Per-chunk retrieval counters.
+
+        Args:
+            decay (float): Factor applied to every counter at each re-tiering,
+                so the hot set follows shifting traffic.
+        """
+        self.decay = decay
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def record(self, docs: Iterable[Document]):
+        """Count one access for each retrieved chunk."""
+        keys = [chunk_key(doc) for doc in docs]
+        with self._lock:
+            self._counts.update(keys)
+            self.total += len(keys)
+
+    def counts(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counts)
+
+    def age(self):
+        """Decay every counter and forget those that fall below one access."""
+        with self._lock:
+            self._counts = Counter({
+                key: count * self.decay
+                for key, count in self._counts.items() if count * self.decay >= 1
+            })
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+def fill_hot_set(ranked: List[str], candidates: Iterable[str], max_hot: int) -> List[str]:
+    """
+    The max_hot ids to keep in memory: the ranked (accessed) ids first, then
+    candidates in order for any free slots.
+
+    Filling the free slots keeps a fresh process, or one with little traffic
+    so far, from serving everything off disk.
+    """
+    hot = list(ranked[:max_hot])
+    chosen = set(hot)
+    for doc_id in candidates:
+        if len(hot) >= max_hot:
+            break
+        if doc_id not in chosen:
+            chosen.add(doc_id)
+            hot.append(doc_id)
+    return hot
+
+def _remove_file(file, path: str):
+    try:
+        file.close()
+        os.remove(path)
+    except OSError:
+        pass
+
+class TieredDocstore(Docstore, AddableMixin):
+    """
+    FAISS docstore keeping hot chunks in memory and cold ones in a compressed segment.
+
+    Cold records are zlib-compressed pickles appended to a per-store segment
+    file and read back by offset on demand. The segment is deleted when the
+    store is garbage collected (i.e. when its snapshot is released).
+    """
+
+    def __init__(self, segment_path: str, documents: Optional[Dict[str, Document]] = None,
+                 hot_ids: Optional[Iterable[str]] = None, compression_level: int = 6):
+        """
+        Args:
+            segment_path (str): File for cold records (created, must not exist).
+            documents (Dict[str, Document], optional): Initial id -> document.
+            hot_ids (Iterable[str], optional): Ids kept in memory; the rest
+                start cold. Defaults to all hot.
+            compression_level (int): zlib level for cold records.
+        """
+        self.segment_path = segment_path
+        self.compression_level = compression_level
+        self._hot: Dict[str, Document] = {}
+        self._cold: Dict[str, Tuple[int, int]] = {}
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._file = open(segment_path, "x+b")
+        self._finalizer = weakref.finalize(self, _remove_file, self._file, segment_path)
+        self._segment_bytes = 0
+        self._garbage_bytes = 0
+        self.hot_hits = 0
+        self.cold_reads = 0
+
+        documents = documents or {}
+        hot = set(documents) if hot_ids is None else set(hot_ids)
+        for doc_id, doc in documents.items():
+            self._keys[doc_id] = chunk_key(doc)
+            if doc_id in hot:
+                self._hot[doc_id] = doc
+            else:
+                self._cold[doc_id] = self._append(doc)
+        self._file.flush()
+
+    def __reduce__(self):
+        # save_local pickles the docstore: persist plain, fully materialized documents
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        return InMemoryDocstore, ({doc_id: self.search(doc_id) for doc_id in self.ids()},)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._keys)
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Look up a document by id (same contract as InMemoryDocstore)."""
+        doc = self._hot.get(search)
+        if doc is not None:
+            self.hot_hits += 1
+            return doc
+        with self._lock:
+            location = self._cold.get(search)
+            if location is None:
+                doc = self._hot.get(search)
+                return doc if doc is not None else f"ID {search} not found."
+            self.cold_reads += 1
+            return self._read(*location)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add documents; they start hot until the next re-tiering."""
+        with self._lock:
+            overlapping = set(texts).intersection(self._keys)
+            if overlapping:
+                raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+            for doc_id, doc in texts.items():
+                self._keys[doc_id] = chunk_key(doc)
+                self._hot[doc_id] = doc
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            if not set(ids).intersection(self._keys):
+                raise ValueError(f"Tried to delete ids that does not  exist: {ids}")
+            for doc_id in ids:
+                self._keys.pop(doc_id, None)
+                self._hot.pop(doc_id, None)
+                location = self._cold.pop(doc_id, None)
+                if location is not None:
+                    self._garbage_bytes += location[1]
+
+    def retier(self, counts: Dict[str, float], max_hot: int) -> Dict[str, int]:
+        """
+        Keep the max_hot most accessed chunks in memory and move the rest to disk.
+
+        Slots the accessed chunks do not fill stay with chunks already in
+        memory, then go to cold ones.
+
+        Args:
+            counts (Dict[str, float]): Access counts keyed by chunk_key.
+            max_hot (int): Chunks allowed in memory.
+
+        Returns:
+            Dict[str, int]: 'promoted' and 'demoted' chunk counts.
+        """
+        with self._lock:
+            ranked = sorted(
+                (doc_id for doc_id, key in self._keys.items() if counts.get(key, 0) > 0),
+                key=lambda doc_id: counts[self._keys[doc_id]], reverse=True,
+            )
+            wanted = set(fill_hot_set(ranked, itertools.chain(self._hot, self._keys), max_hot))
+            promote = [doc_id for doc_id in wanted if doc_id in self._cold]
+            demote = [doc_id for doc_id in self._hot if doc_id not in wanted]
+            for doc_id in promote:
+                offset, length = self._cold.pop(doc_id)
+                self._hot[doc_id] = self._read(offset, length)
+                self._garbage_bytes += length
+            for doc_id in demote:
+                self._cold[doc_id] = self._append(self._hot.pop(doc_id))
+            self._file.flush()
+            if self._garbage_bytes > self._segment_bytes / 2:
+                self._compact()
+        return {"promoted": len(promote), "demoted": len(demote)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Tier sizes, segment size and read counters."""
+        with self._lock:
+            hot_bytes = sum(len(doc.page_content) for doc in self._hot.values())
+            return {
+                "hot": len(self._hot),
+                "cold": len(self._cold),
+                "hot_text_bytes": hot_bytes,
+                "segment_bytes": self._segment_bytes,
+                "garbage_bytes": self._garbage_bytes,
+                "hot_hits": self.hot_hits,
+                "cold_reads": self.cold_reads,
+            }
+
+    def close(self):
+        """Delete the segment file; the store must not be used afterwards."""
+        self._finalizer()
+
+    def _append(self, doc: Document) -> Tuple[int, int]:
+        record = zlib.compress(
+            pickle.dumps((doc.id, doc.page_content, doc.metadata),
+                         protocol=pickle.HIGHEST_PROTOCOL),
+            self.compression_level,
+        )
+        offset = self._segment_bytes
+        self._file.seek(offset)
+        self._file.write(record)
+        self._segment_bytes += len(record)
+        return offset, len(record)
+
+    def _read(self, offset: int, length: int) -> Document:
+        self._file.seek(offset)
+        # The segment is private to this process and written above
+        doc_id, page_content, metadata = pickle.loads(zlib.decompress(self._file.read(length)))
+        return Document(id=doc_id, page_content=page_content, metadata=metadata)
+
+    def _compact(self):
+        """Rewrite the segment with only live cold records."""
+        records = {doc_id: self._read(*location) for doc_id, location in self._cold.items()}
+        self._file.seek(0)
+        self._file.truncate()
+        self._segment_bytes = self._garbage_bytes = 0
+        self._cold = {doc_id: self._append(doc) for doc_id, doc in records.items()}
+        self._file.flush()
+
+class TieredStorage:
+    def __init__(self, segment_dir: str, hot_fraction: float = 0.2,
+                 access_stats: Optional[AccessStats] = None, min_hot: int = 64):
+        """
+        Hot/cold chunk storage policy for a VectorStoreManager.
+
+        Pass it as VectorStoreManager(docstore_factory=...): every new
+        snapshot's docstore is converted to a TieredDocstore whose hot set is
+        chosen from the access statistics so far, topped up with unranked
+        chunks up to the hot budget. start() re-tiers the live
+        snapshot in the background as traffic shifts.
+
+        Args:
+            segment_dir (str): Directory for cold segment files.
+            hot_fraction (float): Share of chunks kept in memory.
+            access_stats (AccessStats, optional): Counters fed by Retriever.
+            min_hot (int): Lower bound on the hot set for small indexes.
+        """
+        self.segment_dir = segment_dir
+        self.hot_fraction = hot_fraction
+        self.access_stats = access_stats if access_stats is not None else AccessStats()
+        self.min_hot = min_hot
+        self.retierings = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(segment_dir, exist_ok=True)
+
+    def max_hot(self, total: int) -> int:
+        return max(int(total * self.hot_fraction), min(self.min_hot, total))
+
+    def __call__(self, docstore: Any) -> TieredDocstore:
+        """Convert a snapshot's docstore (InMemoryDocstore) into a TieredDocstore."""
+        if isinstance(docstore, TieredDocstore):
+            return docstore
+        documents = dict(getattr(docstore, "_dict", {}))
+        counts = self.access_stats.counts()
+        ranked = sorted(
+            (doc_id for doc_id, doc in documents.items() if counts.get(chunk_key(doc), 0) > 0),
+            key=lambda doc_id: counts[chunk_key(documents[doc_id])], reverse=True,
+        )
+        path = os.path.join(self.segment_dir, f"segment-{uuid.uuid4().hex}.zlib")
+        hot_ids = fill_hot_set(ranked, documents, self.max_hot(len(documents)))
+        return TieredDocstore(path, documents, hot_ids=hot_ids)
+
+    def retier(self, vector_store_manager: Any) -> Optional[Dict[str, int]]:
+        """Re-tier the live snapshot from the current counters, then age the counters."""
+        with vector_store_manager.acquire() as snapshot:
+            docstore = snapshot.vector_store.docstore
+            if not isinstance(docstore, TieredDocstore):
+                return None
+            result = docstore.retier(self.access_stats.counts(), self.max_hot(len(docstore)))
+        self.access_stats.age()
+        self.retierings += 1
+        logger.info("Re-tiered chunks: %d promoted, %d demoted",
+                    result["promoted"], result["demoted"])
+        return result
+
+    def start(self, vector_store_manager: Any, interval_s: float = 60.0):
+        """Re-tier every interval_s seconds in a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.retier(vector_store_manager)
+                except ValueError:
+                    continue  # no index yet
+                except Exception:
+                    logger.exception("Re-tiering failed")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="chunk-retiering", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
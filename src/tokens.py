@@ -0,0 +1,90 @@
+import functools
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_ENCODING = "cl100k_base"
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING):
+    """
+    Returns a tiktoken encoding, loading each one only once per process.
+
+    Args:
+        encoding_name (str): The tiktoken encoding name.
+    """
+    import tiktoken
+    return tiktoken.get_encoding(encoding_name)
+
+class TokenCounter:
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING, encoding: Optional[Any] = None):
+        """
+        Initialize the token counter.
+
+        Args:
+            encoding_name (str): tiktoken encoding to use.
+            encoding (optional): Pre-built encoding object exposing encode,
+                encode_batch and decode_with_offsets. Overrides encoding_name.
+        """
+        self.encoding_name = encoding_name
+        self._encoding = encoding
+
+    @property
+    def encoding(self):
+        # Resolved lazily so constructing a counter never triggers a download
+        if self._encoding is None:
+            self._encoding = get_encoding(self.encoding_name)
+        return self._encoding
+
+    def encode(self, text: str) -> List[int]:
+        """Encodes text into token ids."""
+        return self.encoding.encode(text, disallowed_special=())
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Encodes several texts in one call (parallelised by tiktoken)."""
+        return self.encoding.encode_batch(texts, disallowed_special=())
+
+    def count(self, text: str) -> int:
+        """Returns the number of tokens in text."""
+        if not text:
+            return 0
+        return len(self.encode(text))
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """Returns the token count of each text."""
+        return [len(tokens) for tokens in self.encode_batch(texts)]
+
+    def token_offsets(self, tokens: List[int]) -> List[int]:
+        """Returns the character offset at which each token starts in the decoded text."""
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        return offsets
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter(encoding_name: str = DEFAULT_ENCODING) -> TokenCounter:
+    """Returns the shared TokenCounter for an encoding."""
+    return TokenCounter(encoding_name)
+
+def describe_token_counts(counts: Sequence[int]) -> Dict[str, float]:
+    """
+    Summarizes a token count distribution.
+
+    Args:
+        counts (Sequence[int]): Token counts, e.g. one per chunk.
+
+    Returns:
+        dict: count, min, max, mean and the p50/p90/p99 percentiles.
+    """
+    if not counts:
+        return {"count": 0, "min": 0, "max": 0, "mean": 0.0, "p50": 0, "p90": 0, "p99": 0}
+    ordered = sorted(counts)
+
+    def percentile(p: float) -> int:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p99": percentile(0.99),
+    }
@@ -1,18 +1,46 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
-from typing import List
+from src.embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+from src.metadata_index import MetadataIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
 class EmbeddingModel:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ):
         """
         Initialize the embedding model.
         
         Args:
             model_name (str): The name of the HuggingFace embedding model to use.
+            query_cache (QueryEmbeddingCache, optional): Serves repeated query
+                embeddings from memory, including searches made through the
+                LangChain vector store.
         """
         if not model_name:
-             model_name = "sentence-transformers/all-MiniLM-L6-v2"
+             model_name = DEFAULT_EMBEDDING_MODEL
+        self.model_name = model_name
         # Runs locally, no API key needed
         self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        self.query_cache = query_cache
+        if query_cache is not None:
+            self.embeddings = CachedEmbeddings(self.embeddings, query_cache)
 
     def embed_query(self, text: str) -> List[float]:
         """
@@ -26,6 +54,22 @@ class EmbeddingModel:
         """
         return self.embeddings.embed_query(text)
 
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several query strings in a single forward pass.
+        
+        Args:
+            texts (List[str]): The queries to embed.
+            
+        Returns:
+            List[List[float]]: One embedding vector per query.
+        """
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.embed_queries(texts)
+        # Symmetric models embed queries and documents identically, so the
+        # batched document path is the batched query path.
+        return self.embeddings.embed_documents(texts)
+
     def embed_documents(self, documents: List[str]) -> List[List[float]]:
         """
         Embed a list of documents.
@@ -38,44 +82,498 @@ class EmbeddingModel:
         """
         return self.embeddings.embed_documents(documents)
 
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
+CURRENT_SNAPSHOT_FILE = "CURRENT"
+_SNAPSHOT_DIR = re.compile(r"^v\d+$")
+
+def build_metadata_index(documents: Sequence[Document]) -> MetadataIndex:
+    """Index chunk metadata by FAISS position (insertion order)."""
+    metadata_index = MetadataIndex()
+    metadata_index.add_batch(0, [doc.metadata for doc in documents])
+    return metadata_index
+
+def prune_snapshots(root: str, keep: int = 1) -> List[str]:
+    """
+    Delete superseded snapshot versions under root.
+
+    The version CURRENT points at is always kept, plus the newest keep - 1
+    others for rollback with load_snapshot(root, version).
+
+    Args:
+        root (str): Snapshot directory written by save_snapshot.
+        keep (int): Versions to keep, CURRENT included (at least 1).
+
+    Returns:
+        List[str]: The deleted version directories.
+    """
+    with open(os.path.join(root, CURRENT_SNAPSHOT_FILE), encoding="utf-8") as f:
+        current = f.read().strip()
+    others = sorted(
+        (name for name in os.listdir(root)
+         if _SNAPSHOT_DIR.match(name) and name != current
+         and os.path.isdir(os.path.join(root, name))),
+        key=lambda name: int(name[1:]),
+        reverse=True,
+    )
+    removed = []
+    for name in others[max(keep - 1, 0):]:
+        path = os.path.join(root, name)
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    if removed:
+        logger.info("Pruned %d old snapshot(s) under %s", len(removed), root)
+    return removed
+
+class IndexSnapshot:
+    def __init__(
+        self, version: int, vector_store: Any, metadata_index: MetadataIndex, embedding_model: Any
+    ):
+        """
+        One version of the index: a FAISS store and its metadata postings.
+
+        Snapshots are never rebuilt in place; a rebuild produces a new one
+        that VectorStoreManager swaps in. Readers pin a snapshot via
+        VectorStoreManager.acquire() so positions from a search always
+        resolve against the same version.
+
+        Args:
+            version (int): Monotonic version number.
+            vector_store (FAISS): The LangChain FAISS store.
+            metadata_index (MetadataIndex): Metadata postings keyed by position.
+            embedding_model (EmbeddingModel): Model the store was built with.
+        """
+        self.version = version
+        self.vector_store = vector_store
+        self.metadata_index = metadata_index
+        self.embedding_model = embedding_model
+        self.created_at = time.time()
+        self.readers = 0
+        self.retired = False
+
+    def __len__(self) -> int:
+        return len(self.vector_store.index_to_docstore_id)
+
+    def get_retriever(self, k: int = 4):
+        """Returns a LangChain retriever over this snapshot."""
+        return self.vector_store.as_retriever(search_kwargs={"k": k})
+
+    def search_by_vectors(
+        self, query_vectors, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """See VectorStoreManager.search_by_vectors."""
+        import faiss
+        vectors = np.array(query_vectors, dtype=np.float32, ndmin=2)
+        if self.vector_store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        if not filter:
+            return self.vector_store.index.search(vectors, k)
+
+        bits = self.metadata_index.match(filter)
+        if not bits:
+            return (np.full((len(vectors), k), np.inf, dtype=np.float32),
+                    np.full((len(vectors), k), -1, dtype=np.int64))
+        bitmap = self.metadata_index.to_bitmap(bits)
+        selector = faiss.IDSelectorBitmap(self.metadata_index.size, faiss.swig_ptr(bitmap))
+        params = faiss.SearchParameters(sel=selector)
+        return self.vector_store.index.search(vectors, k, params=params)
+
+    def get_documents(self, positions: Sequence[int]) -> List[Document]:
+        """See VectorStoreManager.get_documents."""
+        mapping = self.vector_store.index_to_docstore_id
+        return [
+            self.vector_store.docstore.search(mapping[int(p)])
+            for p in positions if p != -1
+        ]
+
+    def get_vectors(self, positions: Sequence[int]) -> np.ndarray:
+        """See VectorStoreManager.get_vectors."""
+        ids = np.asarray([p for p in positions if p != -1], dtype=np.int64)
+        if len(ids) == 0:
+            return np.zeros((0, self.vector_store.index.d), dtype=np.float32)
+        return self.vector_store.index.reconstruct_batch(ids)
 
 class VectorStoreManager:
-    def __init__(self, embedding_model: EmbeddingModel):
+    def __init__(
+        self, embedding_model: EmbeddingModel,
+        docstore_factory: Optional[Callable[[Any], Any]] = None,
+    ):
         """
         Initialize the VectorStoreManager.
         
+        The live index is an IndexSnapshot behind an atomically swapped
+        reference. Rebuilds (rebuild_async) build the next snapshot in the
+        background and swap it in; the previous snapshot stays alive until
+        the readers pinned to it finish.
+        
         Args:
             embedding_model (EmbeddingModel): The embedding model wrapper.
+            docstore_factory (Callable, optional): Converts each new snapshot's
+                FAISS docstore, e.g. a TieredStorage that keeps only hot
+                chunks in memory.
         """
         self.embedding_model = embedding_model
-        self.vector_store = None
+        self.docstore_factory = docstore_factory
+        self._current: Optional[IndexSnapshot] = None
+        self._retired: List[IndexSnapshot] = []
+        self._version = 0
+        self._swap_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._rebuild_executor: Optional[ThreadPoolExecutor] = None
 
-    def create_index(self, documents: List[Document]):
+    @property
+    def vector_store(self):
+        """The live snapshot's FAISS store (None before the first index)."""
+        current = self._current
+        return current.vector_store if current is not None else None
+
+    @vector_store.setter
+    def vector_store(self, vector_store):
+        if vector_store is None:
+            self.publish(None)
+            return
+        mapping = getattr(vector_store, "index_to_docstore_id", {})
+        documents = [vector_store.docstore.search(mapping[i]) for i in sorted(mapping)]
+        self.publish(self._snapshot(vector_store, build_metadata_index(documents)))
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        """The live snapshot's metadata postings."""
+        current = self._current
+        return current.metadata_index if current is not None else MetadataIndex()
+
+    @property
+    def version(self) -> int:
+        """Version of the live snapshot (0 before the first index)."""
+        current = self._current
+        return current.version if current is not None else 0
+
+    def _snapshot(
+        self, vector_store, metadata_index: MetadataIndex, version: Optional[int] = None
+    ) -> IndexSnapshot:
+        if self.docstore_factory is not None and hasattr(vector_store, "docstore"):
+            vector_store.docstore = self.docstore_factory(vector_store.docstore)
+        with self._swap_lock:
+            self._version = max(self._version + 1, version or 0)
+            return IndexSnapshot(self._version, vector_store, metadata_index, self.embedding_model)
+
+    def build_snapshot(self, documents: List[Document]) -> IndexSnapshot:
         """
-        Create a new FAISS index from documents.
+        Build (but do not publish) a new index version from documents.
         
         Args:
             documents (List[Document]): The documents to index.
+            
+        Returns:
+            IndexSnapshot: The new snapshot, warmed with a probe search.
         """
-        self.vector_store = FAISS.from_documents(
+        vector_store = FAISS.from_documents(
             documents, self.embedding_model.embeddings
         )
+        snapshot = self._snapshot(vector_store, build_metadata_index(documents))
+        index = getattr(vector_store, "index", None)
+        if getattr(index, "ntotal", 0):
+            # Touch the index once so the first live query does not pay for it
+            index.search(np.zeros((1, index.d), dtype=np.float32), 1)
+        return snapshot
+
+    def publish(self, snapshot: Optional[IndexSnapshot]):
+        """
+        Atomically make snapshot the live index.
+        
+        New requests see the new version immediately; the previous version
+        is retired and released once its last reader finishes.
+        
+        Args:
+            snapshot (IndexSnapshot): The version to serve.
+        """
+        with self._swap_lock:
+            previous, self._current = self._current, snapshot
+            if previous is not None:
+                previous.retired = True
+                if previous.readers:
+                    self._retired.append(previous)
+        if snapshot is not None:
+            logger.info("Index version %d is live (%d chunks)", snapshot.version, len(snapshot))
+
+    @contextmanager
+    def acquire(self) -> Iterator[IndexSnapshot]:
+        """
+        Pin the live snapshot for the duration of a request.
+        
+        Yields:
+            IndexSnapshot: A version that stays valid until the block exits,
+            even if a newer version is published meanwhile.
+            
+        Raises:
+            ValueError: If no index has been built yet.
+        """
+        with self._swap_lock:
+            snapshot = self._current
+            if snapshot is None:
+                raise ValueError("Vector store not initialized.")
+            snapshot.readers += 1
+        try:
+            yield snapshot
+        finally:
+            with self._swap_lock:
+                snapshot.readers -= 1
+                if snapshot.retired and snapshot.readers == 0 and snapshot in self._retired:
+                    self._retired.remove(snapshot)
+                    logger.info("Index version %d drained and released", snapshot.version)
+
+    def _require_current(self) -> IndexSnapshot:
+        current = self._current
+        if current is None:
+            raise ValueError("Vector store not initialized.")
+        return current
+
+    def create_index(self, documents: List[Document]):
+        """
+        Create a new FAISS index from documents and make it live.
+        
+        Args:
+            documents (List[Document]): The documents to index.
+        """
+        with self._write_lock:
+            self.publish(self.build_snapshot(documents))
+
+    def rebuild_async(self, load_documents: Callable[[], List[Document]]) -> Future:
+        """
+        Rebuild the index in the background and hot-swap it in when ready.
+        
+        Queries keep being served from the current version while documents
+        are loaded and embedded. Rebuilds run one at a time. If the index
+        changes while the rebuild runs (add_documents, replace_sources), the
+        rebuild is not published, since it would silently drop those changes.
+        
+        Args:
+            load_documents (Callable[[], List[Document]]): Produces the full
+                document set for the new version.
+                
+        Returns:
+            Future: Resolves to the new version number, or fails with
+            RuntimeError if the index changed during the rebuild.
+        """
+        if self._rebuild_executor is None:
+            self._rebuild_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="index-rebuild"
+            )
+
+        def rebuild() -> int:
+            started = time.perf_counter()
+            base_version = self.version
+            documents = load_documents()
+            snapshot = self.build_snapshot(documents)
+            with self._write_lock:
+                if self.version != base_version:
+                    logger.warning(
+                        "Index moved from version %d to %d during the rebuild; not publishing",
+                        base_version, self.version,
+                    )
+                    raise RuntimeError(
+                        f"Index changed during the rebuild (version {base_version} -> "
+                        f"{self.version}); retry the rebuild"
+                    )
+                self.publish(snapshot)
+            logger.info("Rebuilt index version %d in %.1fs",
+                        snapshot.version, time.perf_counter() - started)
+            return snapshot.version
+
+        return self._rebuild_executor.submit(rebuild)
 
     def add_documents(self, documents: List[Document]):
         """
         Add documents to the existing index.
         
+        The next version is built copy-on-write (see _append) and published,
+        so readers pinned to the current version are never searched while
+        it is being written.
+        
         Args:
             documents (List[Document]): The documents to add.
         """
-        if self.vector_store is None:
+        if self._current is None:
             raise ValueError("Vector store not initialized. Call create_index first.")
-        self.vector_store.add_documents(documents)
+        with self._write_lock:
+            self.publish(self._append(self._require_current(), documents))
+
+    def _append(self, current: IndexSnapshot, documents: List[Document]) -> IndexSnapshot:
+        """
+        Next version: current plus documents, without touching current.
+
+        The FAISS index, id mapping and metadata postings are copied before
+        the new vectors are added. The docstore is shared: new chunks get
+        fresh ids, so what the older version resolves never changes.
+        """
+        import faiss
+        previous = current.vector_store
+        vector_store = FAISS(
+            embedding_function=previous.embedding_function,
+            index=faiss.clone_index(previous.index),
+            docstore=previous.docstore,
+            index_to_docstore_id=dict(previous.index_to_docstore_id),
+            relevance_score_fn=previous.override_relevance_score_fn,
+            normalize_L2=previous._normalize_L2,
+            distance_strategy=previous.distance_strategy,
+        )
+        start = len(vector_store.index_to_docstore_id)
+        vector_store.add_documents(documents)
+        metadata_index = current.metadata_index.copy()
+        metadata_index.add_batch(start, [doc.metadata for doc in documents])
+        return self._snapshot(vector_store, metadata_index)
+
+    def replace_sources(self, sources: Sequence[str], documents: List[Document]) -> Dict[str, int]:
+        """
+        Swap out every chunk of the given sources for new chunks.
+
+        Pure additions are appended copy-on-write (see _append). Otherwise the
+        next version is assembled copy-on-write from the kept chunks' stored vectors plus
+        embeddings for the new chunks only, then published, so updating or
+        deleting a file never re-embeds the rest of the corpus and readers
+        pinned to the old version are unaffected.
+
+        Args:
+            sources (Sequence[str]): 'source' values whose chunks are dropped
+                (changed or deleted files).
+            documents (List[Document]): New chunks to index.
+
+        Returns:
+            Dict[str, int]: 'removed' and 'added' chunk counts and the live 'version'.
+        """
+        with self._write_lock:
+            current = self._current
+            if current is None:
+                if documents:
+                    self.publish(self.build_snapshot(documents))
+                return {"removed": 0, "added": len(documents), "version": self.version}
+
+            stale = current.metadata_index.match({"source": list(sources)}) if sources else 0
+            if not stale:
+                if documents:
+                    self.publish(self._append(current, documents))
+                return {"removed": 0, "added": len(documents), "version": self.version}
+
+            stale_positions = current.metadata_index.positions(stale)
+            keep = np.setdiff1d(np.arange(len(current), dtype=np.int64), stale_positions)
+            kept_docs = current.get_documents(keep)
+            vectors = [current.get_vectors(keep)]
+            if documents:
+                vectors.append(np.asarray(
+                    self.embedding_model.embed_documents([d.page_content for d in documents]),
+                    dtype=np.float32,
+                ))
+            all_docs = kept_docs + list(documents)
+            if not all_docs:
+                self.publish(None)
+                return {"removed": len(stale_positions), "added": 0, "version": 0}
+
+            vector_store = FAISS.from_embeddings(
+                list(zip([d.page_content for d in all_docs], np.concatenate(vectors))),
+                self.embedding_model.embeddings,
+                metadatas=[d.metadata for d in all_docs],
+            )
+            snapshot = self._snapshot(vector_store, build_metadata_index(all_docs))
+            self.publish(snapshot)
+            return {
+                "removed": len(stale_positions), "added": len(documents),
+                "version": snapshot.version,
+            }
+
+    def snapshots(self) -> List[Dict[str, Any]]:
+        """Live and draining versions with their reader counts."""
+        with self._swap_lock:
+            live = [self._current] if self._current is not None else []
+            return [
+                {"version": s.version, "live": not s.retired, "readers": s.readers,
+                 "chunks": len(s), "created_at": s.created_at}
+                for s in live + self._retired
+            ]
+
+    def save_snapshot(self, root: str) -> str:
+        """
+        Persist the live version under root/v<version> and point root/CURRENT at it.
+        
+        Args:
+            root (str): Snapshot directory.
+            
+        Returns:
+            str: The version's directory.
+        """
+        with self.acquire() as snapshot:
+            path = os.path.join(root, f"v{snapshot.version:06d}")
+            snapshot.vector_store.save_local(path)
+            version = snapshot.version
+        # Write-then-rename so readers of CURRENT never see a partial file
+        pointer = os.path.join(root, CURRENT_SNAPSHOT_FILE)
+        with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+            f.write(f"v{version:06d}")
+        os.replace(pointer + ".tmp", pointer)
+        return path
+
+    def load_snapshot(self, root: str, version: Optional[int] = None) -> int:
+        """
+        Load a persisted version (CURRENT by default) and make it live.
+        
+        Args:
+            root (str): Snapshot directory.
+            version (int, optional): Version to load instead of CURRENT.
+            
+        Returns:
+            int: The live version number (never lower than any earlier version).
+        """
+        if version is None:
+            with open(os.path.join(root, CURRENT_SNAPSHOT_FILE), encoding="utf-8") as f:
+                name = f.read().strip()
+        else:
+            name = f"v{version:06d}"
+        # Only load snapshots this application wrote itself (pickled docstore)
+        vector_store = FAISS.load_local(
+            os.path.join(root, name), self.embedding_model.embeddings,
+            allow_dangerous_deserialization=True,
+        )
+        mapping = vector_store.index_to_docstore_id
+        documents = [vector_store.docstore.search(mapping[i]) for i in range(len(mapping))]
+        snapshot = self._snapshot(
+            vector_store, build_metadata_index(documents), version=int(name[1:])
+        )
+        with self._write_lock:
+            self.publish(snapshot)
+        return snapshot.version
     
     def get_retriever(self, k: int = 4):
         """Returns a retriever from the vector store."""
-        if self.vector_store is None:
-             raise ValueError("Vector store not initialized.")
-        return self.vector_store.as_retriever(search_kwargs={"k": k})
+        return self._require_current().get_retriever(k)
+
+    def search_by_vectors(
+        self, query_vectors, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run a raw FAISS search for one or more query vectors.
+        
+        Args:
+            query_vectors: A single vector or a (n, dim) matrix of query vectors.
+            k (int): Number of neighbours per query.
+            filter (dict, optional): Metadata filter (see MetadataIndex.match),
+                applied inside the FAISS search as an ID selector so all k
+                slots go to matching chunks.
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (distances, positions), each of shape
+            (n, k). Missing neighbours have position -1.
+        """
+        return self._require_current().search_by_vectors(query_vectors, k, filter=filter)
+
+    def get_documents(self, positions: Sequence[int]) -> List[Document]:
+        """
+        Look up the documents stored at FAISS index positions.
+        
+        Args:
+            positions (Sequence[int]): Index positions; -1 entries are skipped.
+            
+        Returns:
+            List[Document]: Documents in the same order as positions.
+        """
+        return self._require_current().get_documents(positions)
+
+    def get_vectors(self, positions: Sequence[int]) -> np.ndarray:
+        """Reconstruct the stored embedding vectors at the given index positions."""
+        return self._require_current().get_vectors(positions)
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+def load_eval_queries(path: str) -> List[str]:
+    """Questions from an eval_set.json-style file ([{"question": ...}, ...])."""
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    return [case["question"] for case in cases if case.get("question")]
+
+def load_query_log(path: str, top_n: int = 200) -> List[str]:
+    """
+    The most frequent queries in a query log.
+
+    Args:
+        path (str): JSON-lines file of {"query": ...} records (as written by
+            QueryLog) or plain text with one query per line.
+        top_n (int): How many distinct queries to return.
+
+    Returns:
+        List[str]: Queries, most frequent first.
+    """
+    counts: Counter = Counter()
+    originals: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                query = json.loads(line).get("query", "")
+            except (ValueError, AttributeError):
+                query = line
+            key = normalize_query(query)
+            if key:
+                counts[key] += 1
+                originals.setdefault(key, query)
+    return [originals[key] for key, _ in counts.most_common(top_n)]
+
+class QueryLog:
+    def __init__(self, path: str):
+        """
+        Append-only JSON-lines log of served queries, for warming later processes.
+
+        Args:
+            path (str): Log file; created on first write.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, query: str):
+        line = json.dumps({"query": query, "ts": round(time.time(), 3)})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+class WarmupRunner:
+    def __init__(
+        self,
+        retriever: Any,
+        queries: Sequence[str],
+        k: int = 8,
+        batch_size: int = 32,
+        search_type: str = "similarity",
+    ):
+        """
+        Initialize the background warm-up.
+
+        Warming runs in three steps: one embedding call to load and JIT the
+        model, batched embedding of every query (filling the query embedding
+        cache), then a retrieve() per query (filling the retrieval cache and
+        paging in the index). is_hot is set when it finishes.
+
+        Args:
+            retriever (Retriever): Retriever to warm; its manager's embedding
+                model should have a query_cache and the retriever a cache.
+            queries (Sequence[str]): Queries to replay, most important first.
+            k (int): k used for the replayed retrievals (match production).
+            batch_size (int): Queries embedded per model call.
+            search_type (str): Search type used for the replayed retrievals.
+        """
+        self.retriever = retriever
+        seen, self.queries = set(), []
+        for query in queries:
+            key = normalize_query(query)
+            if key and key not in seen:
+                seen.add(key)
+                self.queries.append(query)
+        self.k = k
+        self.batch_size = batch_size
+        self.search_type = search_type
+        self.is_hot = threading.Event()
+        self.state = "cold"
+        self.error: Optional[str] = None
+        self.embedded = 0
+        self.retrieved = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> "WarmupRunner":
+        """Warm up in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Abandon the remaining warm-up work."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until hot; returns False on timeout."""
+        return self.is_hot.wait(timeout)
+
+    def run(self):
+        """Warm up in the calling thread."""
+        self.state = "warming"
+        self.started_at = time.monotonic()
+        embedding_model = self.retriever.vector_store_manager.embedding_model
+        try:
+            embedding_model.embed_query("warm-up")
+            for start in range(0, len(self.queries), self.batch_size):
+                if self._stop.is_set():
+                    return
+                batch = self.queries[start:start + self.batch_size]
+                embedding_model.embed_queries(batch)
+                self.embedded += len(batch)
+            for query in self.queries:
+                if self._stop.is_set():
+                    return
+                self.retriever.retrieve(query, k=self.k, search_type=self.search_type)
+                self.retrieved += 1
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.exception("Warm-up failed; serving cold")
+            return
+        finally:
+            self.finished_at = time.monotonic()
+        self.state = "hot"
+        self.is_hot.set()
+        logger.info("Warm-up finished: %d queries in %.2fs",
+                    len(self.queries), self.finished_at - self.started_at)
+
+    def status(self) -> Dict[str, Any]:
+        """State ('cold', 'warming', 'hot' or 'failed'), progress and elapsed seconds."""
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            "state": self.state,
+            "hot": self.is_hot.is_set(),
+            "queries": len(self.queries),
+            "embedded": self.embedded,
+            "retrieved": self.retrieved,
+            "elapsed_s": round(end - self.started_at, 3) if self.started_at is not None else 0.0,
+            "error": self.error,
+        }
+
+def default_warmup_queries(
+    data_dir: str, query_log: Optional[str] = None, top_n: int = 200
+) -> List[str]:
+    """Frequent logged queries first, then the eval set's questions."""
+    queries: List[str] = []
+    if query_log and os.path.exists(query_log):
+        queries.extend(load_query_log(query_log, top_n=top_n))
+    eval_file = os.path.join(data_dir, "eval_set.json")
+    if os.path.exists(eval_file):
+        queries.extend(load_eval_queries(eval_file))
+    return queries[:top_n]
@@ -0,0 +1,413 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from src.dedup import NearDuplicateFilter
+from src.ingestion import DocumentChunker, DocumentLoader, MetadataTagger
+
+logger = logging.getLogger(__name__)
+
+# Everything DocumentLoader can parse, plus the corpus' "name,md" files
+DEFAULT_EXTENSIONS = tuple("." + ext for ext in DocumentLoader.PARSERS) + (",md",)
+
+class FileChange(NamedTuple):
+    path: str
+    kind: str  # 'added', 'modified' or 'deleted'
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def build_file_chunks(path: str) -> List[Document]:
+    """
+    Default per-file pipeline: load, clean, split, de-duplicate and tag like
+    the batch ingestion.
+    """
+    chunker = DocumentChunker()
+    chunks = []
+    # Pages and sections are chunked as they stream in
+    for doc in DocumentLoader().iter_file(path):
+        chunks.extend(chunker.split_documents([doc]))
+    chunks, _ = NearDuplicateFilter().filter(chunks)
+    return MetadataTagger().tag(chunks)
+
+class DataDirWatcher:
+    def __init__(
+        self,
+        data_dir: str,
+        on_changes: Callable[[List[FileChange]], None],
+        poll_interval_s: float = 1.0,
+        debounce_s: float = 2.0,
+        extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    ):
+        """
+        Initialize the polling directory watcher.
+
+        Each poll stats the directory tree. A file whose mtime or size changed
+        is only reported once it has been quiet for debounce_s (so editors
+        and copies that write in bursts produce one event), and only if its
+        SHA-256 differs from the last ingested version (so touches are ignored).
+
+        Args:
+            data_dir (str): Directory to watch (recursively).
+            on_changes (Callable[[List[FileChange]], None]): Receives each batch
+                of settled changes. May block, which slows polling (backpressure).
+            poll_interval_s (float): Seconds between polls.
+            debounce_s (float): Quiet period before a change is reported.
+            extensions (Sequence[str]): File suffixes to watch.
+        """
+        self.data_dir = data_dir
+        self.on_changes = on_changes
+        self.poll_interval_s = poll_interval_s
+        self.debounce_s = debounce_s
+        self.extensions = tuple(extensions)
+        # path -> (mtime_ns, size, sha256) of the last reported version
+        self._known: Dict[str, Tuple[int, int, str]] = {}
+        # path -> ((mtime_ns, size) last seen, monotonic time it was first seen)
+        self._pending: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+        # Guards _known and _pending: mark_ingested runs on the worker thread
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """Stat every watched file: path -> (mtime_ns, size)."""
+        found = {}
+        for root, _, filenames in os.walk(self.data_dir):
+            for filename in filenames:
+                if filename.endswith(self.extensions):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found[path] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def prime(self):
+        """Record the current files as already ingested, so only later changes are reported."""
+        for path, stat in self.scan().items():
+            try:
+                digest = file_digest(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self._known[path] = stat + (digest,)
+
+    def mark_ingested(self, path: str):
+        """
+        Record a file's current version as ingested, so a poll does not
+        report it again (e.g. after it was submitted to the worker directly).
+        """
+        stat = os.stat(path)
+        digest = file_digest(path)
+        with self._lock:
+            self._known[path] = (stat.st_mtime_ns, stat.st_size, digest)
+            self._pending.pop(path, None)
+
+    def poll(self, now: Optional[float] = None) -> List[FileChange]:
+        """
+        Run one polling pass.
+
+        Args:
+            now (float, optional): Monotonic timestamp; defaults to time.monotonic().
+
+        Returns:
+            List[FileChange]: Changes that settled during this pass.
+        """
+        now = time.monotonic() if now is None else now
+        current = self.scan()
+        with self._lock:
+            return self._settle(current, now)
+
+    def _settle(self, current: Dict[str, Tuple[int, int]], now: float) -> List[FileChange]:
+        """Update the pending and known files from a scan (caller holds _lock)."""
+        for path in set(current) | set(self._known) | set(self._pending):
+            stat = current.get(path)
+            known = self._known.get(path)
+            if known is not None and stat == known[:2]:
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != stat:
+                # New or still changing: (re)start the quiet period
+                self._pending[path] = (stat, now)
+
+        changes = []
+        for path, (stat, since) in list(self._pending.items()):
+            if now - since < self.debounce_s:
+                continue
+            del self._pending[path]
+            known = self._known.get(path)
+            if stat is None:
+                if known is not None:
+                    del self._known[path]
+                    changes.append(FileChange(path, "deleted"))
+                continue
+            try:
+                digest = file_digest(path)
+            except FileNotFoundError:
+                continue
+            self._known[path] = stat + (digest,)
+            if known is None:
+                changes.append(FileChange(path, "added"))
+            elif known[2] != digest:
+                changes.append(FileChange(path, "modified"))
+        return changes
+
+    def start(self, prime: bool = True):
+        """
+        Start polling in a daemon thread.
+
+        Args:
+            prime (bool): Treat files present now as already ingested.
+        """
+        if self._thread is not None:
+            return
+        if prime:
+            self.prime()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-dir-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                changes = self.poll()
+                if changes:
+                    self.on_changes(changes)
+            except Exception:
+                logger.exception("Data directory poll failed")
+
+class IngestionWorker:
+    def __init__(
+        self,
+        vector_store_manager,
+        build_chunks: Callable[[str], List[Document]] = build_file_chunks,
+        max_queue: int = 256,
+        max_batch_files: int = 32,
+        max_tracked_files: int = 512,
+    ):
+        """
+        Initialize the background ingestion worker.
+
+        Changed files are queued on a bounded queue; submit() blocks when it
+        is full, so a flood of changes slows the watcher instead of growing
+        memory. The worker drains up to max_batch_files changes at a time,
+        rebuilds those files' chunks and swaps them into the live index with
+        VectorStoreManager.replace_sources (only changed files are embedded).
+
+        Args:
+            vector_store_manager (VectorStoreManager): The live index.
+            build_chunks (Callable[[str], List[Document]]): File path -> chunks.
+            max_queue (int): Queue capacity in file changes.
+            max_batch_files (int): Largest number of changes applied together.
+            max_tracked_files (int): Recent files whose state file_states() reports.
+        """
+        self.vector_store_manager = vector_store_manager
+        self.build_chunks = build_chunks
+        self.max_batch_files = max_batch_files
+        self._queue: "queue.Queue[FileChange]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "files": 0, "chunks_added": 0, "chunks_removed": 0,
+            "errors": 0, "batches": 0, "busy_s": 0.0,
+        }
+        self.max_tracked_files = max_tracked_files
+        # path -> {'state': queued | indexing | indexed | failed, 'chunks', 'error', 'updated'}
+        self._files: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+        self.last_error: Optional[str] = None
+        self.last_update: Optional[float] = None
+
+    def submit(self, changes: List[FileChange], timeout: Optional[float] = None):
+        """
+        Queue changes for ingestion, blocking while the queue is full.
+
+        Raises:
+            queue.Full: If timeout elapses before there is room.
+        """
+        for change in changes:
+            self._queue.put(change, timeout=timeout)
+            self._set_state(change.path, "queued")
+
+    def start(self):
+        """Start the worker thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Finish the current batch and stop."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Counters plus the current queue depth, the time of the last index
+        update and throughput over the time spent processing.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["last_update"] = self.last_update
+        busy = stats["busy_s"]
+        stats["files_per_s"] = stats["files"] / busy if busy else 0.0
+        stats["chunks_per_s"] = stats["chunks_added"] / busy if busy else 0.0
+        return stats
+
+    def file_states(self) -> Dict[str, Dict[str, object]]:
+        """Recently submitted files and their progress, oldest first."""
+        with self._stats_lock:
+            return {path: dict(state) for path, state in self._files.items()}
+
+    def _set_state(self, path: str, state: str, **extra):
+        with self._stats_lock:
+            entry = self._files.pop(path, {"chunks": 0, "error": None})
+            entry.update(state=state, updated=time.time(), **extra)
+            self._files[path] = entry
+            while len(self._files) > self.max_tracked_files:
+                self._files.popitem(last=False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.max_batch_files:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.process(batch)
+            except Exception:
+                logger.exception("Ingestion batch failed")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def process(self, changes: List[FileChange]) -> Dict[str, int]:
+        """
+        Apply a batch of file changes to the live index.
+
+        Only the newest change per file counts. A file that fails to load is
+        logged and skipped; its previous chunks stay indexed.
+
+        Returns:
+            Dict[str, int]: 'removed', 'added' and 'version' from replace_sources.
+        """
+        started = time.monotonic()
+        latest = {change.path: change for change in changes}
+        sources, chunks, errors = [], [], 0
+        chunk_counts: Dict[str, int] = {}
+        for path, change in latest.items():
+            if change.kind == "deleted":
+                sources.append(path)
+                continue
+            self._set_state(path, "indexing")
+            try:
+                file_chunks = self.build_chunks(path)
+            except Exception as e:
+                errors += 1
+                self.last_error = f"{path}: {e}"
+                self._set_state(path, "failed", error=str(e))
+                logger.warning("Could not ingest %s: %s", path, e)
+                continue
+            sources.append(path)
+            chunks.extend(file_chunks)
+            chunk_counts[path] = len(file_chunks)
+
+        result = {
+            "removed": 0, "added": 0,
+            "version": getattr(self.vector_store_manager, "version", 0),
+        }
+        if sources:
+            try:
+                result = self.vector_store_manager.replace_sources(sources, chunks)
+            except Exception as e:
+                for path in chunk_counts:
+                    self._set_state(path, "failed", error=str(e))
+                raise
+            self.last_update = time.time()
+            logger.info("Ingested %d changed file(s): +%d/-%d chunks (index version %d)",
+                        len(sources), result["added"], result["removed"], result["version"])
+        for path, count in chunk_counts.items():
+            self._set_state(path, "indexed", chunks=count)
+        with self._stats_lock:
+            self._stats["busy_s"] += time.monotonic() - started
+            self._stats["files"] += len(sources)
+            self._stats["chunks_added"] += result["added"]
+            self._stats["chunks_removed"] += result["removed"]
+            self._stats["errors"] += errors
+            self._stats["batches"] += 1
+        return result
+
+    def join(self):
+        """Block until every queued change has been processed."""
+        self._queue.join()
+
+def write_upload(data_dir: str, filename: str, data: bytes) -> str:
+    """
+    Save an uploaded file into data_dir (atomically) and return its path.
+
+    Only the base name is used, so uploads cannot escape data_dir; an
+    existing file of the same name is replaced.
+    """
+    name = os.path.basename(filename.replace("\\", "/"))
+    if not name or name.startswith("."):
+        raise ValueError(f"Invalid file name: {filename!r}")
+    if not DocumentLoader().supports(name):
+        raise ValueError(f"Unsupported file type: {name}")
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, name)
+    tmp = os.path.join(data_dir, f".{name}.upload")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+def start_ingestion_daemon(
+    vector_store_manager,
+    data_dir: str,
+    poll_interval_s: float = 1.0,
+    debounce_s: float = 2.0,
+    **worker_kwargs,
+) -> Tuple[DataDirWatcher, IngestionWorker]:
+    """
+    Watch data_dir and keep vector_store_manager in sync with it.
+
+    Files present at start are assumed to be indexed already.
+
+    Returns:
+        Tuple[DataDirWatcher, IngestionWorker]: The running watcher and worker.
+    """
+    worker = IngestionWorker(vector_store_manager, **worker_kwargs)
+    watcher = DataDirWatcher(data_dir, worker.submit,
+                             poll_interval_s=poll_interval_s, debounce_s=debounce_s)
+    worker.start()
+    watcher.start()
+    return watcher, worker
@@ -0,0 +1,52 @@
+import asyncio
+from src.batching import MicroBatcher
+
+def test_concurrent_submissions_share_a_batch():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(scenario())
+    
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert stats["batches"] == 1
+    assert stats["mean_batch_size"] == 5
+
+def test_batches_are_capped():
+    calls = []
+
+    def identity(items):
+        calls.append(len(items))
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher(identity, max_batch_size=3, max_wait_ms=20)
+        await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert calls == [3, 3, 1]
+
+def test_batch_errors_reach_every_caller():
+    def broken(items):
+        raise RuntimeError("index offline")
+
+    async def scenario():
+        batcher = MicroBatcher(broken, max_wait_ms=5)
+        outcomes = await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+        await batcher.stop()
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
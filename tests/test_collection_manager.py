@@ -0,0 +1,106 @@
+import threading
+import pytest
+from langchain_core.documents import Document
+from src.collection_manager import CollectionManager, UnknownCollection
+from tests.test_retrieval import FakeEmbeddingModel
+
+def docs(*texts, source="doc.md"):
+    return [Document(page_content=text, metadata={"source": source}) for text in texts]
+
+def test_collections_load_lazily_and_evict_lru(tmp_path):
+    events = []
+    writer = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    writer.create("team-a", docs("chunking", "faiss"))
+    writer.create("team-b", docs("groq", "prompt"))
+    size = writer.stats()["collections"]["team-a"]["memory_bytes"]
+    assert size > 0
+
+    # Room for one collection at a time
+    manager = CollectionManager(FakeEmbeddingModel(), str(tmp_path),
+                                memory_budget_mb=size * 1.5 / 2**20, on_event=events.append)
+    assert manager.names() == ["team-a", "team-b"]
+    assert manager.stats()["loaded"] == []
+
+    assert manager.retriever("team-a").retrieve("chunking", k=1)[0].page_content == "chunking"
+    assert manager.retriever("team-b").retrieve("groq", k=1)[0].page_content == "groq"
+    assert manager.stats()["loaded"] == ["team-b"]
+    assert [(e["event"], e["collection"]) for e in events] == [
+        ("load", "team-a"), ("load", "team-b"), ("evict", "team-a"),
+    ]
+
+    manager.retriever("team-b")
+    stats = manager.stats()["collections"]
+    assert stats["team-b"]["hits"] == 1 and stats["team-a"]["evictions"] == 1
+    assert manager.memory_bytes() <= manager.memory_budget_bytes
+
+def test_add_documents_persists_and_unknown_collections_raise(tmp_path):
+    manager = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    manager.add_documents("new", docs("chunking"))
+    manager.add_documents("new", docs("docling", source="other.md"))
+
+    reloaded = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    assert reloaded.retriever("new").retrieve("docling", k=1)[0].metadata["source"] == "other.md"
+
+    with pytest.raises(UnknownCollection):
+        reloaded.get("missing")
+    with pytest.raises(ValueError):
+        reloaded.get("../escape")
+    reloaded.drop("new")
+    assert reloaded.names() == []
+
+def test_concurrent_first_writes_create_one_collection(tmp_path):
+    manager = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    texts = ["chunking", "faiss", "prompt", "groq"]
+    threads = [
+        threading.Thread(target=manager.add_documents, args=("team-a", docs(text)))
+        for text in texts
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [e["event"] for e in manager.events()].count("create") == 1
+    reloaded = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    found = reloaded.retriever("team-a").retrieve("chunking faiss prompt groq", k=10)
+    assert sorted(d.page_content for d in found) == sorted(texts)
+
+    manager.drop("team-a")
+    with pytest.raises(UnknownCollection):
+        manager.get("team-a")
+
+
+def test_evict_closes_the_collection_retriever(tmp_path):
+    closed = []
+
+    class ClosingRetriever:
+        def __init__(self, manager):
+            self.manager = manager
+
+        def close(self):
+            closed.append(self.manager)
+
+    manager = CollectionManager(FakeEmbeddingModel(), str(tmp_path),
+                                retriever_factory=ClosingRetriever)
+    manager.create("team-a", docs("chunking"))
+    manager.create("team-b", docs("groq"))
+    manager.evict("team-a")
+    assert len(closed) == 1
+
+    manager.close()
+    assert len(closed) == 2 and manager.stats()["loaded"] == []
+
+def test_appends_keep_only_recent_snapshot_versions(tmp_path):
+    def versions(name):
+        return sorted(p.name for p in (tmp_path / name).iterdir() if p.name.startswith("v"))
+
+    manager = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    rollback = CollectionManager(FakeEmbeddingModel(), str(tmp_path), keep_snapshots=3)
+    for text in ["chunking", "faiss", "prompt", "groq", "docling"]:
+        manager.add_documents("team-a", docs(text))
+        rollback.add_documents("team-b", docs(text))
+
+    assert versions("team-a") == ["v000005"]
+    assert versions("team-b") == ["v000003", "v000004", "v000005"]
+    reloaded = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    assert len(reloaded.retriever("team-a").retrieve("chunking", k=10)) == 5
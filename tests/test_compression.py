@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+from src.compression import ContextCompressor, split_sentences
+from src.rag import RAGChain
+from src.tokens import TokenCounter
+from tests.test_retrieval import FakeEmbeddingModel
+from tests.test_tokens import WordEncoding
+
+def make_compressor(**kwargs):
+    return ContextCompressor(
+        FakeEmbeddingModel(), token_counter=TokenCounter(encoding=WordEncoding()), **kwargs
+    )
+
+DOCS = [
+    Document(id="a",
+             page_content="Groq serves the model. FAISS stores vectors.\n"
+                          "Prompt caching helps. The weather is nice.",
+             metadata={"source": "a.md", "page": 2}),
+    Document(id="b", page_content="Docling parses PDFs. Nothing else here.",
+             metadata={"source": "b.md"}),
+]
+
+def test_split_sentences_handles_lines_and_terminators():
+    assert split_sentences("# Title\nFirst one. Second?  Third!\n\n- item") == [
+        "# Title", "First one.", "Second?", "Third!", "- item",
+    ]
+
+def test_keeps_relevant_sentences_with_neighbours_and_attribution():
+    compressed = make_compressor(max_tokens=100).compress("faiss", DOCS)
+
+    assert len(compressed) == 1
+    doc = compressed[0]
+    assert doc.page_content == "Groq serves the model. FAISS stores vectors. Prompt caching helps."
+    assert doc.id == "a"
+    assert doc.metadata == {"source": "a.md", "page": 2, "sentences_kept": 3, "sentences_total": 4}
+
+def test_budget_drops_neighbours_and_marks_gaps():
+    tight = make_compressor(max_tokens=3).compress("faiss", DOCS)
+    assert [d.page_content for d in tight] == ["FAISS stores vectors."]
+
+    doc = Document(page_content="FAISS one. Filler two. FAISS three.", metadata={"source": "c.md"})
+    gapped = make_compressor(neighbors=0).compress("faiss", [doc])
+    assert gapped[0].page_content == "FAISS one. ... FAISS three."
+
+def test_rag_chain_prompts_with_compressed_context():
+    llm = MagicMock()
+    llm.invoke.return_value.content = "answer"
+    chain = RAGChain(retriever=MagicMock(), llm=llm, compressor=make_compressor(max_tokens=3))
+
+    result = chain.generate("faiss", DOCS)
+
+    prompt = llm.invoke.call_args[0][0].to_messages()[-1].content
+    assert "FAISS stores vectors." in prompt and "weather" not in prompt
+    assert [d.metadata["source"] for d in result["source_documents"]] == ["a.md"]
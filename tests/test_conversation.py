@@ -0,0 +1,84 @@
+import time
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+from src.conversation import ConversationMemory, ConversationStore, rewrite_query
+from src.llm_providers import StubChatModel
+from src.rag import RAGChain
+
+def word_count(text):
+    return len(text.split())
+
+def test_memory_stays_within_budget():
+    memory = ConversationMemory(max_history_tokens=20, max_summary_tokens=12,
+                                length_function=word_count)
+    for i in range(10):
+        memory.add_turn("user", f"Question number {i} about chunking. More detail here.")
+        memory.add_turn("assistant", f"Answer number {i}.")
+    
+    assert sum(word_count(c) for _, c in memory.history()) <= 20
+    assert word_count(memory.summary) <= 12
+    # The summary keeps the most recent evicted turns
+    assert "Answer number" in memory.summary or "Question number" in memory.summary
+    assert memory.history()[-1] == ("assistant", "Answer number 9.")
+
+def test_oversized_turn_is_truncated_to_budget():
+    memory = ConversationMemory(max_history_tokens=20, length_function=word_count)
+    memory.add_turn("user", "What is chunking?")
+    document = " ".join(f"word{i}" for i in range(500))
+    memory.add_turn("user", f"Summarize this: {document}")
+
+    history = memory.history()
+    assert sum(word_count(c) for _, c in history) <= 20
+    assert history[-1][1].startswith("Summarize this: word0 word1")
+    assert history[-1][1].endswith(" ...")
+    assert "What is chunking?" in memory.summary
+
+def test_custom_summarizer():
+    memory = ConversationMemory(max_history_tokens=3, length_function=word_count,
+                                summarizer=lambda summary, turns: f"{len(turns)} turns folded")
+    memory.add_turn("user", "one two three")
+    memory.add_turn("assistant", "four five")
+    assert memory.summary == "1 turns folded"
+
+def test_store_evicts_lru_and_expired_sessions():
+    store = ConversationStore(max_sessions=2, ttl_s=0.05)
+    a = store.get("a")
+    store.get("b")
+    assert store.get("a") is a
+    store.get("c")  # evicts b, the least recently used
+    assert len(store) == 2
+    assert store.evictions == 1
+    
+    time.sleep(0.06)
+    store.get("d")
+    assert len(store) == 1
+
+def test_rewrite_follow_up_query():
+    memory = ConversationMemory(length_function=word_count)
+    assert rewrite_query("What is semantic chunking?", memory) == "What is semantic chunking?"
+    
+    memory.add_turn("user", "What is semantic chunking?")
+    memory.add_turn("assistant", "It splits text by meaning.")
+    assert rewrite_query("How do I tune it?", memory) == "How do I tune it? (semantic chunking)"
+    
+    standalone = "Which embedding model does the system use for vectors?"
+    assert rewrite_query(standalone, memory) == standalone
+    rewritten = rewrite_query("and cost?", memory, rewriter=lambda h, q: "chunking cost")
+    assert rewritten == "chunking cost"
+
+def test_rag_chain_session_uses_history():
+    retriever = MagicMock()
+    retriever.retrieve.return_value = [Document(page_content="context info")]
+    llm = StubChatModel(first_token_latency_s=0, token_latency_s=0)
+    store = ConversationStore(length_function=word_count)
+    chain = RAGChain(retriever=retriever, llm=llm, conversations=store)
+    
+    chain.answer("What is semantic chunking?", session_id="s1")
+    result = chain.answer("How do I tune it?", session_id="s1")
+    
+    retriever.retrieve.assert_called_with("How do I tune it? (semantic chunking)")
+    assert result["retrieval_query"] == "How do I tune it? (semantic chunking)"
+    prompt_messages = result["generated_prompt"].to_messages()
+    assert [m.type for m in prompt_messages] == ["system", "human", "ai", "human"]
+    assert prompt_messages[-1].content.endswith("Question: How do I tune it?")
+    assert len(store.get("s1").history()) == 4
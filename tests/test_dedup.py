@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+from src.dedup import NearDuplicateFilter
+
+BASE = ("Retrieval augmented generation grounds answers in retrieved chunks so the model "
+        "cites the enterprise documents instead of relying on its internal knowledge ")
+
+def test_near_duplicates_are_dropped():
+    docs = [
+        Document(page_content=BASE * 3, metadata={"source": "a.md"}),
+        Document(page_content="Chunking strategies split documents along semantic boundaries.",
+                 metadata={"source": "b.md"}),
+        Document(page_content=BASE * 3 + "today.", metadata={"source": "c.md"}),
+    ]
+    kept, report = NearDuplicateFilter(threshold=0.8).filter(docs)
+    
+    assert [d.metadata["source"] for d in kept] == ["a.md", "b.md"]
+    assert report["input"] == 3
+    assert report["removed"] == 1
+    assert report["clusters"][0]["removed_sources"] == ["c.md"]
+
+def test_cluster_mode_records_duplicates():
+    docs = [
+        Document(page_content=BASE * 2, metadata={"source": "a.md"}),
+        Document(page_content=BASE * 2, metadata={"source": "b.md"}),
+    ]
+    kept, _ = NearDuplicateFilter(mode="cluster").filter(docs)
+    
+    assert len(kept) == 1
+    assert kept[0].metadata["duplicate_count"] == 1
+    assert kept[0].metadata["duplicate_sources"] == ["b.md"]
+
+def test_distinct_documents_are_kept():
+    docs = [
+        Document(page_content=f"Document {i} talks about topic {i * 7} in depth.")
+        for i in range(20)
+    ]
+    kept, report = NearDuplicateFilter().filter(docs)
+    assert len(kept) == 20
+    assert report["clusters"] == []
+
+def test_invalid_banding():
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(num_perm=100, bands=32)
+
+def test_empty_chunks_are_not_clustered():
+    docs = [Document(page_content=text, metadata={"source": f"{i}.md"})
+            for i, text in enumerate(["", "   \n", "---", BASE])]
+    kept, report = NearDuplicateFilter().filter(docs)
+    assert len(kept) == 4 and report["removed"] == 0
+
+def test_signatures_match_exact_integer_arithmetic():
+    dedup = NearDuplicateFilter(num_perm=8, bands=4)
+    hashes = dedup._shingle_hashes(BASE)
+    expected = [
+        min((int(a) * int(x) + int(b)) % 4294967311 & 0xFFFFFFFF for x in hashes)
+        for a, b in zip(dedup._a, dedup._b)
+    ]
+    assert dedup.signatures([BASE])[0].tolist() == expected
@@ -60,3 +60,264 @@ def test_text_splitter_documents():
     
     assert len(split_docs) > 1
     assert split_docs[0].metadata["source"] == "test"
+
+from src.ingestion import MarkdownSplitter
+
+def _word_count(text):
+    return len(text.split())
+
+def test_markdown_splitter_heading_metadata():
+    text = "# Guide\n\nIntro text.\n\n## Setup\n\nInstall it.\n\n## Usage\n\nRun it."
+    splitter = MarkdownSplitter(chunk_size=50, length_function=_word_count)
+    from langchain_core.documents import Document
+    chunks = splitter.split_documents(
+        [Document(page_content=text, metadata={"source": "guide.md"})]
+    )
+    
+    assert [c.metadata["heading_path"] for c in chunks] == [
+        "Guide", "Guide > Setup", "Guide > Usage",
+    ]
+    assert chunks[1].metadata["section"] == "Setup"
+    assert chunks[1].metadata["source"] == "guide.md"
+    # Sections are never merged even though they would fit in one chunk
+    assert "Install it." in chunks[1].page_content
+    assert "Run it." not in chunks[1].page_content
+
+def test_markdown_splitter_keeps_code_and_tables_whole():
+    text = (
+        "# Code\n\n```python\n# not a heading\nx = 1\n\ny = 2\n```\n\n"
+        "| a | b |\n|---|---|\n| 1 | 2 |\n"
+    )
+    splitter = MarkdownSplitter(chunk_size=100, length_function=_word_count, include_headings=False)
+    blocks = splitter.parse_blocks(text)
+    
+    assert [b[0] for b in blocks] == ["code", "table"]
+    assert "# not a heading" in blocks[0][1]
+    assert "y = 2" in blocks[0][1]
+    assert blocks[1][1].count("\n") == 2
+
+def test_markdown_splitter_respects_token_budget():
+    text = "# Long\n\n" + " ".join(f"Sentence number {i}." for i in range(60))
+    splitter = MarkdownSplitter(chunk_size=20, length_function=_word_count)
+    chunks = splitter.split_text(text)
+    
+    assert len(chunks) > 1
+    assert all(_word_count(c) <= 20 for c, _ in chunks)
+    assert all(path == ("Long",) for _, path in chunks)
+
+def test_markdown_splitter_cuts_lines_longer_than_budget():
+    text = "# Code\n\n```\n" + " ".join(f"word{i}" for i in range(50)) + "\n```"
+    splitter = MarkdownSplitter(chunk_size=20, length_function=_word_count)
+    chunks = [c for c, _ in splitter.split_text(text)]
+
+    assert len(chunks) > 1
+    assert all(_word_count(c) <= 20 for c in chunks)
+    assert all(c.startswith("Code\n\n```") and c.endswith("```") for c in chunks)
+
+    # A single word longer than the budget is cut by characters
+    splitter = MarkdownSplitter(chunk_size=10, length_function=len, include_headings=False)
+    pieces = [c for c, _ in splitter.split_text("x" * 45)]
+    assert "".join(pieces) == "x" * 45
+    assert all(len(p) <= 10 for p in pieces)
+
+def test_document_chunker_routes_markdown_by_source():
+    from langchain_core.documents import Document
+    from src.ingestion import DocumentChunker
+
+    chunker = DocumentChunker(
+        splitter=TextSplitter(chunk_size=100, chunk_overlap=0),
+        markdown_splitter=MarkdownSplitter(chunk_size=50, length_function=_word_count),
+    )
+    chunks = chunker.split_documents([
+        Document(page_content="# Guide\n\nIntro.\n\n## Setup\n\nInstall it.",
+                 metadata={"source": "guide.md"}),
+        Document(page_content="# Chunking\n\nBody.",
+                 metadata={"source": "The Science of Chunking,md"}),
+        Document(page_content="Plain   text.\n\n\nMore.", metadata={"source": "notes.txt"}),
+    ])
+
+    assert [c.metadata.get("heading_path") for c in chunks] == [
+        "Guide", "Guide > Setup", "Chunking", None,
+    ]
+    assert chunks[-1].page_content == "Plain text.\nMore."
+
+def test_document_chunker_leaves_input_documents_unchanged():
+    from langchain_core.documents import Document
+    from src.ingestion import DocumentChunker
+
+    doc = Document(page_content="Plain   text.\n\n\nMore.", metadata={"source": "notes.txt"})
+    chunker = DocumentChunker(splitter=TextSplitter(chunk_size=100, chunk_overlap=0))
+    chunks = chunker.split_documents([doc])
+
+    assert doc.page_content == "Plain   text.\n\n\nMore."
+    assert doc.metadata == {"source": "notes.txt"}
+    assert chunks[0].page_content == "Plain text.\nMore."
+
+def test_document_chunker_defaults_to_token_mode():
+    from langchain_core.documents import Document
+    from unittest.mock import patch
+    from src.ingestion import DocumentChunker, PIPELINE_CHUNK_TOKENS
+
+    counter = TokenCounter(encoding=WordEncoding())
+    with patch("src.ingestion.get_token_counter", return_value=counter):
+        chunker = DocumentChunker()
+    text = " ".join(f"w{i}" for i in range(300))
+    chunks = chunker.split_documents([
+        Document(page_content=text, metadata={"source": "a.txt"}),
+        Document(page_content=text, metadata={"source": "a.md"}),
+    ])
+
+    assert chunker.splitter.length_unit == "tokens"
+    assert all(counter.count(c.page_content) <= PIPELINE_CHUNK_TOKENS for c in chunks)
+    assert {c.metadata["source"] for c in chunks} == {"a.txt", "a.md"}
+
+from tests.test_tokens import WordEncoding
+from src.tokens import TokenCounter
+
+def test_text_splitter_token_mode():
+    encoding = WordEncoding()
+    splitter = TextSplitter(chunk_size=10, chunk_overlap=2, length_unit="tokens",
+                            token_counter=TokenCounter(encoding=encoding))
+    from langchain_core.documents import Document
+    text = "\n\n".join(" ".join(f"w{p}_{i}" for i in range(7)) for p in range(5))
+    chunks = splitter.split_documents([Document(page_content=text, metadata={"source": "t"})])
+    
+    assert len(chunks) > 1
+    assert all(c.metadata["token_count"] <= 10 for c in chunks)
+    assert all(len(c.page_content.split()) <= 10 for c in chunks)
+    # Boundaries snap to paragraph breaks rather than mid-paragraph
+    assert chunks[0].page_content.endswith("w0_6")
+    # The document was encoded once, not once per candidate split
+    assert encoding.encode_calls == 1
+    
+    stats = splitter.token_distribution(chunks)
+    assert stats["count"] == len(chunks)
+    assert stats["max"] <= 10
+
+def test_text_splitter_rejects_unknown_unit():
+    with pytest.raises(ValueError):
+        TextSplitter(length_unit="words")
+
+from src.ingestion import MetadataTagger
+
+def test_metadata_tagger():
+    from langchain_core.documents import Document
+    docs = [Document(page_content="x", metadata={"source": "/data/The Science of Chunking,md"}),
+            Document(page_content="y",
+                     metadata={"source": "notes.txt", "section": "Intro", "tags": ["old"]})]
+    MetadataTagger(tags=["team-a"]).tag(docs, ingested_at="2025-05-01T10:00:00+00:00")
+    
+    assert docs[0].metadata["doc_type"] == "md"
+    assert docs[0].metadata["ingested_date"] == "2025-05-01"
+    assert docs[0].metadata["tags"] == ["team-a"]
+    assert docs[1].metadata["section"] == "Intro"
+    assert docs[1].metadata["tags"] == ["old", "team-a"]
+
+from src.ingestion import file_extension
+
+def write_pdf(path, pages):
+    """Minimal text PDF: one Helvetica text line per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>", None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    trailer = f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    out += trailer.encode("latin-1")
+    path.write_bytes(out)
+
+def test_file_extension_handles_comma_names():
+    assert file_extension("data/The Science of Chunking,md") == "md"
+    assert file_extension("report.PDF") == "pdf"
+    assert not DocumentLoader().supports("notes.xyz")
+    assert DocumentLoader().supports("guide.markdown")
+
+def test_pdf_streams_one_document_per_page(tmp_path):
+    pytest.importorskip("pypdf")
+    path = tmp_path / "report.pdf"
+    write_pdf(path, ["First page text", "Second page text"])
+
+    pages = DocumentLoader().iter_file(str(path))
+    first = next(pages)
+    assert "First page" in first.page_content
+    assert first.metadata == {"source": str(path), "page": 1, "total_pages": 2}
+    assert [d.metadata["page"] for d in pages] == [2]
+
+def test_html_sections_skip_scripts(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><title>T</title><script>var x = 1;</script></head><body>"
+        "<p>Intro text.</p><h2>Chunking</h2><p>Split by <b>structure</b>.</p>"
+        "<h2>Retrieval</h2><ul><li>Use MMR</li></ul></body></html>"
+    )
+    docs = DocumentLoader().load_file(str(path))
+
+    assert [d.metadata["section"] for d in docs] == ["", "Chunking", "Retrieval"]
+    assert docs[1].page_content == "Split by structure."
+    assert all("var x" not in d.page_content for d in docs)
+
+def test_docx_sections_include_tables(tmp_path):
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    document.add_heading("Setup", level=1)
+    document.add_paragraph("Install the package.")
+    table = document.add_table(rows=1, cols=2)
+    table.rows[0].cells[0].text = "chunk_size"
+    table.rows[0].cells[1].text = "500"
+    document.add_heading("Usage", level=1)
+    document.add_paragraph("Run the app.")
+    path = tmp_path / "guide.docx"
+    document.save(str(path))
+
+    docs = DocumentLoader().load_file(str(path))
+
+    assert [d.metadata["section"] for d in docs] == ["Setup", "Usage"]
+    assert docs[0].page_content == "Install the package.\nchunk_size | 500"
+
+def test_load_files_parallel_isolates_failures(tmp_path):
+    good = tmp_path / "good.md"
+    good.write_text("hello")
+    bad = tmp_path / "bad.xyz"
+    bad.write_text("?")
+
+    results = {path: (docs, error) for path, docs, error in
+               DocumentLoader().load_files_parallel([str(good), str(bad)], max_workers=2)}
+
+    assert results[str(good)][0][0].page_content == "hello" and results[str(good)][1] is None
+    assert results[str(bad)][0] == [] and "No loader registered" in results[str(bad)][1]
+
+from langchain_core.documents import Document
+from src.ingestion import ParentChildSplitter
+
+def test_parent_child_splitter_offsets():
+    text = "\n\n".join(f"Section {i}. " + "word " * 60 for i in range(4))
+    doc = Document(page_content=text, metadata={"source": "guide.md"})
+    children, parents = ParentChildSplitter(parent_chunk_size=400, child_chunk_size=100,
+                                            child_chunk_overlap=20).split_documents([doc])
+
+    assert len(parents) > 1 and len(children) > len(parents)
+    by_id = {p.metadata["parent_id"]: p for p in parents}
+    for parent in parents:
+        start, end = parent.metadata["start_index"], parent.metadata["end_index"]
+        assert text[start:end] == parent.page_content
+    for child in children:
+        parent = by_id[child.metadata["parent_id"]]
+        assert text[child.metadata["start_index"]:child.metadata["end_index"]] == child.page_content
+        assert parent.metadata["start_index"] <= child.metadata["start_index"]
+        assert child.metadata["end_index"] <= parent.metadata["end_index"]
+        assert child.metadata["parent_start"] == parent.metadata["start_index"]
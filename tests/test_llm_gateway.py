@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+from langchain_groq import ChatGroq
+from src.llm_gateway import LLMGateway, TokenBucket, get_http_client, is_retryable
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completions stub: replays a scripted list of statuses."""
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            status = server.script.pop(0) if server.script else 200
+        if status != 200:
+            body = json.dumps({"error": {"message": "slow down", "type": "rate_limit"}}).encode()
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+        else:
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": "stub-model",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "stub answer"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3},
+            }).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_provider():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProviderHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.script = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+def test_gateway_retries_rate_limits_against_stub_server(stub_provider):
+    stub_provider.script = [429, 503]
+    llm = ChatGroq(
+        model="stub-model", api_key="test-key", max_retries=0,
+        base_url=f"http://127.0.0.1:{stub_provider.server_address[1]}",
+        http_client=get_http_client(),
+    )
+    gateway = LLMGateway(llm, max_retries=3, backoff_base_s=0.01, rate_per_second=100)
+    
+    response = gateway.invoke("hello")
+    
+    assert response.content == "stub answer"
+    assert stub_provider.requests == 3
+    stats = gateway.stats()
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 1
+
+def test_gateway_does_not_retry_client_errors():
+    error = ValueError("bad request")
+    llm = MagicMock()
+    llm.invoke.side_effect = error
+    gateway = LLMGateway(llm, backoff_base_s=0.01)
+    
+    with pytest.raises(ValueError):
+        gateway.invoke("hello")
+    assert llm.invoke.call_count == 1
+    assert gateway.stats()["failures"] == 1
+
+def test_gateway_respects_deadline():
+    class Unavailable(Exception):
+        status_code = 503
+    llm = MagicMock()
+    llm.invoke.side_effect = Unavailable()
+    gateway = LLMGateway(llm, max_retries=10, backoff_base_s=0.2, backoff_max_s=0.2)
+    
+    started = time.monotonic()
+    with pytest.raises(Unavailable):
+        gateway.invoke("hello", deadline_s=0.3)
+    assert time.monotonic() - started < 0.5
+
+def test_gateway_hedges_slow_requests():
+    calls = []
+    def invoke(messages):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+    llm = MagicMock()
+    llm.invoke.side_effect = invoke
+    gateway = LLMGateway(llm, hedge_after_s=0.05)
+    
+    assert gateway.invoke("hello") == "fast"
+    assert gateway.stats()["hedge_wins"] == 1
+
+def test_gateway_hedged_calls_respect_deadline():
+    llm = MagicMock()
+    llm.invoke.side_effect = lambda messages: time.sleep(0.5)
+    gateway = LLMGateway(llm, max_retries=0, hedge_after_s=0.05)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        gateway.invoke("hello", deadline_s=0.2)
+    assert time.monotonic() - started < 0.4
+    assert gateway.stats()["hedges"] == 1
+
+def test_gateway_concurrency_cap():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    def invoke(messages):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "ok"
+    llm = MagicMock()
+    llm.invoke.side_effect = invoke
+    gateway = LLMGateway(llm, max_concurrency=2)
+    
+    threads = [threading.Thread(target=gateway.invoke, args=("q",)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.acquire(timeout=0.5)
+    bucket.pause(1.0)
+    assert not bucket.acquire(timeout=0.05)
+
+def test_is_retryable():
+    class RateLimited(Exception):
+        status_code = 429
+    class Forbidden(Exception):
+        status_code = 403
+    assert is_retryable(RateLimited())
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(Forbidden())
@@ -0,0 +1,60 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.documents import Document
+from src.llm_providers import StubChatModel, create_llm
+from src.rag import RAGChain
+
+def test_stub_is_deterministic():
+    model = StubChatModel(first_token_latency_s=0, token_latency_s=0, max_tokens=8)
+    first = model.invoke("What is RAG?").content
+    
+    assert first == model.invoke("What is RAG?").content
+    assert first != model.invoke("Something else").content
+    assert len(first.split()) == 8
+
+def test_stub_streams_tokens_with_latency():
+    model = StubChatModel(first_token_latency_s=0.05, token_latency_s=0.01, max_tokens=5)
+    
+    started = time.monotonic()
+    chunks = [chunk.content for chunk in model.stream("hello") if chunk.content]
+    elapsed = time.monotonic() - started
+    
+    assert len(chunks) == 5
+    assert "".join(chunks) == model.invoke("hello").content
+    assert elapsed >= 0.09
+
+def test_create_llm_stub_reads_latency_env(monkeypatch):
+    monkeypatch.setenv("STUB_FIRST_TOKEN_MS", "20")
+    model = create_llm("stub")
+    assert isinstance(model, StubChatModel)
+    assert model.first_token_latency_s == pytest.approx(0.02)
+
+def test_rag_chain_builds_groq_through_create_llm(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "groq")
+    with patch("langchain_groq.ChatGroq") as MockChat:
+        RAGChain(retriever=MagicMock(), model_name="some-model")
+
+    kwargs = MockChat.call_args.kwargs
+    assert kwargs["model"] == "some-model"
+    assert kwargs["max_retries"] == 0 and kwargs["http_client"] is not None
+
+def test_create_llm_errors():
+    with pytest.raises(ValueError):
+        create_llm("bogus")
+    with pytest.raises(ValueError):
+        create_llm("local")
+
+def test_rag_chain_runs_offline_with_stub_provider(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "stub")
+    monkeypatch.setenv("STUB_FIRST_TOKEN_MS", "0")
+    monkeypatch.setenv("STUB_TOKEN_MS", "0")
+    retriever = MagicMock()
+    retriever.retrieve.return_value = [Document(page_content="context info")]
+    
+    chain = RAGChain(retriever=retriever)
+    response = chain.answer("test query")
+    
+    assert isinstance(chain.llm, StubChatModel)
+    assert response["answer"]
+    assert response["answer"] == chain.answer("test query")["answer"]
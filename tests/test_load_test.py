@@ -0,0 +1,66 @@
+import asyncio
+import numpy as np
+import threading
+from src.load_test import InProcessTarget, capacity, poisson_arrivals, run_open_loop, sweep
+
+def test_poisson_arrivals_match_rate():
+    arrivals = poisson_arrivals(rate=50, duration_s=20, seed=1)
+    assert np.all(np.diff(arrivals) > 0) and arrivals[-1] < 20
+    assert abs(len(arrivals) / 20 - 50) < 5
+    assert len(poisson_arrivals(0, 10)) == 0
+
+def test_open_loop_detects_saturation():
+    calls = []
+
+    async def target(query):
+        calls.append(query)
+        await asyncio.sleep(0.02)
+
+    async def scenario():
+        return await sweep(target, ["a", "b"], rates=[200, 10], duration_s=0.5,
+                           concurrency=1, seed=3)
+
+    light, heavy = asyncio.run(scenario())
+
+    assert light["offered_rps"] == 10 and not light["saturated"]
+    assert light["completed"] == light["requests"] and light["errors"] == 0
+    # One worker serves ~50 req/s, so 200 req/s queues up
+    assert heavy["saturated"]
+    assert heavy["achieved_rps"] < 60
+    assert heavy["latency_ms"]["p99"] > heavy["service_ms"]["p95"]
+    assert capacity([light, heavy]) == 10
+    assert set(calls) == {"a", "b"}
+
+def test_open_loop_counts_errors():
+    async def target(query):
+        raise RuntimeError("down")
+
+    result = asyncio.run(run_open_loop(target, ["q"], rate=40, duration_s=0.25, seed=0))
+    assert result["completed"] == 0 and result["errors"] == result["requests"] > 0
+    assert result["saturated"]
+
+def test_sweep_resets_in_process_workers_between_levels():
+    release = threading.Event()
+    calls = []
+
+    def answer(query):
+        calls.append(query)
+        release.wait(1.0)
+
+    target = InProcessTarget(answer, concurrency=1)
+
+    async def scenario():
+        # The only worker is still busy when the level's drain timeout cancels its task
+        first = await run_open_loop(target, ["q"], rate=100, duration_s=0.05, concurrency=1,
+                                    seed=0, drain_timeout_s=0.05)
+        busy_pool = target._pool
+        release.set()
+        results = await sweep(target, ["q"], rates=[5], duration_s=0.2, concurrency=1, seed=0)
+        return first, busy_pool, results
+
+    first, busy_pool, (second,) = asyncio.run(scenario())
+
+    assert first["completed"] < first["requests"]
+    assert target._pool is not busy_pool
+    assert second["completed"] == second["requests"] and not second["saturated"]
+
@@ -0,0 +1,54 @@
+import pytest
+from src.metadata_index import MetadataIndex
+
+def build_index():
+    index = MetadataIndex()
+    index.add(0, {"source": "a.md", "tags": ["hr"], "ingested_date": "2025-01-10"})
+    index.add(1, {"source": "b.md", "tags": ["hr", "legal"], "ingested_date": "2025-03-02"})
+    index.add(2, {"source": "a.md", "tags": ["eng"], "ingested_date": "2025-06-20"})
+    return index
+
+def test_match_single_value():
+    index = build_index()
+    assert index.positions(index.match({"source": "a.md"})).tolist() == [0, 2]
+
+def test_match_list_is_or_and_fields_are_and():
+    index = build_index()
+    assert index.positions(index.match({"tags": ["legal", "eng"]})).tolist() == [1, 2]
+    assert index.positions(index.match({"source": "a.md", "tags": "hr"})).tolist() == [0]
+    assert index.match({"source": "missing.md"}) == 0
+
+def test_match_range():
+    index = build_index()
+    bits = index.match({"ingested_date": {"gte": "2025-03-01", "lt": "2025-06-01"}})
+    assert index.positions(bits).tolist() == [1]
+    with pytest.raises(ValueError):
+        index.match({"ingested_date": {"after": "2025-01-01"}})
+
+def test_readding_position_replaces_postings():
+    index = build_index()
+    index.add(0, {"source": "c.md"})
+    assert index.positions(index.match({"source": "a.md"})).tolist() == [2]
+    assert "hr" in index.values("tags")
+    index.remove(1)
+    assert "hr" not in index.values("tags")
+
+def test_add_batch_matches_single_adds():
+    metadatas = [
+        {"source": f"{i % 3}.md", "tags": ["even" if i % 2 == 0 else "odd"]} for i in range(200)
+    ]
+    single = MetadataIndex()
+    for position, metadata in enumerate(metadatas):
+        single.add(position, metadata)
+    batched = MetadataIndex()
+    batched.add_batch(0, metadatas[:150])
+    batched.add_batch(150, metadatas[150:])
+
+    assert batched.size == single.size == 200
+    assert batched._postings == single._postings
+    bits = batched.match({"source": "1.md", "tags": "odd"})
+    assert batched.positions(bits).tolist() == list(range(1, 200, 6))
+
+def test_to_bitmap_is_little_endian():
+    index = build_index()
+    assert index.to_bitmap(index.match({"source": "a.md"})).tolist() == [0b101]
@@ -0,0 +1,38 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from src.prompts import (
+    RAG_SYSTEM_PROMPT, build_rag_messages, get_conversational_prompt_template,
+    get_rag_prompt_template,
+)
+
+def test_system_prompt_is_static():
+    assert "{" not in RAG_SYSTEM_PROMPT
+    assert "I don't know based on the provided documents." in RAG_SYSTEM_PROMPT
+
+def test_templates_are_precompiled():
+    assert get_rag_prompt_template() is get_rag_prompt_template()
+    assert get_conversational_prompt_template() is get_conversational_prompt_template()
+
+def test_system_prefix_is_identical_across_requests():
+    first = build_rag_messages("alpha context", "alpha?").to_messages()
+    second = build_rag_messages("beta context", "beta?").to_messages()
+
+    assert first[0].type == "system"
+    assert first[0].content == second[0].content == RAG_SYSTEM_PROMPT
+    assert "alpha context" in first[-1].content
+    assert first[-1].content.endswith("Question: alpha?")
+
+def test_fast_path_matches_templates():
+    context, question = "Chunks overlap by 50 tokens.", "How much overlap?"
+    history = [HumanMessage(content="Hi"), AIMessage(content="Hello")]
+
+    expected = get_rag_prompt_template().invoke({"context": context, "question": question})
+    assert build_rag_messages(context, question).to_messages() == expected.to_messages()
+
+    expected = get_conversational_prompt_template().invoke(
+        {"context": context, "history": history, "question": question}
+    )
+    assert build_rag_messages(context, question, history).to_messages() == expected.to_messages()
+
+def test_fast_path_keeps_braces_in_context():
+    messages = build_rag_messages('config = {"k": 8}', "What is k?").to_messages()
+    assert 'config = {"k": 8}' in messages[-1].content
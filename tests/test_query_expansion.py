@@ -0,0 +1,22 @@
+from src.query_expansion import QueryExpander, reciprocal_rank_fusion
+
+def test_expand_splits_multi_part_questions():
+    queries = QueryExpander().expand("What is semantic chunking and how does FAISS index vectors?")
+    
+    assert queries[0] == "What is semantic chunking and how does FAISS index vectors?"
+    assert "What is semantic chunking" in queries
+    assert "how does FAISS index vectors" in queries
+
+def test_expand_adds_keyword_variant_and_caps():
+    queries = QueryExpander(max_queries=2).expand("How do I tune the retrieval k?")
+    assert queries == ["How do I tune the retrieval k?", "tune retrieval k"]
+
+def test_generate_without_generator():
+    assert QueryExpander().generate("anything") == []
+    expander = QueryExpander(generator=lambda q: ["Alt one", "alt ONE", "Alt two"])
+    assert expander.generate("q") == ["Alt one", "Alt two"]
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a"], ["b"]])
+    assert [item for item, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] > fused[1][1]
@@ -9,7 +9,7 @@ def test_rag_chain_answer():
     mock_retriever.retrieve.return_value = [Document(page_content="context info")]
     
     # Mock LLM (ChatGroq) response
-    with patch("src.rag.ChatGroq") as MockChat:
+    with patch("langchain_groq.ChatGroq") as MockChat:
         mock_llm_instance = MockChat.return_value
         mock_llm_instance.invoke.return_value.content = "Answer based on context"
         
@@ -46,3 +46,25 @@ def test_rag_chain_no_context():
         # Verify context sent was empty string or similar
         args, _ = mock_llm_instance.invoke.call_args
         # We assume the prompt is passed to invoke.
+
+def test_relevance_gate_refuses_without_llm():
+    from src.prompts import REFUSAL_ANSWER
+    from src.relevance import RelevanceGate
+
+    mock_retriever = MagicMock()
+    mock_retriever.retrieve_with_scores.return_value = [(Document(page_content="unrelated"), 1.5)]
+    mock_retriever.expand_to_parents.side_effect = lambda docs: docs
+    llm = MagicMock()
+    chain = RAGChain(retriever=mock_retriever, llm=llm, relevance_gate=RelevanceGate(threshold=0.5))
+
+    response = chain.answer("Who is the President of Mars?")
+    assert response["answer"] == REFUSAL_ANSWER
+    assert response["refused"] is True and response["source_documents"] == []
+    llm.invoke.assert_not_called()
+    mock_retriever.retrieve.assert_not_called()
+
+    mock_retriever.retrieve_with_scores.return_value = [(Document(page_content="context"), 0.2)]
+    llm.invoke.return_value.content = "grounded answer"
+    response = chain.answer("What is chunking?")
+    assert response["answer"] == "grounded answer"
+    assert response["source_documents"][0].page_content == "context"
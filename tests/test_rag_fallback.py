@@ -7,7 +7,7 @@ def test_fallback_when_retrieval_empty():
     mock_retriever = MagicMock()
     mock_retriever.retrieve.return_value = []
     
-    with patch("src.rag.ChatGroq") as MockChat:
+    with patch("langchain_groq.ChatGroq") as MockChat:
         mock_llm = MockChat.return_value
         # We rely on the system prompt to instruct the LLM to say "I don't know"
         # Since we use a real LLM prompt in the chain, we expect the output to be what the LLM returns.
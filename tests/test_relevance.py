@@ -0,0 +1,54 @@
+import pytest
+from langchain_core.documents import Document
+from src.relevance import (
+    LogisticClassifier, RelevanceGate, calibrate_threshold, fit_gate, holdout_split,
+    relevance_features, similarity_from_distance,
+)
+
+def hits(*distances, text="chunking strategies for retrieval"):
+    return [(Document(page_content=text), d) for d in distances]
+
+def test_similarity_from_distance_and_features():
+    assert similarity_from_distance([0.0, 2.0]).tolist() == [1.0, 0.0]
+    features = relevance_features("What chunking strategies exist?", hits(0.4, 1.0, 1.2))
+    assert features[0] == pytest.approx(0.8)
+    assert features[1] == pytest.approx((0.8 + 0.5 + 0.4) / 3)
+    assert features[2] == pytest.approx(0.3)
+    assert features[3] == pytest.approx(2 / 3)  # chunking, strategies; not "exist"
+
+def test_calibrate_threshold_keeps_answerable_recall():
+    scores = [0.8, 0.6, 0.55, 0.3, 0.58]
+    answerable = [True, True, True, False, False]
+    threshold = calibrate_threshold(scores, answerable)
+    assert threshold == pytest.approx(0.425)
+    # Allowing one answerable miss lets the gate refuse the 0.58 case too
+    assert calibrate_threshold(scores, answerable, min_recall=0.6) == pytest.approx(0.59)
+
+def test_gate_round_trip_with_classifier(tmp_path):
+    queries = ["chunking strategies", "chunking size", "president of mars", "weather on venus"]
+    retrievals = [hits(0.3), hits(0.5), hits(1.4, text="unrelated"), hits(1.2, text="unrelated")]
+    gate = fit_gate(queries, retrievals, [True, True, False, False], with_classifier=True)
+
+    verdicts = [gate.assess(q, r) for q, r in zip(queries, retrievals)]
+    assert [v["answerable"] for v in verdicts] == [True, True, False, False]
+    assert verdicts[0]["probability"] > 0.5 > verdicts[2]["probability"]
+    assert gate.assess("anything", [])["answerable"] is False
+
+    path = str(tmp_path / "gate.json")
+    gate.save(path)
+    loaded = RelevanceGate.load(path)
+    assert loaded.threshold == gate.threshold
+    assert loaded.assess(queries[1], retrievals[1]) == verdicts[1]
+    assert isinstance(loaded.classifier, LogisticClassifier)
+    assert loaded.calibration_queries == queries
+
+def test_holdout_split_is_stratified_and_keeps_calibration_data():
+    labels = [True, True, True, False, False]
+    calibration, held_out = holdout_split(labels, fraction=0.4, seed=0)
+
+    assert sorted(calibration + held_out) == list(range(5))
+    assert [labels[i] for i in held_out].count(True) == 1
+    assert [labels[i] for i in held_out].count(False) == 1
+    assert holdout_split(labels, 0.4, seed=0) == (calibration, held_out)
+    # A class is never emptied out of calibration
+    assert holdout_split([True, False], fraction=0.9)[1] == []
@@ -37,3 +37,240 @@ def test_retrieve_empty_query():
     
     retriever.retrieve("   ")
     # Depends on implementation, but assuming it sanitizes or passes through.
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.retrieval import maximal_marginal_relevance
+from src.vectorizer import VectorStoreManager
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic embeddings: one dimension per keyword."""
+    KEYWORDS = ["chunking", "faiss", "prompt", "groq", "docling"]
+
+    def _embed(self, text):
+        words = text.lower().split()
+        vector = [float(words.count(k)) for k in self.KEYWORDS] + [0.01]
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+class FakeEmbeddingModel:
+    def __init__(self):
+        self.embeddings = KeywordEmbeddings()
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_queries(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+def build_manager(texts):
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index([Document(page_content=t, metadata={"source": f"doc{i}.md"})
+                          for i, t in enumerate(texts)])
+    return manager
+
+def test_maximal_marginal_relevance_prefers_diverse_candidates():
+    query = np.array([1.0, 1.0])
+    candidates = np.array([[1.0, 0.9], [1.0, 0.91], [0.2, 1.0]])
+    
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [1, 0]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.3) == [1, 2]
+    assert maximal_marginal_relevance(query, candidates[:0], k=2) == []
+
+def test_retrieve_mmr_skips_redundant_chunks():
+    manager = build_manager([
+        "chunking chunking faiss",
+        "chunking chunking faiss",
+        "chunking faiss faiss prompt",
+        "groq groq",
+    ])
+    retriever = Retriever(vector_store_manager=manager)
+    
+    similar = retriever.retrieve("chunking faiss", k=2)
+    diverse = retriever.retrieve("chunking faiss", k=2, search_type="mmr", fetch_k=4,
+                                 lambda_mult=0.3)
+    
+    assert similar[0].page_content == similar[1].page_content
+    assert diverse[0].page_content != diverse[1].page_content
+
+def test_retrieve_with_logs_mmr():
+    manager = build_manager(["chunking", "faiss", "prompt"])
+    retriever = Retriever(vector_store_manager=manager)
+    
+    response = retriever.retrieve_with_logs("chunking", k=2, search_type="mmr", fetch_k=3)
+    
+    assert len(response["results"]) == 2
+    assert response["logs"][0]["source"] == "doc0.md"
+    assert [log["rank"] for log in response["logs"]] == [1, 2]
+
+def test_retrieve_unknown_search_type():
+    retriever = Retriever(vector_store_manager=MagicMock())
+    with pytest.raises(ValueError):
+        retriever.retrieve("query", search_type="bogus")
+
+def test_retrieve_with_metadata_prefilter():
+    manager = build_manager(["chunking faiss", "chunking", "chunking chunking", "groq"])
+    retriever = Retriever(vector_store_manager=manager)
+    
+    results = retriever.retrieve("chunking", k=2, filter={"source": ["doc3.md", "doc0.md"]})
+    assert sorted(d.metadata["source"] for d in results) == ["doc0.md", "doc3.md"]
+    
+    response = retriever.retrieve_with_logs("chunking", k=3, search_type="mmr",
+                                            filter={"source": "doc1.md"})
+    assert [log["source"] for log in response["logs"]] == ["doc1.md"]
+    
+    assert retriever.retrieve("chunking", filter={"source": "missing.md"}) == []
+
+import time
+from src.query_expansion import QueryExpander
+
+def test_retrieve_multi_query_fuses_sub_queries():
+    manager = build_manager(["chunking chunking", "groq groq", "prompt"])
+    retriever = Retriever(vector_store_manager=manager)
+    
+    response = retriever.retrieve_with_logs(
+        "What is chunking and how does groq work?", k=2, search_type="multi_query", fetch_k=1)
+    
+    assert sorted(d.page_content for d in response["results"]) == ["chunking chunking", "groq groq"]
+    assert response["queries"][0] == "What is chunking and how does groq work?"
+    assert len(response["queries"]) > 1
+
+def test_retrieve_multi_query_deadline_uses_partial_results():
+    def slow_generator(query):
+        time.sleep(0.5)
+        return ["prompt"]
+    
+    manager = build_manager(["chunking", "prompt"])
+    retriever = Retriever(manager, query_expander=QueryExpander(generator=slow_generator))
+    
+    started = time.monotonic()
+    response = retriever.retrieve_with_logs("chunking", k=1, search_type="multi_query",
+                                            deadline_s=0.05)
+    
+    assert time.monotonic() - started < 0.4
+    assert response["queries"] == ["chunking"]
+    assert response["results"][0].page_content == "chunking"
+    
+    fast = Retriever(manager, query_expander=QueryExpander(generator=lambda q: ["prompt"]))
+    assert "prompt" in fast.retrieve_with_logs("chunking", search_type="multi_query")["queries"]
+
+def test_retrieve_multi_query_survives_generator_errors():
+    def broken_generator(query):
+        raise ConnectionError("LLM unavailable")
+
+    manager = build_manager(["chunking", "prompt"])
+    retriever = Retriever(manager, query_expander=QueryExpander(generator=broken_generator))
+    response = retriever.retrieve_with_logs("chunking", k=1, search_type="multi_query")
+
+    assert response["queries"] == ["chunking"]
+    assert response["results"][0].page_content == "chunking"
+
+def test_retriever_close_stops_expansion_threads():
+    manager = build_manager(["chunking", "prompt"])
+    retriever = Retriever(manager, query_expander=QueryExpander(generator=lambda q: ["prompt"]))
+    retriever.retrieve("chunking", k=1, search_type="multi_query")
+    executor = retriever._executor
+
+    retriever.close()
+    assert retriever._executor is None and executor._shutdown
+    # A later multi-query search starts a new pool
+    assert retriever.retrieve("chunking", k=1, search_type="multi_query")
+
+from src.retrieval import ParentStore
+
+def test_parent_store_expands_and_merges_parents():
+    def parent(pid, start, end, source="a.md"):
+        return Document(page_content=f"parent {pid}",
+                        metadata={"source": source, "parent_id": pid,
+                                  "start_index": start, "end_index": end})
+
+    def child(pid):
+        return Document(page_content=f"child of {pid}",
+                        metadata={"source": "a.md", "parent_id": pid})
+
+    store = ParentStore()
+    store.add([
+        parent("p0", 0, 100), parent("p1", 102, 200), parent("p2", 500, 600),
+        parent("q0", 0, 50, "b.md"),
+    ])
+    orphan = Document(page_content="no parent", metadata={"source": "c.md"})
+
+    blocks = store.expand([child("p2"), child("q0"), child("p1"), orphan, child("p0"), child("p2")])
+
+    assert [b.page_content for b in blocks] == [
+        "parent p2", "parent q0", "parent p0\n\nparent p1", "no parent",
+    ]
+    assert blocks[0].metadata["child_hits"] == 2
+    assert blocks[2].metadata["parent_ids"] == ["p0", "p1"]
+    assert (blocks[2].metadata["start_index"], blocks[2].metadata["end_index"]) == (0, 200)
+
+    assert store.remove_sources(["a.md"]) == 3
+    assert len(store) == 1
+
+def test_retrieve_expands_children_to_parents():
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index([
+        Document(page_content="chunking", metadata={"source": "a.md", "parent_id": "a.md:0"}),
+        Document(page_content="faiss", metadata={"source": "a.md", "parent_id": "a.md:0"}),
+    ])
+    store = ParentStore()
+    store.add([Document(page_content="chunking with faiss",
+                        metadata={"source": "a.md", "parent_id": "a.md:0",
+                                  "start_index": 0, "end_index": 19})])
+
+    docs = Retriever(manager, parent_store=store).retrieve("chunking faiss", k=2)
+
+    assert [d.page_content for d in docs] == ["chunking with faiss"]
+    assert docs[0].metadata["child_hits"] == 2
+
+def test_retrieve_with_scores_returns_distances():
+    manager = build_manager(["chunking", "groq"])
+    scored = Retriever(manager).retrieve_with_scores("chunking", k=2)
+    assert [d.page_content for d, _ in scored] == ["chunking", "groq"]
+    assert scored[0][1] == pytest.approx(0.0) and scored[1][1] > 0
+    assert Retriever(manager).retrieve_with_scores("  ") == []
+
+def test_select_k_cuts_at_sharp_drops_only():
+    from src.retrieval import select_k
+
+    distances = np.array([
+        [0.10, 0.11, 0.90, 1.00, 1.05],  # clear gap after two hits
+        [0.10, 0.20, 0.30, 0.40, 0.50],  # steady decline: keep everything
+        [0.20, 0.20, 0.20, 0.20, 0.20],  # flat
+        [0.10, 0.50, np.inf, np.inf, np.inf],  # only two neighbours found
+    ])
+
+    assert select_k(distances).tolist() == [2, 5, 5, 2]
+    assert select_k(distances[0], min_k=3).tolist() == [3]
+    assert select_k(distances[1], max_k=3).tolist() == [3]
+
+def test_retrieve_adaptive_k_drops_the_tail():
+    manager = build_manager(
+        ["faiss", "faiss", "faiss", "groq", "prompt", "docling", "chunking groq"]
+    )
+    retriever = Retriever(vector_store_manager=manager, adaptive_k=True)
+
+    docs = retriever.retrieve("faiss", k=6)
+    assert [d.page_content for d in docs] == ["faiss"] * 3
+    assert len(retriever.retrieve("faiss", k=6, adaptive=False)) == 6
+    assert len(retriever.retrieve_with_scores("faiss", k=6)) == 3
+    assert retriever.retrieve_with_logs("faiss", k=6)["k"] == 3
+    assert [len(docs) for docs in retriever.retrieve_batch(["faiss", "groq"], k=6)] == [3, 2]
+
+def test_retrieve_adaptive_k_over_fetches_up_to_max_k():
+    manager = build_manager(["faiss"] * 5 + ["groq", "prompt", "docling"])
+    retriever = Retriever(vector_store_manager=manager, adaptive_k=True, min_k=1, max_k=8)
+
+    # k=2 does not cap the cut: all five near-identical hits are kept
+    assert [d.page_content for d in retriever.retrieve("faiss", k=2)] == ["faiss"] * 5
+    assert len(retriever.retrieve_with_scores("faiss", k=2)) == 5
+    assert [len(docs) for docs in retriever.retrieve_batch(["faiss"], k=2)] == [5]
+    assert len(Retriever(manager, adaptive_k=True, max_k=2).retrieve("faiss", k=2)) == 2
@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.documents import Document
+from src.server import create_app
+from src.tokens import TokenCounter
+from tests.test_tokens import WordEncoding
+
+@pytest.fixture(autouse=True)
+def offline_token_counter():
+    # Markdown uploads are chunked by token count; tiktoken needs a download
+    counter = TokenCounter(encoding=WordEncoding())
+    with patch("src.ingestion.get_token_counter", return_value=counter):
+        yield
+
+def make_chain():
+    chain = MagicMock()
+    chain.relevance_gate = None
+    chain.retriever.retrieve_batch.side_effect = lambda queries, k: [
+        [Document(page_content=f"{q} #{i}", metadata={"source": "doc.md"}) for i in range(k)]
+        for q in queries
+    ]
+    chain.generate.side_effect = lambda query, docs: {
+        "answer": f"answer to {query}", "source_documents": docs, "query": query,
+    }
+    return chain
+
+async def run_with_client(app, scenario):
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        return await scenario(client)
+    finally:
+        await client.close()
+
+def test_concurrent_retrieve_requests_are_batched():
+    chain = make_chain()
+    app = create_app(chain, max_wait_ms=50)
+
+    async def scenario(client):
+        responses = await asyncio.gather(*(
+            client.post("/retrieve", json={"query": f"q{i}", "k": 2}) for i in range(4)
+        ))
+        bodies = [await r.json() for r in responses]
+        health = await (await client.get("/health")).json()
+        return bodies, health
+
+    bodies, health = asyncio.run(run_with_client(app, scenario))
+    
+    assert [b["documents"][0]["content"] for b in bodies] == ["q0 #0", "q1 #0", "q2 #0", "q3 #0"]
+    assert chain.retriever.retrieve_batch.call_count == 1
+    assert health["batcher"]["items"] == 4
+
+def test_query_endpoint_generates_answer():
+    chain = make_chain()
+
+    async def scenario(client):
+        response = await client.post("/query", json={"query": "what is rag", "k": 1})
+        return response.status, await response.json()
+
+    status, body = asyncio.run(run_with_client(create_app(chain), scenario))
+    
+    assert status == 200
+    assert body["answer"] == "answer to what is rag"
+    assert body["sources"][0]["source"] == "doc.md"
+
+def test_query_endpoint_applies_the_relevance_gate():
+    chain = make_chain()
+    chain.retriever.retrieve_with_scores.side_effect = lambda query, k, filter: [
+        (Document(page_content=query, metadata={"source": "doc.md"}), 0.5)
+    ]
+    chain.retriever.expand_to_parents.side_effect = lambda docs: docs
+    chain.relevance_gate = MagicMock()
+    chain.relevance_gate.assess.side_effect = lambda query, scored: {
+        "answerable": "rag" in query, "top_similarity": 0.1,
+    }
+    chain.refuse.side_effect = lambda query, verdict: {
+        "answer": "I don't know based on the provided documents.", "source_documents": [],
+        "query": query, "refused": True,
+    }
+
+    async def scenario(client):
+        answered = await client.post("/query", json={"query": "what is rag", "k": 1})
+        refused = await client.post("/query", json={"query": "weather today", "k": 1})
+        return await answered.json(), await refused.json()
+
+    answered, refused = asyncio.run(run_with_client(create_app(chain), scenario))
+
+    assert answered["answer"] == "answer to what is rag"
+    assert refused["refused"] and refused["sources"] == []
+    assert [call.args[0] for call in chain.generate.call_args_list] == ["what is rag"]
+    chain.retriever.retrieve_batch.assert_not_called()
+
+def test_identical_concurrent_queries_are_coalesced():
+    chain = make_chain()
+
+    async def scenario(client):
+        responses = await asyncio.gather(*(
+            client.post("/query", json={"query": "what  is rag", "k": 1}) for _ in range(3)
+        ))
+        bodies = [await r.json() for r in responses]
+        health = await (await client.get("/health")).json()
+        return bodies, health
+
+    bodies, health = asyncio.run(run_with_client(create_app(chain, max_wait_ms=50), scenario))
+
+    assert [b["answer"] for b in bodies] == ["answer to what  is rag"] * 3
+    assert chain.retriever.retrieve_batch.call_count == 1
+    assert health["batcher"]["items"] == 1
+    assert health["single_flight"]["coalesced"] >= 2
+
+def test_invalid_requests_are_rejected():
+    async def scenario(client):
+        missing = await client.post("/query", json={"k": 2})
+        bad_k = await client.post("/retrieve", json={"query": "x", "k": 0})
+        huge_k = await client.post("/retrieve", json={"query": "x", "k": 10**7})
+        return missing.status, bad_k.status, huge_k.status
+
+    assert asyncio.run(run_with_client(create_app(make_chain()), scenario)) == (400, 400, 400)
+
+def test_ingest_adds_chunks():
+    chain = make_chain()
+
+    async def scenario(client):
+        response = await client.post("/ingest", json={
+            "documents": [{"text": "New policy text.", "metadata": {"source": "policy.md"}}]
+        })
+        return await response.json()
+
+    body = asyncio.run(run_with_client(create_app(chain), scenario))
+    
+    assert body["chunks_added"] == 1
+    added = chain.retriever.vector_store_manager.add_documents.call_args[0][0]
+    assert added[0].metadata["source"] == "policy.md"
+    assert added[0].metadata["doc_type"] == "md"
+
+def test_ingest_paths_must_stay_in_data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "notes.md").write_text("Inside the data directory.")
+    (tmp_path / "secret.env").write_text("GROQ_API_KEY=gsk_secret")
+    chain = make_chain()
+
+    async def scenario(client):
+        inside = await client.post("/ingest", json={"paths": ["notes.md"]})
+        outside = [
+            (await client.post("/ingest", json={"paths": [path]})).status
+            for path in ["../secret.env", str(tmp_path / "secret.env")]
+        ]
+        return await inside.json(), outside
+
+    app = create_app(chain, data_dir=str(data_dir))
+    inside, outside = asyncio.run(run_with_client(app, scenario))
+
+    assert inside["chunks_added"] == 1
+    assert outside == [400, 400]
+    assert chain.retriever.vector_store_manager.add_documents.call_count == 1
+
+def test_collection_requests_are_routed(tmp_path):
+    from src.collection_manager import CollectionManager
+    from tests.test_retrieval import FakeEmbeddingModel
+
+    collections = CollectionManager(FakeEmbeddingModel(), str(tmp_path))
+    app = create_app(make_chain(), collections=collections)
+
+    async def scenario(client):
+        ingest = await client.post("/ingest", json={
+            "collection": "team-a",
+            "documents": [{"text": "faiss", "metadata": {"source": "a.md"}}],
+        })
+        found = await client.post("/retrieve",
+                                  json={"query": "faiss", "k": 1, "collection": "team-a"})
+        missing = await client.post("/retrieve", json={"query": "faiss", "collection": "team-b"})
+        listing = await client.get("/collections")
+        return await ingest.json(), await found.json(), missing.status, await listing.json()
+
+    ingest, found, missing, listing = asyncio.run(run_with_client(app, scenario))
+
+    assert ingest["chunks_added"] == 1
+    assert found["documents"][0]["source"] == "a.md"
+    assert missing == 404
+    assert listing["loaded"] == ["team-a"]
+    assert listing["events"][0]["event"] == "create"
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from src.retrieval import Retriever
+from src.sharding import ShardUnavailable, ShardedVectorStoreManager, merge_topk, shard_for
+from tests.test_retrieval import FakeEmbeddingModel, build_manager
+
+TEXTS = [
+    "chunking chunking faiss",
+    "faiss faiss",
+    "prompt groq",
+    "groq groq groq",
+    "docling chunking",
+    "prompt prompt faiss",
+    "chunking",
+    "docling docling",
+]
+
+@pytest.fixture(scope="module")
+def sharded():
+    manager = ShardedVectorStoreManager(FakeEmbeddingModel(), num_shards=3, timeout_s=30.0)
+    manager.create_index([Document(page_content=t, metadata={"source": f"doc{i}.md"})
+                          for i, t in enumerate(TEXTS)])
+    yield manager
+    manager.close()
+
+def test_shard_for_is_stable_and_spreads():
+    docs = [Document(page_content=f"chunk {i}", metadata={"source": "a.md"}) for i in range(200)]
+    assignment = [shard_for(d, 4) for d in docs]
+    assert assignment == [shard_for(d, 4) for d in docs]
+    assert set(assignment) == {0, 1, 2, 3}
+
+def test_merge_topk_orders_across_shards():
+    distances = [np.array([[0.1, 0.5]]), np.array([[0.2, np.inf]])]
+    positions = [np.array([[4, 7]]), np.array([[2, -1]])]
+    top_distances, top_positions = merge_topk(distances, positions, k=3)
+    assert top_positions.tolist() == [[4, 2, 7]]
+    assert top_distances[0, 0] == pytest.approx(0.1)
+
+def test_sharded_search_matches_single_index(sharded):
+    single = build_manager(TEXTS)
+    assert sum(s["size"] for s in sharded.health()) == len(TEXTS)
+
+    queries = [[1.0, 1.0, 0, 0, 0, 0.01], [0, 0, 1.0, 1.0, 0, 0.01]]
+    k = len(TEXTS)
+    expected_distances, expected_positions = single.search_by_vectors(queries, k=k)
+    distances, positions = sharded.search_by_vectors(queries, k=k)
+
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+    for row, expected_row in zip(positions, expected_positions):
+        # Global positions follow insertion order, as in the single index; ties may reorder
+        assert sorted(row.tolist()) == sorted(expected_row.tolist())
+        assert [d.page_content for d in sharded.get_documents(row)] == [TEXTS[p] for p in row]
+    np.testing.assert_allclose(sharded.get_vectors(positions[0]), single.get_vectors(positions[0]))
+
+def test_sharded_manager_is_a_drop_in_for_retriever(sharded):
+    retriever = Retriever(vector_store_manager=sharded)
+
+    assert retriever.retrieve("groq groq groq", k=1)[0].page_content == "groq groq groq"
+    filtered = retriever.retrieve("chunking", k=3, filter={"source": ["doc4.md", "doc7.md"]})
+    assert [d.metadata["source"] for d in filtered] == ["doc4.md", "doc7.md"]
+    diverse = retriever.retrieve("chunking faiss", k=2, search_type="mmr", fetch_k=5)
+    assert len(diverse) == 2
+    logs = retriever.retrieve_with_logs("prompt prompt faiss", k=2)["logs"]
+    assert logs[0]["source"] == "doc5.md"
+
+def test_add_documents_and_health(sharded):
+    sharded.add_documents([Document(page_content="docling", metadata={"source": "new.md"})])
+    assert sharded.get_retriever(k=1).invoke("docling")[0].metadata["source"] == "new.md"
+
+    report = sharded.health()
+    assert len(report) == 3
+    assert all(s["alive"] and s["healthy"] for s in report)
+    assert all(s["latency_ms_p50"] is not None for s in report)
+
+def test_search_degrades_when_a_shard_dies():
+    with ShardedVectorStoreManager(FakeEmbeddingModel(), num_shards=2, timeout_s=5.0) as manager:
+        manager.create_index([Document(page_content=t, metadata={"source": f"doc{i}.md"})
+                              for i, t in enumerate(TEXTS)])
+        manager._shards[0].process.kill()
+        manager._shards[0].process.join()
+
+        _, positions = manager.search_by_vectors([1.0, 1.0, 0, 0, 0, 0.01], k=len(TEXTS))
+        found = positions[0][positions[0] != -1]
+        assert len(found) == manager._shards[1].size
+
+        report = manager.health()
+        assert not report[0]["healthy"] and not report[0]["alive"]
+        assert report[1]["healthy"]
+
+def test_failed_add_on_one_shard_is_rolled_back():
+    with ShardedVectorStoreManager(FakeEmbeddingModel(), num_shards=2, timeout_s=5.0) as manager:
+        manager.create_index([Document(page_content=t, metadata={"source": f"doc{i}.md"})
+                              for i, t in enumerate(TEXTS)])
+        sizes = [shard.size for shard in manager._shards]
+        broken = manager._shards[0]
+        send = broken.send
+
+        def failing_send(request_id, op, payload=None):
+            if op == "add":
+                raise OSError("broken pipe")
+            return send(request_id, op, payload)
+
+        broken.send = failing_send
+        new = [Document(page_content=f"groq docling {i}", metadata={"source": "new.md"})
+               for i in range(8)]
+        with pytest.raises(ShardUnavailable):
+            manager.add_documents(new)
+
+        # Parent bookkeeping and the shard processes still agree
+        assert [shard.size for shard in manager._shards] == sizes
+        held = manager._scatter({shard.shard_id: ("ping", None) for shard in manager._shards})
+        assert [held[i] for i in range(2)] == sizes
+
+        broken.send = send
+        manager.add_documents(new)
+        found = Retriever(manager).retrieve("groq docling", k=len(TEXTS) + len(new))
+        expected = TEXTS + [d.page_content for d in new]
+        assert sorted(d.page_content for d in found) == sorted(expected)
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from src.singleflight import SingleFlight
+
+def wait_for_followers(flights, calls):
+    deadline = time.monotonic() + 2
+    while flights.stats()["calls"] < calls and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+def test_concurrent_threads_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def work():
+        executions.append(1)
+        release.wait(2)
+        return ["doc"]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("q", work)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_for_followers(flights, 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert results == [["doc"]] * 5
+    assert flights.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+    assert flights.do("q", lambda: "fresh") == "fresh"  # landed flights are not reused
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise RuntimeError("llm down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("q", fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for_followers(flights, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["llm down"] * 3
+    assert flights.in_flight() == 0
+
+def test_coroutines_coalesce_and_join_thread_flights():
+    flights = SingleFlight()
+    executions = []
+
+    async def work():
+        executions.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def scenario():
+        same = await asyncio.gather(*(flights.do_async("a", work) for _ in range(4)))
+        other = await flights.do_async("b", work)
+        # A coroutine arriving while a thread leads the key waits for it
+        release = threading.Event()
+        loop = asyncio.get_running_loop()
+        leader = loop.run_in_executor(
+            None, flights.do, "c", lambda: release.wait(2) and "from thread"
+        )
+        while flights.in_flight() == 0:
+            await asyncio.sleep(0.005)
+        follower = asyncio.ensure_future(flights.do_async("c", work))
+        await asyncio.sleep(0.01)
+        release.set()
+        return same, other, await follower, await leader
+
+    same, other, follower, leader = asyncio.run(scenario())
+
+    assert same == [42] * 4 and other == 42
+    assert follower == leader == "from thread"
+    assert len(executions) == 2
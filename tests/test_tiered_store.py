@@ -0,0 +1,92 @@
+import gc
+import os
+import pickle
+from langchain_core.documents import Document
+from src.retrieval import Retriever
+from src.tiered_store import AccessStats, TieredDocstore, TieredStorage, chunk_key
+from src.vectorizer import VectorStoreManager
+from tests.test_retrieval import FakeEmbeddingModel
+
+TEXTS = ["chunking", "faiss", "prompt", "groq", "docling"]
+
+def build(tmp_path, hot_fraction=0.2):
+    storage = TieredStorage(str(tmp_path), hot_fraction=hot_fraction, min_hot=0)
+    manager = VectorStoreManager(FakeEmbeddingModel(), docstore_factory=storage)
+    manager.create_index([Document(page_content=t, metadata={"source": f"{t}.md"}) for t in TEXTS])
+    retriever = Retriever(manager, access_stats=storage.access_stats)
+    return storage, manager, retriever
+
+def test_cold_chunks_are_read_from_the_segment(tmp_path):
+    storage, manager, retriever = build(tmp_path)
+    docstore = manager.vector_store.docstore
+    assert isinstance(docstore, TieredDocstore)
+    # No traffic yet: the hot budget is filled in index order, the rest is cold
+    assert docstore.stats()["hot"] == 1 and docstore.stats()["cold"] == 4
+    assert [doc.page_content for doc in docstore._hot.values()] == ["chunking"]
+    assert retriever.retrieve("faiss", k=1)[0].page_content == "faiss"
+    assert docstore.stats()["cold_reads"] >= 1
+
+def test_retier_promotes_frequently_retrieved_chunks(tmp_path):
+    storage, manager, retriever = build(tmp_path, hot_fraction=0.4)
+    for _ in range(3):
+        retriever.retrieve("groq", k=1)
+    retriever.retrieve("prompt", k=1)
+    retriever.retrieve_with_scores("docling", k=1)
+    groq = Document(page_content="groq", metadata={"source": "groq.md"})
+    assert storage.access_stats.counts()[chunk_key(groq)] == 3
+
+    assert storage.retier(manager) == {"promoted": 2, "demoted": 2}
+    docstore = manager.vector_store.docstore
+    hot = {doc.page_content for doc in docstore._hot.values()}
+    assert hot == {"groq", "docling"} or hot == {"groq", "prompt"}
+    assert "groq" in hot
+
+    # Counters decay, so traffic moving elsewhere demotes old favourites
+    for _ in range(8):
+        retriever.retrieve("chunking", k=1)
+        retriever.retrieve("faiss", k=1)
+    storage.retier(manager)
+    assert {doc.page_content for doc in docstore._hot.values()} == {"chunking", "faiss"}
+    assert retriever.retrieve("groq", k=1)[0].page_content == "groq"
+
+def test_new_snapshots_start_with_the_hot_set_and_persist_fully(tmp_path):
+    storage, manager, retriever = build(tmp_path / "segments", hot_fraction=0.25)
+    retriever.retrieve("docling", k=1)
+    manager.replace_sources(["faiss.md"], [])
+    docstore = manager.vector_store.docstore
+    assert [doc.page_content for doc in docstore._hot.values()] == ["docling"]
+
+    copy = pickle.loads(pickle.dumps(docstore))
+    assert sorted(copy.search(i).page_content for i in docstore.ids()) == [
+        "chunking", "docling", "groq", "prompt",
+    ]
+
+    manager.save_snapshot(str(tmp_path / "snap"))
+    loaded = VectorStoreManager(FakeEmbeddingModel())
+    loaded.load_snapshot(str(tmp_path / "snap"))
+    assert Retriever(loaded).retrieve("prompt", k=1)[0].page_content == "prompt"
+
+def test_retier_keeps_free_hot_slots_filled(tmp_path):
+    storage, manager, retriever = build(tmp_path, hot_fraction=0.6)
+    docstore = manager.vector_store.docstore
+    retriever.retrieve("groq", k=1)
+
+    # One accessed chunk; the other two slots stay with chunks already in memory
+    assert storage.retier(manager) == {"promoted": 1, "demoted": 1}
+    assert {doc.page_content for doc in docstore._hot.values()} == {"groq", "chunking", "faiss"}
+
+def test_segment_is_removed_with_its_store(tmp_path):
+    store = TieredDocstore(str(tmp_path / "seg"), {"a": Document(page_content="x")}, hot_ids=[])
+    assert os.path.exists(tmp_path / "seg")
+    del store
+    gc.collect()
+    assert not os.path.exists(tmp_path / "seg")
+
+def test_access_stats_age():
+    stats = AccessStats(decay=0.5)
+    doc = Document(page_content="x")
+    stats.record([doc, doc, doc])
+    stats.age()
+    assert stats.counts() == {chunk_key(doc): 1.5}
+    stats.age()
+    assert len(stats) == 0
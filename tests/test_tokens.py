@@ -0,0 +1,53 @@
+import re
+from unittest.mock import patch
+from src.tokens import TokenCounter, describe_token_counts, get_encoding
+
+class WordEncoding:
+    """Whitespace tokenizer standing in for a tiktoken encoding."""
+    def __init__(self):
+        self.encode_calls = 0
+        self.vocab = {}
+        self.pieces = []
+
+    def encode(self, text, disallowed_special=()):
+        self.encode_calls += 1
+        tokens = []
+        for piece in re.findall(r"\s*\S+|\s+$", text):
+            if piece not in self.vocab:
+                self.vocab[piece] = len(self.pieces)
+                self.pieces.append(piece)
+            tokens.append(self.vocab[piece])
+        return tokens
+
+    def encode_batch(self, texts, disallowed_special=()):
+        return [self.encode(t) for t in texts]
+
+    def decode_with_offsets(self, tokens):
+        offsets, position = [], 0
+        for token in tokens:
+            offsets.append(position)
+            position += len(self.pieces[token])
+        return "".join(self.pieces[t] for t in tokens), offsets
+
+def test_get_encoding_is_cached():
+    get_encoding.cache_clear()
+    with patch("tiktoken.get_encoding") as mock_get:
+        first = get_encoding("cl100k_base")
+        second = get_encoding("cl100k_base")
+    assert first is second
+    mock_get.assert_called_once_with("cl100k_base")
+    get_encoding.cache_clear()
+
+def test_token_counter_counts():
+    counter = TokenCounter(encoding=WordEncoding())
+    assert counter.count("one two three") == 3
+    assert counter.count("") == 0
+    assert counter.count_batch(["a b", "c"]) == [2, 1]
+
+def test_describe_token_counts():
+    stats = describe_token_counts([10, 20, 30, 40])
+    assert stats["count"] == 4
+    assert stats["min"] == 10
+    assert stats["max"] == 40
+    assert stats["mean"] == 25.0
+    assert describe_token_counts([])["count"] == 0
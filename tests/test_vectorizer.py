@@ -1,6 +1,9 @@
 import pytest
 from unittest.mock import MagicMock, patch
-from src.vectorizer import EmbeddingModel
+from langchain_core.documents import Document
+from src.retrieval import Retriever
+from src.vectorizer import EmbeddingModel, VectorStoreManager
+from tests.test_retrieval import FakeEmbeddingModel
 
 def test_embedding_model_initialization():
     with patch("src.vectorizer.HuggingFaceEmbeddings") as MockEmbeddings:
@@ -30,9 +33,6 @@ def test_get_documents_embedding():
         assert embeddings[0] == [0.1]
         mock_instance.embed_documents.assert_called_with(["doc1", "doc2"])
 
-from src.vectorizer import VectorStoreManager
-from langchain_core.documents import Document
-
 def test_vector_store_manager_create():
     with patch("src.vectorizer.FAISS") as MockFAISS:
         mock_embedding_model = MagicMock()
@@ -45,19 +45,6 @@ def test_vector_store_manager_create():
             docs, mock_embedding_model.embeddings
         )
 
-def test_vector_store_manager_add():
-    with patch("src.vectorizer.FAISS") as MockFAISS:
-        mock_embedding_model = MagicMock()
-        manager = VectorStoreManager(embedding_model=mock_embedding_model)
-        
-        # Mock internal vector store
-        manager.vector_store = MockFAISS.return_value
-        
-        docs = [Document(page_content="test2")]
-        manager.add_documents(docs)
-        
-        manager.vector_store.add_documents.assert_called_once_with(docs)
-
 def test_vector_store_metadata():
     """Verify that metadata is preserved when adding to vector store."""
     with patch("src.vectorizer.FAISS") as MockFAISS:
@@ -76,3 +63,90 @@ def test_vector_store_metadata():
         passed_docs = args[0]
         assert passed_docs[0].metadata["source"] == "file.md"
         assert passed_docs[0].metadata["chunk_id"] == 1
+
+def make_docs(texts):
+    return [
+        Document(page_content=t, metadata={"source": f"doc{i}.md"}) for i, t in enumerate(texts)
+    ]
+
+def test_publish_keeps_pinned_version_until_readers_drain():
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index(make_docs(["chunking", "faiss"]))
+    assert manager.version == 1
+
+    with manager.acquire() as pinned:
+        manager.publish(manager.build_snapshot(make_docs(["groq", "prompt", "docling"])))
+        assert manager.version == 2
+        # The pinned reader still resolves positions against version 1
+        _, positions = pinned.search_by_vectors([1.0, 0, 0, 0, 0, 0.01], k=1)
+        assert pinned.get_documents(positions[0])[0].page_content == "chunking"
+        assert [s["version"] for s in manager.snapshots()] == [2, 1]
+
+    assert [s["version"] for s in manager.snapshots()] == [2]
+    assert Retriever(manager).retrieve("groq", k=1)[0].page_content == "groq"
+
+def test_rebuild_async_swaps_in_new_documents():
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index(make_docs(["chunking"]))
+
+    rebuild = manager.rebuild_async(lambda: make_docs(["chunking", "docling docling"]))
+    version = rebuild.result(timeout=10)
+
+    assert version == manager.version == 2
+    found = Retriever(manager).retrieve("docling", k=1, filter={"source": "doc1.md"})
+    assert found[0].page_content == "docling docling"
+
+def test_save_and_load_snapshot(tmp_path):
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index(make_docs(["chunking", "faiss"]))
+    manager.save_snapshot(str(tmp_path))
+    assert (tmp_path / "CURRENT").read_text() == "v000001"
+
+    restored = VectorStoreManager(FakeEmbeddingModel())
+    assert restored.load_snapshot(str(tmp_path)) == 1
+    results = Retriever(restored).retrieve("faiss", k=1, filter={"source": "doc1.md"})
+    assert results[0].page_content == "faiss"
+
+def test_replace_sources_appends_or_swaps():
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index(make_docs(["chunking", "faiss"]))
+
+    added = manager.replace_sources(
+        [], [Document(page_content="groq", metadata={"source": "new.md"})]
+    )
+    assert added == {"removed": 0, "added": 1, "version": 2}
+
+    swapped = manager.replace_sources(
+        ["doc0.md"], [Document(page_content="prompt", metadata={"source": "doc0.md"})]
+    )
+    assert swapped == {"removed": 1, "added": 1, "version": 3}
+    found = Retriever(manager).retrieve("chunking", k=5, filter={"source": "doc0.md"})
+    assert [d.page_content for d in found] == ["prompt"]
+
+def test_add_documents_publishes_a_copy():
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index(make_docs(["chunking", "faiss"]))
+
+    with manager.acquire() as pinned:
+        manager.add_documents([Document(page_content="groq", metadata={"source": "new.md"})])
+        # The pinned version is never written to
+        assert len(pinned) == 2 and pinned.vector_store.index.ntotal == 2
+        assert pinned.metadata_index.match({"source": "new.md"}) == 0
+
+    with manager.acquire() as live:
+        assert live.version == 2 and len(live) == 3
+    found = Retriever(manager).retrieve("groq", k=1, filter={"source": "new.md"})
+    assert found[0].page_content == "groq"
+
+def test_rebuild_is_not_published_over_concurrent_changes():
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index(make_docs(["chunking"]))
+
+    def load_documents():
+        manager.add_documents([Document(page_content="groq", metadata={"source": "upload.md"})])
+        return make_docs(["chunking", "docling"])
+
+    with pytest.raises(RuntimeError, match="changed during the rebuild"):
+        manager.rebuild_async(load_documents).result(timeout=10)
+    found = Retriever(manager).retrieve("groq", k=1, filter={"source": "upload.md"})
+    assert found[0].page_content == "groq"
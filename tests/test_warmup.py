@@ -0,0 +1,98 @@
+import json
+import numpy as np
+from langchain_core.documents import Document
+from src.embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+from src.retrieval import RetrievalCache, Retriever
+from src.vectorizer import VectorStoreManager
+from src.warmup import QueryLog, WarmupRunner, load_eval_queries, load_query_log
+from tests.test_retrieval import KeywordEmbeddings
+
+class CountingEmbeddings(KeywordEmbeddings):
+    def __init__(self):
+        self.query_calls = 0
+        self.document_calls = []
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return super().embed_documents(texts)
+
+class CachedModel:
+    def __init__(self, cache):
+        self.base = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(self.base, cache)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        return self.embeddings.embed_queries(texts)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+def build(texts):
+    model = CachedModel(QueryEmbeddingCache())
+    manager = VectorStoreManager(model)
+    manager.create_index([
+        Document(page_content=t, metadata={"source": f"doc{i}.md"}) for i, t in enumerate(texts)
+    ])
+    return model, manager, Retriever(manager, cache=RetrievalCache())
+
+def test_query_embedding_cache_batches_misses_and_persists(tmp_path):
+    cache = QueryEmbeddingCache(max_entries=2, model_name="m")
+    embeddings = CachedEmbeddings(CountingEmbeddings(), cache)
+
+    embeddings.embed_query("chunking")
+    embeddings.embed_queries(["chunking ", "faiss", "groq"])
+    assert embeddings.embeddings.document_calls == [["faiss", "groq"]]
+    # LRU: "chunking" was evicted by the two newer entries
+    assert "chunking" not in cache and "groq" in cache
+
+    path = str(tmp_path / "cache.npz")
+    cache.save(path)
+    assert QueryEmbeddingCache(model_name="m").load(path) == 2
+    assert QueryEmbeddingCache(model_name="other").load(path) == 0
+    restored = QueryEmbeddingCache(model_name="m")
+    restored.load(path)
+    np.testing.assert_allclose(restored.get("groq"), KeywordEmbeddings().embed_query("groq"))
+
+def test_retrieval_cache_is_keyed_by_index_version():
+    model, manager, retriever = build(["chunking", "faiss"])
+
+    first = retriever.retrieve("chunking", k=1)
+    assert retriever.retrieve("chunking", k=1) == first
+    assert retriever.cache.stats()["hits"] == 1
+    assert model.base.query_calls == 1
+
+    manager.add_documents([Document(page_content="chunking", metadata={"source": "new.md"})])
+    retriever.retrieve("chunking", k=1)
+    assert retriever.cache.stats()["misses"] == 2
+
+def test_warmup_fills_caches_and_reports_hot():
+    model, manager, retriever = build(["chunking", "faiss", "groq"])
+    runner = WarmupRunner(retriever, ["chunking", "faiss", " chunking ", "groq"], k=2)
+
+    assert runner.status()["state"] == "cold"
+    runner.start()
+    assert runner.wait(timeout=10)
+
+    status = runner.status()
+    assert status["state"] == "hot" and status["retrieved"] == 3
+    assert model.base.document_calls[-1] == ["chunking", "faiss", "groq"]
+    assert model.base.query_calls == 1  # only the model warm-up call
+    retriever.retrieve("faiss", k=2)
+    assert retriever.cache.stats()["hits"] == 1
+
+def test_query_sources(tmp_path):
+    eval_file = tmp_path / "eval_set.json"
+    eval_file.write_text(json.dumps([{"question": "What is RAG?"}, {"question": ""}]))
+    assert load_eval_queries(str(eval_file)) == ["What is RAG?"]
+
+    log = QueryLog(str(tmp_path / "logs" / "queries.jsonl"))
+    for query in ["a", "b", " b", "c", "c", "c"]:
+        log.record(query)
+    assert load_query_log(log.path, top_n=2) == ["c", "b"]
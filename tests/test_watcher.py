@@ -0,0 +1,123 @@
+import os
+import queue
+import pytest
+from langchain_core.documents import Document
+from src.retrieval import Retriever
+from src.vectorizer import VectorStoreManager
+from src.watcher import DataDirWatcher, FileChange, IngestionWorker
+from tests.test_retrieval import FakeEmbeddingModel
+
+def write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_watcher_debounces_and_confirms_by_hash(tmp_path):
+    write(tmp_path / "a.md", "alpha", mtime_ns=1_000_000_000)
+    watcher = DataDirWatcher(str(tmp_path), on_changes=lambda changes: None, debounce_s=2.0)
+    watcher.prime()
+    a = str(tmp_path / "a.md")
+
+    write(tmp_path / "b.md", "beta")
+    assert watcher.poll(now=0.0) == []
+    # Still being written: the quiet period restarts
+    write(tmp_path / "b.md", "beta beta")
+    assert watcher.poll(now=1.5) == []
+    assert watcher.poll(now=3.0) == []
+    assert watcher.poll(now=3.6) == [FileChange(str(tmp_path / "b.md"), "added")]
+
+    # A touch changes mtime but not content
+    write(tmp_path / "a.md", "alpha", mtime_ns=2_000_000_000)
+    watcher.poll(now=10.0)
+    assert watcher.poll(now=12.5) == []
+
+    write(tmp_path / "a.md", "alpha two", mtime_ns=3_000_000_000)
+    watcher.poll(now=20.0)
+    assert watcher.poll(now=22.5) == [FileChange(a, "modified")]
+
+    os.remove(a)
+    watcher.poll(now=30.0)
+    assert watcher.poll(now=32.5) == [FileChange(a, "deleted")]
+
+def word_chunks(path):
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    return [Document(page_content=line, metadata={"source": path}) for line in lines if line]
+
+def test_worker_swaps_only_changed_files(tmp_path):
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index([
+        Document(page_content="chunking", metadata={"source": "keep.md"}),
+        Document(page_content="groq", metadata={"source": str(tmp_path / "old.md")}),
+    ])
+    (tmp_path / "new.md").write_text("docling\nprompt")
+    embedded = []
+    original = manager.embedding_model.embed_documents
+    manager.embedding_model.embed_documents = (
+        lambda texts: embedded.extend(texts) or original(texts)
+    )
+
+    worker = IngestionWorker(manager, build_chunks=word_chunks)
+    result = worker.process([
+        FileChange(str(tmp_path / "old.md"), "deleted"),
+        FileChange(str(tmp_path / "new.md"), "added"),
+        FileChange(str(tmp_path / "missing.md"), "modified"),
+    ])
+
+    assert result == {"removed": 1, "added": 2, "version": 2}
+    assert embedded == ["docling", "prompt"]
+    found = Retriever(manager).retrieve("chunking docling groq prompt", k=5)
+    sources = {d.metadata["source"] for d in found}
+    assert sources == {"keep.md", str(tmp_path / "new.md")}
+    assert worker.stats()["errors"] == 1
+
+def test_worker_applies_backpressure():
+    worker = IngestionWorker(VectorStoreManager(FakeEmbeddingModel()), build_chunks=word_chunks,
+                             max_queue=1)
+    worker.submit([FileChange("a.md", "deleted")])
+    with pytest.raises(queue.Full):
+        worker.submit([FileChange("b.md", "deleted")], timeout=0.05)
+
+def test_uploads_are_tracked_and_not_reported_twice(tmp_path):
+    from src.watcher import write_upload
+
+    manager = VectorStoreManager(FakeEmbeddingModel())
+    manager.create_index([Document(page_content="chunking", metadata={"source": "keep.md"})])
+    watcher = DataDirWatcher(str(tmp_path), on_changes=lambda changes: None, debounce_s=0.0)
+    watcher.prime()
+    worker = IngestionWorker(manager, build_chunks=word_chunks)
+
+    path = write_upload(str(tmp_path), "../../notes.md", b"docling\nprompt")
+    assert path == str(tmp_path / "notes.md")
+    watcher.mark_ingested(path)
+    worker.submit([FileChange(path, "added")])
+    assert worker.file_states()[path]["state"] == "queued"
+    assert watcher.poll(now=10.0) == []
+
+    worker.start()
+    worker.join()
+    worker.stop()
+    assert worker.file_states()[path]["state"] == "indexed"
+    assert worker.file_states()[path]["chunks"] == 2
+    stats = worker.stats()
+    assert stats["files"] == 1 and stats["chunks_per_s"] > 0
+
+    with pytest.raises(ValueError):
+        write_upload(str(tmp_path), "payload.exe", b"")
+    assert sorted(os.listdir(tmp_path)) == ["notes.md"]
+
+def test_file_chunks_are_deduplicated(tmp_path):
+    from unittest.mock import patch
+    from src.tokens import TokenCounter
+    from src.watcher import build_file_chunks
+    from tests.test_tokens import WordEncoding
+
+    body = " ".join(f"word{i}" for i in range(40))
+    path = tmp_path / "notes.md"
+    path.write_text(f"# Setup\n\n{body}\n\n# Usage\n\nRun it.\n\n# Setup\n\n{body}\n")
+    counter = TokenCounter(encoding=WordEncoding())
+    with patch("src.ingestion.get_token_counter", return_value=counter):
+        chunks = build_file_chunks(str(path))
+
+    assert [c.metadata["section"] for c in chunks] == ["Setup", "Usage"]
+